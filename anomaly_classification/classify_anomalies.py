@@ -25,98 +25,133 @@ A simple example showing how to use classification for detecting known
 anomalies even if they occur again. There are two different methods shown here.
 """
 
-import csv
+from collections import deque
+import os
 import pprint
+import sys
 
 from nupic.data.datasethelpers import findDataset
 from nupic.frameworks.opf.modelfactory import ModelFactory
 
 
 import model_params
+from label_store import AnomalyLabelStore
+from pattern_index import PatternIndex
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import iterRecords, readColumns
+from common.instrumentation import NullInstrumentation
+from common.model_cache import ModelTemplateCache
+from common.result_sinks import createSink
 
 _DATA_PATH = "test1.csv"
 
 _OUTPUT_PATH = "anomaly_scores.csv"
 
+_OUTPUT_FIELDS = ["x", "sinx", "anomaly_score", "anomalyLabel"]
+
 _ANOMALY_THRESHOLD = 0.9
 
+# Ranges of records (start, end, label) that classifyAnomaliesManually() and
+# classifyAnomaliesWithIndex() label once each (1-based) record number is
+# reached. start and end are 0-based ROWIDs as used by the classifier, end
+# being exclusive
+_MANUAL_LABELS = {
+  2505: [(2498, 2503, "myAnomaly")],
+  2605: [(2598, 2603, "myAnomaly")],
+  2705: [(2698, 2703, "myAnomaly")],
+}
+
+# Number of recent record patterns classifyAnomaliesWithIndex() keeps
+_PATTERN_HISTORY = 1000
+
+# Labels the classifier gives records it classified on its own
+_AUTO_LABELS = set(["Auto Threshold Classification",
+                    "Auto Threshold Classification (auto)"])
+
 
-def createModel():
+def createModel(modelCache=None):
+  if modelCache is not None:
+    return ModelTemplateCache(modelCache).create(model_params.MODEL_PARAMS)
   return ModelFactory.create(model_params.MODEL_PARAMS)
 
 
-def classifyAnomaliesManually():
+def classifyAnomaliesManually(outputPath=_OUTPUT_PATH, instrumentation=None,
+                              modelCache=None):
   """
   In this function we explicitly label specific portions of the data stream that
   we happen to know are anomalous. Any later record that matches the pattern
   will get labeled as "myAnomaly"
+
+  instrumentation is an optional common.instrumentation.Instrumentation that
+  times each stage of the record loop. If modelCache is set, the model is
+  cloned from a template kept in that directory.
   """
-  model = createModel()
+  if instrumentation is None:
+    instrumentation = NullInstrumentation()
+  model = createModel(modelCache)
   model.enableInference({'predictedField': 'sinx'})
 
   # Here we will get the classifier instance so we can add and query labels.
   classifierRegion = model._getAnomalyClassifier()
   classifierRegionPy = classifierRegion.getSelf()
+  labelStore = AnomalyLabelStore(classifierRegion)
 
   # We need to set this classification type. It is supposed to be the default
   # but is not for some reason.
   classifierRegionPy.classificationVectorType = 2
 
-  with open (findDataset(_DATA_PATH)) as fin:
-    reader = csv.reader(fin)
-    headers = reader.next()
-    csvWriter = csv.writer(open(_OUTPUT_PATH,"wb"))
-    csvWriter.writerow(["x", "sinx", "anomaly_score", "anomalyLabel"])
-    for i, record in enumerate(reader, start=1):
-      modelInput = dict(zip(headers, record))
-      modelInput["sinx"] = float(modelInput["sinx"])
+  columns = readColumns(findDataset(_DATA_PATH), {"sinx": "float"},
+                        instrumentation=instrumentation)
+  with createSink(outputPath, _OUTPUT_FIELDS) as sink:
+    for i, modelInput in enumerate(iterRecords(columns), start=1):
+      instrumentation.mark("read")
       result = model.run(modelInput)
+      instrumentation.mark("model.run")
       anomalyScore = result.inferences['anomalyScore']
-      anomalyLabel = result.inferences['anomalyLabel']
 
       # Convert the anomaly label into either 0 or 1
-      if anomalyLabel == "[]":
-        anomalyLabel = 0
-      elif anomalyLabel == "['myAnomaly']":
+      anomalyLabel = 0
+      if "myAnomaly" in labelStore.currentLabels():
         anomalyLabel = 1.0
         print "Anomaly detected at record",i
 
       # Manually tell the classifier to learn the first few artificial
       # anomalies. From there it should catch many of the following
       # anomalies, even though the anomaly sore might be low.
-      if i == 2505:
+      if i in _MANUAL_LABELS:
         print "Adding labeled anomalies for record",i
-        classifierRegion.executeCommand(["addLabel","2498","2503","myAnomaly"])
+        labelStore.addLabels(_MANUAL_LABELS[i])
         anomalyLabel = 1.0
 
-      if i == 2605:
-        print "Adding labeled anomalies for record",i
-        classifierRegion.executeCommand(["addLabel","2598","2603","myAnomaly"])
-        anomalyLabel = 1.0
+      sink.write([i, modelInput["sinx"], anomalyScore, anomalyLabel])
+      instrumentation.mark("write")
+      instrumentation.recordProcessed()
 
-      if i == 2705:
-        print "Adding labeled anomalies for record",i
-        classifierRegion.executeCommand(["addLabel","2698","2703","myAnomaly"])
-        anomalyLabel = 1.0
-
-      csvWriter.writerow([i, modelInput["sinx"], anomalyScore, anomalyLabel])
 
-
-  print "Anomaly scores have been written to",_OUTPUT_PATH
+  print "Anomaly scores have been written to",outputPath
   print "The following labels were stored in the classifier:"
-  labels = eval(classifierRegion.executeCommand(["getLabels"]))
-  pprint.pprint(labels)
+  pprint.pprint(labelStore.ranges())
 
 
 
-def classifyAnomaliesAutomatically():
+def classifyAnomaliesAutomatically(outputPath=_OUTPUT_PATH,
+                                   instrumentation=None, modelCache=None):
   """
   In this function we use the automatic labeling feature. Here we can set an
   anomaly threshold. Any record whose anomaly score goes above the threshold
   is automatically sent to the classifier. Any later record that matches the
   pattern will get labeled as "Auto Threshold Classification (auto)"
+
+  instrumentation is an optional common.instrumentation.Instrumentation that
+  times each stage of the record loop. If modelCache is set, the model is
+  cloned from a template kept in that directory.
   """
-  model = createModel()
+  if instrumentation is None:
+    instrumentation = NullInstrumentation()
+  model = createModel(modelCache)
   model.enableInference({'predictedField': 'sinx'})
 
   # Setup the classifier to automatically classify records with
@@ -125,37 +160,90 @@ def classifyAnomaliesAutomatically():
   classifierRegion.setParameter('anomalyThreshold',0.9)
   print "threshold for classifying anomalies is:", (
     classifierRegion.getParameter('anomalyThreshold'))
+  labelStore = AnomalyLabelStore(classifierRegion)
 
-  with open (findDataset(_DATA_PATH)) as fin:
-    reader = csv.reader(fin)
-    headers = reader.next()
-    csvWriter = csv.writer(open(_OUTPUT_PATH,"wb"))
-    csvWriter.writerow(["x", "sinx", "anomaly_score", "anomalyLabel"])
-    for i, record in enumerate(reader, start=1):
-      modelInput = dict(zip(headers, record))
-      modelInput["sinx"] = float(modelInput["sinx"])
+  columns = readColumns(findDataset(_DATA_PATH), {"sinx": "float"},
+                        instrumentation=instrumentation)
+  with createSink(outputPath, _OUTPUT_FIELDS) as sink:
+    for i, modelInput in enumerate(iterRecords(columns), start=1):
+      instrumentation.mark("read")
       result = model.run(modelInput)
+      instrumentation.mark("model.run")
       anomalyScore = result.inferences['anomalyScore']
-      anomalyLabel = result.inferences['anomalyLabel']
 
       # Convert the anomaly label into either 0 or 1
-      if anomalyLabel == "[]":
-        anomalyLabel = 0
-      elif anomalyLabel == "['Auto Threshold Classification']":
+      anomalyLabel = 0
+      if _AUTO_LABELS.intersection(labelStore.currentLabels()):
         anomalyLabel = 1.0
-      elif anomalyLabel == "['Auto Threshold Classification (auto)']":
-        anomalyLabel = 1.0
-      csvWriter.writerow([i, modelInput["sinx"], anomalyScore, anomalyLabel])
+      sink.write([i, modelInput["sinx"], anomalyScore, anomalyLabel])
+      instrumentation.mark("write")
+      instrumentation.recordProcessed()
 
       if i>500 and anomalyScore > _ANOMALY_THRESHOLD:
         print "Anomaly detected at row [%d]. Anomaly score: %f." %(i,
                                                                  anomalyScore)
 
-  print "Anomaly scores have been written to",_OUTPUT_PATH
+  print "Anomaly scores have been written to",outputPath
   print "The following labels were stored in the classifier:"
-  labels = eval(classifierRegion.executeCommand(["getLabels"]))
-  pprint.pprint(labels)
+  labelStore.refresh()
+  pprint.pprint(labelStore.ranges())
+
+
+
+def classifyAnomaliesWithIndex(outputPath=_OUTPUT_PATH, instrumentation=None,
+                               modelCache=None, maxPatterns=100000):
+  """
+  Same as classifyAnomaliesManually(), but the labelled patterns are matched
+  with pattern_index.PatternIndex instead of the KNN anomaly classifier. The
+  pattern of a record is the set of active cells in the temporal pooler
+  output. The patterns of the last _PATTERN_HISTORY records are kept so
+  that past ranges of records can be labelled, like the classifier's
+  record cache. maxPatterns caps the number of labelled patterns kept.
+  """
+  if instrumentation is None:
+    instrumentation = NullInstrumentation()
+  model = createModel(modelCache)
+  model.enableInference({'predictedField': 'sinx'})
+  tpRegion = model._getTPRegion()
+
+  index = PatternIndex(maxPatterns=maxPatterns)
+  recentPatterns = deque(maxlen=_PATTERN_HISTORY)
+
+  columns = readColumns(findDataset(_DATA_PATH), {"sinx": "float"},
+                        instrumentation=instrumentation)
+  with createSink(outputPath, _OUTPUT_FIELDS) as sink:
+    for i, modelInput in enumerate(iterRecords(columns), start=1):
+      instrumentation.mark("read")
+      result = model.run(modelInput)
+      instrumentation.mark("model.run")
+      anomalyScore = result.inferences['anomalyScore']
+      pattern = tpRegion.getOutputData("bottomUpOut").nonzero()[0]
+      # Keep the classifier's 0-based ROWID, which _MANUAL_LABELS refers to
+      recentPatterns.append((i - 1, pattern))
+
+      anomalyLabel = 0
+      if len(pattern) > 0 and "myAnomaly" in index.labels(pattern):
+        anomalyLabel = 1.0
+        print "Anomaly detected at record",i
+      instrumentation.mark("match")
+
+      if i in _MANUAL_LABELS:
+        print "Adding labeled anomalies for record",i
+        for start, end, label in _MANUAL_LABELS[i]:
+          for rowID, recentPattern in recentPatterns:
+            if start <= rowID < end and len(recentPattern) > 0:
+              index.add(recentPattern, label)
+        anomalyLabel = 1.0
+
+      sink.write([i, modelInput["sinx"], anomalyScore, anomalyLabel])
+      instrumentation.mark("write")
+      instrumentation.recordProcessed()
+
+  print "Anomaly scores have been written to",outputPath
+  print len(index),"labelled patterns are stored in the index"
+
 
 if __name__ == "__main__":
   classifyAnomaliesManually()
   #classifyAnomaliesAutomatically()
+  #classifyAnomaliesWithIndex()
@@ -0,0 +1,201 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Typed access to the labels of the anomaly classifier region.
+
+The region's executeCommand() interface takes every argument as a string and
+returns the labels as the repr of a dict, which callers then have to eval().
+AnomalyLabelStore calls the methods of the region implementation directly
+instead, and keeps its own index of the labelled ranges so that "which labels
+cover records A..B" doesn't need a scan over every stored record.
+
+Ranges follow the classifier's convention: start is the first ROWID of the
+range and end is one past the last.
+"""
+
+from collections import defaultdict, namedtuple
+
+
+LabelRange = namedtuple("LabelRange", ["start", "end", "label"])
+
+
+
+class AnomalyLabelStore(object):
+  """
+  Adds, removes and queries labels of an anomaly classifier region, e.g. the
+  one returned by model._getAnomalyClassifier().
+  """
+
+  def __init__(self, classifierRegion, bucketSize=1024):
+    """
+    :param classifierRegion: the anomaly classifier region
+    :param bucketSize: number of records per bucket of the interval index.
+      A range is indexed in every bucket it overlaps, so queries only look
+      at the ranges near the queried records.
+    """
+    self.classifier = classifierRegion.getSelf()
+    self.bucketSize = bucketSize
+    self._buckets = defaultdict(set)
+
+
+  def addLabel(self, start, end, label):
+    """
+    Label the records with ROWIDs in [start, end).
+    """
+    self.addLabels([(start, end, label)])
+
+
+  def addLabels(self, ranges):
+    """
+    Label several ranges of records.
+
+    :param ranges: iterable of (start, end, label) tuples
+    """
+    for start, end, label in ranges:
+      self.classifier.addLabel(start, end, label)
+      self._index(LabelRange(start, end, label))
+
+
+  def removeLabels(self, start=None, end=None, label=None):
+    """
+    Remove labels from the records with ROWIDs in [start, end). start and end
+    default to the first and last stored record, and label to every label.
+    """
+    self.removeLabelRanges([(start, end, label)])
+
+
+  def removeLabelRanges(self, ranges):
+    """
+    Remove labels from several ranges of records.
+
+    :param ranges: iterable of (start, end, label) tuples, where any element
+      may be None like for removeLabels()
+    """
+    for start, end, label in ranges:
+      self.classifier.removeLabels(start, end, label)
+      if start is None or end is None:
+        candidates = self._allRanges()
+      else:
+        candidates = self._rangesInBuckets(start, end)
+      for labelRange in candidates:
+        if label is not None and labelRange.label != label:
+          continue
+        if start is not None and labelRange.end <= start:
+          continue
+        if end is not None and labelRange.start >= end:
+          continue
+        # Keep the parts of the range outside the removed records
+        self._unindex(labelRange)
+        if start is not None and labelRange.start < start:
+          self._index(labelRange._replace(end=start))
+        if end is not None and labelRange.end > end:
+          self._index(labelRange._replace(start=end))
+
+
+  def labelsCovering(self, start, end=None):
+    """
+    :return: list of the LabelRanges overlapping the records with ROWIDs in
+      [start, end), or only record start if end is None, sorted by start
+    """
+    if end is None:
+      end = start + 1
+    return sorted(labelRange for labelRange in self._rangesInBuckets(start, end)
+                  if labelRange.start < end and labelRange.end > start)
+
+
+  def ranges(self):
+    """
+    :return: list of all the labelled ranges, sorted by start
+    """
+    return sorted(self._allRanges())
+
+
+  def currentLabels(self):
+    """
+    :return: list of the labels the classifier gave the last record run
+      through the model
+    """
+    return list(self.classifier.getLabelResults())
+
+
+  def recordLabels(self, start=None, end=None):
+    """
+    Read the labels stored in the classifier itself, including the ones it
+    added automatically for records above its anomaly threshold.
+
+    :return: dict mapping the ROWID of every labelled record in [start, end)
+      to its list of labels
+    """
+    labels = self.classifier.getLabels(start, end)
+    return dict((record["ROWID"], list(record["labels"]))
+                for record in labels["recordLabels"] if record["labels"])
+
+
+  def refresh(self):
+    """
+    Rebuild the index from the labels stored in the classifier, merging
+    consecutive records with the same label into one range. Use this after
+    the classifier labelled records on its own.
+    """
+    self._buckets.clear()
+    current = {}
+    for rowID, labels in sorted(self.recordLabels().iteritems()):
+      for label in labels:
+        labelRange = current.get(label)
+        if labelRange is not None and labelRange.end == rowID:
+          current[label] = labelRange._replace(end=rowID + 1)
+        else:
+          if labelRange is not None:
+            self._index(labelRange)
+          current[label] = LabelRange(rowID, rowID + 1, label)
+    for labelRange in current.itervalues():
+      self._index(labelRange)
+
+
+  def _bucketRange(self, start, end):
+    return xrange(start // self.bucketSize, (end - 1) // self.bucketSize + 1)
+
+
+  def _index(self, labelRange):
+    for bucket in self._bucketRange(labelRange.start, labelRange.end):
+      self._buckets[bucket].add(labelRange)
+
+
+  def _unindex(self, labelRange):
+    for bucket in self._bucketRange(labelRange.start, labelRange.end):
+      self._buckets[bucket].discard(labelRange)
+      if not self._buckets[bucket]:
+        del self._buckets[bucket]
+
+
+  def _rangesInBuckets(self, start, end):
+    found = set()
+    for bucket in self._bucketRange(start, end):
+      found.update(self._buckets.get(bucket, ()))
+    return found
+
+
+  def _allRanges(self):
+    found = set()
+    for labelRanges in self._buckets.itervalues():
+      found.update(labelRanges)
+    return found
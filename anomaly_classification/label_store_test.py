@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for label_store.py. The classifier region is replaced by a small class
+with the label methods of NuPIC's KNNAnomalyClassifierRegion.
+"""
+
+import unittest
+
+from label_store import AnomalyLabelStore, LabelRange
+
+
+
+class _Classifier(object):
+  """
+  Keeps the labels of numRecords records like the anomaly classifier.
+  """
+
+  def __init__(self, numRecords):
+    self.numRecords = numRecords
+    self.records = dict((rowID, []) for rowID in range(numRecords))
+    self.labelResults = []
+
+
+  def getSelf(self):
+    return self
+
+
+  def _rowIDs(self, start, end):
+    start = 0 if start is None else start
+    end = self.numRecords if end is None else end
+    return range(max(start, 0), min(end, self.numRecords))
+
+
+  def addLabel(self, start, end, label):
+    for rowID in self._rowIDs(start, end):
+      if label not in self.records[rowID]:
+        self.records[rowID].append(label)
+
+
+  def removeLabels(self, start=None, end=None, label=None):
+    for rowID in self._rowIDs(start, end):
+      self.records[rowID] = [l for l in self.records[rowID]
+                             if label is not None and l != label]
+
+
+  def getLabels(self, start=None, end=None):
+    return {"isProcessing": False,
+            "recordLabels": [{"ROWID": rowID, "labels": self.records[rowID]}
+                             for rowID in self._rowIDs(start, end)]}
+
+
+  def getLabelResults(self):
+    return self.labelResults
+
+
+
+class AnomalyLabelStoreTest(unittest.TestCase):
+
+  def setUp(self):
+    self.classifier = _Classifier(5000)
+    self.store = AnomalyLabelStore(self.classifier, bucketSize=100)
+
+
+  def testAddAndQuery(self):
+    self.store.addLabels([(2498, 2503, "myAnomaly"), (90, 250, "other")])
+    self.assertEqual(self.store.labelsCovering(2502),
+                     [LabelRange(2498, 2503, "myAnomaly")])
+    self.assertEqual(self.store.labelsCovering(2503), [])
+    self.assertEqual(self.store.labelsCovering(0, 5000),
+                     [LabelRange(90, 250, "other"),
+                      LabelRange(2498, 2503, "myAnomaly")])
+    self.assertEqual(self.classifier.records[2500], ["myAnomaly"])
+    self.assertEqual(self.classifier.records[2503], [])
+
+
+  def testRemoveSplitsRanges(self):
+    self.store.addLabel(100, 200, "a")
+    self.store.addLabel(150, 160, "b")
+    self.store.removeLabels(120, 180, "a")
+    self.assertEqual(self.store.ranges(), [LabelRange(100, 120, "a"),
+                                           LabelRange(150, 160, "b"),
+                                           LabelRange(180, 200, "a")])
+    self.assertEqual(self.classifier.records[130], [])
+    self.assertEqual(self.classifier.records[155], ["b"])
+
+
+  def testRemoveEverything(self):
+    self.store.addLabels([(10, 20, "a"), (3000, 3010, "b")])
+    self.store.removeLabels()
+    self.assertEqual(self.store.ranges(), [])
+    self.assertEqual(self.store.recordLabels(), {})
+
+
+  def testRefreshMergesRecordLabels(self):
+    # Labels the classifier added on its own
+    self.classifier.addLabel(10, 15, "auto")
+    self.classifier.addLabel(15, 18, "auto")
+    self.classifier.addLabel(20, 22, "auto")
+    self.classifier.addLabel(12, 13, "manual")
+    self.store.refresh()
+    self.assertEqual(self.store.ranges(), [LabelRange(10, 18, "auto"),
+                                           LabelRange(12, 13, "manual"),
+                                           LabelRange(20, 22, "auto")])
+    self.assertEqual(self.store.recordLabels(12, 13), {12: ["auto", "manual"]})
+
+
+  def testCurrentLabels(self):
+    self.classifier.labelResults = ("myAnomaly",)
+    self.assertEqual(self.store.currentLabels(), ["myAnomaly"])
+
+
+
+if __name__ == "__main__":
+  unittest.main()
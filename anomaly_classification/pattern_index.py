@@ -0,0 +1,185 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Approximate nearest neighbour index over labelled SDR patterns.
+
+The KNN anomaly classifier compares every record with every stored pattern,
+so matching gets slower as labelled incidents accumulate. PatternIndex uses
+MinHash locality sensitive hashing instead. Each pattern, given as the
+indices of its active bits, gets a signature of numBands * rowsPerBand
+MinHash values. Patterns that agree on all the rows of at least one band
+land in the same bucket, and only those candidates are compared exactly, so
+matching a record costs about the same with a hundred or a million stored
+patterns. Two patterns with Jaccard similarity s share a bucket with
+probability 1 - (1 - s^rowsPerBand)^numBands.
+
+The number of stored patterns is capped. When the cap is reached the least
+recently matched pattern ("lru") or the oldest pattern ("fifo") is evicted.
+"""
+
+from collections import OrderedDict, defaultdict, namedtuple
+
+import numpy
+
+
+# Mersenne prime for the MinHash hash functions (a*x + b) mod _PRIME
+_PRIME = (1 << 31) - 1
+
+_Pattern = namedtuple("_Pattern", ["bits", "label", "bucketKeys"])
+
+
+
+class PatternIndex(object):
+  """
+  Stores labelled SDR patterns and finds the stored patterns similar to a new
+  one.
+  """
+
+  def __init__(self, numBands=16, rowsPerBand=4, maxPatterns=100000,
+               eviction="lru", minSimilarity=0.5, seed=42):
+    """
+    :param numBands: number of LSH bands. More bands find more of the
+      similar patterns, at the cost of more buckets.
+    :param rowsPerBand: MinHash values per band. More rows make the buckets
+      more selective.
+    :param maxPatterns: maximum number of stored patterns
+    :param eviction: which pattern to evict when maxPatterns is reached,
+      "lru" for the least recently matched or added one, "fifo" for the
+      oldest one
+    :param minSimilarity: minimum Jaccard similarity of a match
+    :param seed: seed of the hash functions
+    """
+    if eviction not in ("lru", "fifo"):
+      raise ValueError("Unknown eviction policy: %s" % eviction)
+    self.numBands = numBands
+    self.rowsPerBand = rowsPerBand
+    self.maxPatterns = maxPatterns
+    self.eviction = eviction
+    self.minSimilarity = minSimilarity
+
+    random = numpy.random.RandomState(seed)
+    numHashes = numBands * rowsPerBand
+    self._a = random.randint(1, _PRIME, numHashes).astype(numpy.int64)
+    self._b = random.randint(0, _PRIME, numHashes).astype(numpy.int64)
+
+    self._patterns = OrderedDict()
+    self._buckets = defaultdict(set)
+    self._nextID = 0
+    self.numEvicted = 0
+
+
+  def __len__(self):
+    return len(self._patterns)
+
+
+  def add(self, activeBits, label):
+    """
+    Store a pattern, evicting one first if the index is full.
+
+    :param activeBits: indices of the active bits of the pattern
+    :param label: label returned when a later pattern matches this one
+
+    :return: id of the stored pattern, for remove()
+    """
+    bits = self._bits(activeBits)
+    if len(bits) == 0:
+      raise ValueError("Can't index a pattern without active bits")
+    while len(self._patterns) >= self.maxPatterns:
+      self.remove(next(iter(self._patterns)))
+      self.numEvicted += 1
+
+    patternID = self._nextID
+    self._nextID += 1
+    bucketKeys = self._bucketKeys(bits)
+    self._patterns[patternID] = _Pattern(bits, label, bucketKeys)
+    for key in bucketKeys:
+      self._buckets[key].add(patternID)
+    return patternID
+
+
+  def remove(self, patternID):
+    """
+    Remove a stored pattern.
+    """
+    pattern = self._patterns.pop(patternID)
+    for key in pattern.bucketKeys:
+      bucket = self._buckets[key]
+      bucket.discard(patternID)
+      if not bucket:
+        del self._buckets[key]
+
+
+  def query(self, activeBits, maxResults=None):
+    """
+    Find the stored patterns similar to a pattern.
+
+    :param activeBits: indices of the active bits of the pattern
+    :param maxResults: return at most this many matches
+
+    :return: list of (similarity, label, pattern id) tuples for the matches
+      with a Jaccard similarity of at least minSimilarity, most similar first
+    """
+    bits = self._bits(activeBits)
+    if len(bits) == 0 or not self._patterns:
+      return []
+
+    candidates = set()
+    for key in self._bucketKeys(bits):
+      candidates.update(self._buckets.get(key, ()))
+
+    matches = []
+    for patternID in candidates:
+      stored = self._patterns[patternID].bits
+      overlap = len(numpy.intersect1d(bits, stored, assume_unique=True))
+      similarity = float(overlap) / (len(bits) + len(stored) - overlap)
+      if similarity >= self.minSimilarity:
+        matches.append((similarity, self._patterns[patternID].label,
+                        patternID))
+    matches.sort(key=lambda match: (-match[0], match[2]))
+    if maxResults is not None:
+      matches = matches[:maxResults]
+
+    if self.eviction == "lru":
+      for _, _, patternID in matches:
+        self._patterns[patternID] = self._patterns.pop(patternID)
+    return matches
+
+
+  def labels(self, activeBits):
+    """
+    :return: sorted list of the distinct labels of the patterns matching
+      activeBits, like the anomaly labels of the KNN anomaly classifier
+    """
+    return sorted(set(label for _, label, _ in self.query(activeBits)))
+
+
+  def _bits(self, activeBits):
+    return numpy.unique(numpy.asarray(activeBits, dtype=numpy.int64))
+
+
+  def _bucketKeys(self, bits):
+    # MinHash signature: for every hash function the minimum hash value over
+    # the active bits
+    hashes = (numpy.outer(self._a, bits) + self._b[:, None]) % _PRIME
+    signature = hashes.min(axis=1).reshape(self.numBands, self.rowsPerBand)
+    return [(band, signature[band].tostring())
+            for band in xrange(self.numBands)]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for pattern_index.py.
+"""
+
+import unittest
+
+import numpy
+
+from pattern_index import PatternIndex
+
+
+
+def _pattern(random, numBits=2048, numActive=40):
+  return random.choice(numBits, numActive, replace=False)
+
+
+def _similar(random, pattern, numChanged=4, numBits=2048):
+  changed = numpy.array(pattern)
+  changed[:numChanged] = random.choice(
+    numpy.setdiff1d(numpy.arange(numBits), pattern), numChanged,
+    replace=False)
+  return changed
+
+
+
+class PatternIndexTest(unittest.TestCase):
+
+  def setUp(self):
+    self.random = numpy.random.RandomState(42)
+
+
+  def testFindsSimilarPatterns(self):
+    index = PatternIndex()
+    patterns = [_pattern(self.random) for _ in range(200)]
+    for i, pattern in enumerate(patterns):
+      index.add(pattern, "label%d" % i)
+
+    self.assertEqual(index.labels(patterns[17]), ["label17"])
+    matches = index.query(_similar(self.random, patterns[42]))
+    self.assertEqual(matches[0][1], "label42")
+    self.assertGreaterEqual(matches[0][0], 0.5)
+    self.assertEqual(index.query(_pattern(self.random)), [])
+    self.assertEqual(index.query([]), [])
+
+
+  def testRemove(self):
+    index = PatternIndex()
+    pattern = _pattern(self.random)
+    patternID = index.add(pattern, "a")
+    index.remove(patternID)
+    self.assertEqual(len(index), 0)
+    self.assertEqual(index.query(pattern), [])
+
+
+  def testFIFOEvictsOldest(self):
+    index = PatternIndex(maxPatterns=3, eviction="fifo")
+    patterns = [_pattern(self.random) for _ in range(4)]
+    for i, pattern in enumerate(patterns[:3]):
+      index.add(pattern, i)
+    # Matching doesn't protect a pattern from FIFO eviction
+    index.query(patterns[0])
+    index.add(patterns[3], 3)
+
+    self.assertEqual(len(index), 3)
+    self.assertEqual(index.numEvicted, 1)
+    self.assertEqual(index.labels(patterns[0]), [])
+    self.assertEqual([index.labels(p) for p in patterns[1:]], [[1], [2], [3]])
+
+
+  def testLRUEvictsLeastRecentlyMatched(self):
+    index = PatternIndex(maxPatterns=3, eviction="lru")
+    patterns = [_pattern(self.random) for _ in range(5)]
+    for i, pattern in enumerate(patterns[:3]):
+      index.add(pattern, i)
+    # Matching pattern 0 makes pattern 1 the least recently used
+    index.query(patterns[0])
+    index.add(patterns[3], 3)
+    self.assertEqual(index.labels(patterns[1]), [])
+    self.assertEqual(index.labels(patterns[0]), [0])
+
+    # Now pattern 2 is the least recently used
+    index.add(patterns[4], 4)
+    self.assertEqual(index.numEvicted, 2)
+    self.assertEqual(index.labels(patterns[2]), [])
+    self.assertEqual([index.labels(p) for p in (patterns[0], patterns[3],
+                                                patterns[4])],
+                     [[0], [3], [4]])
+
+
+  def testRejectsUnknownEviction(self):
+    with self.assertRaises(ValueError):
+      PatternIndex(eviction="random")
+
+
+
+if __name__ == "__main__":
+  unittest.main()
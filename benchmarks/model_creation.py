@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Measure how long it takes to create a model with ModelFactory.create() and
+by cloning a template with common.model_cache.ModelTemplateCache, for the
+model parameters of each example directory.
+"""
+
+from optparse import OptionParser
+import imp
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+_REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, _REPO_DIR)
+from common.model_cache import ModelTemplateCache
+
+
+def _runAnomalyParams():
+  with open(os.path.join(_REPO_DIR, "run_anomaly", "model_params.json")) as fp:
+    modelParams = json.load(fp)
+  encoder = modelParams["modelParams"]["sensorParams"]["encoders"]["value"]
+  numBuckets = encoder.pop("numBuckets")
+  encoder["resolution"] = 100.0 / numBuckets
+  return modelParams
+
+
+def _moduleParams(directory):
+  # Load by path, the model_params modules of the directories share a name
+  module = imp.load_source(directory + "_model_params",
+                           os.path.join(_REPO_DIR, directory,
+                                        "model_params.py"))
+  return module.MODEL_PARAMS
+
+
+_PARAMS = {
+  "run_anomaly": _runAnomalyParams,
+  "ensembles": lambda: _moduleParams("ensembles"),
+  "anomaly_classification": lambda: _moduleParams("anomaly_classification"),
+}
+
+
+def timeCreation(modelParams, numModels, cacheDir):
+  """
+  :return: dict with the mean time in seconds to create a model from
+    scratch, to build and save the template, and to clone the template
+  """
+  startTime = time.time()
+  for _ in range(numModels):
+    ModelFactory.create(json.loads(json.dumps(modelParams)))
+  createSeconds = (time.time() - startTime) / numModels
+
+  cache = ModelTemplateCache(cacheDir)
+  startTime = time.time()
+  cache.create(modelParams)
+  templateSeconds = time.time() - startTime
+
+  startTime = time.time()
+  for _ in range(numModels):
+    cache.create(modelParams)
+  cloneSeconds = (time.time() - startTime) / numModels
+
+  return {"create": createSeconds, "template": templateSeconds,
+          "clone": cloneSeconds}
+
+
+if __name__ == "__main__":
+  parser = OptionParser("\n%prog [options]"
+                        "\n%prog --help"
+                        "\n"
+                        "\nTimes model creation with and without the model "
+                        "template cache.")
+  parser.add_option("--numModels", default=10, type=int,
+      help="Number of models to create per parameter set. "
+      "[default: %default]")
+  parser.add_option("--params", default=",".join(sorted(_PARAMS)),
+      help="Comma separated list of parameter sets. [default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+
+  cacheDir = tempfile.mkdtemp()
+  try:
+    print "%-25s %12s %14s %12s %8s" % ("params", "create ms", "template ms",
+                                        "clone ms", "speedup")
+    for name in options.params.split(","):
+      times = timeCreation(_PARAMS[name](), options.numModels, cacheDir)
+      print "%-25s %12.1f %14.1f %12.1f %7.1fx" % (
+        name, times["create"] * 1000.0, times["template"] * 1000.0,
+        times["clone"] * 1000.0, times["create"] / max(times["clone"], 1e-9))
+  finally:
+    shutil.rmtree(cacheDir, ignore_errors=True)
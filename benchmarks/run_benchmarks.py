@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Benchmark the end to end throughput of the example pipelines on the bundled
+datasets. For every run this reports records/second, the p50/p95/p99 latency
+of a single record, the time spent in each stage of the record loop and the
+peak resident memory, and appends the results as one JSON line to a results
+file so that runs can be compared over time.
+
+Each benchmark runs in its own process, so that peak memory is measured per
+benchmark and the model_params modules of the different directories don't
+clash.
+"""
+
+from optparse import OptionParser
+import datetime
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import Queue
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy
+
+
+_REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, _REPO_DIR)
+from common.instrumentation import Instrumentation
+
+_PIPELINES = ["run_anomaly", "hotgym", "classification"]
+
+
+def _runAnomalyBenchmark(dataFile, outputDir, instrumentation):
+  from run_anomaly import runAnomaly
+  from run_parallel import loadManifest
+
+  # Use the same min/max settings as the manifest for this data file
+  for options in loadManifest("manifest.json"):
+    if os.path.basename(options.inputFile) == dataFile:
+      break
+  else:
+    raise ValueError("%s is not in run_anomaly/manifest.json" % dataFile)
+  options.outputFile = os.path.join(outputDir, "anomaly_scores.csv")
+  runAnomaly(options, instrumentation=instrumentation)
+
+
+def _hotgymBenchmark(outputDir, instrumentation):
+  from hotgym import runHotgym
+  runHotgym(os.path.join(outputDir, "output.csv"),
+            instrumentation=instrumentation)
+
+
+def _classificationBenchmark(outputDir, instrumentation):
+  from classify_anomalies import classifyAnomaliesManually
+  classifyAnomaliesManually(os.path.join(outputDir, "anomaly_scores.csv"),
+                            instrumentation=instrumentation)
+
+
+def listBenchmarks(pipelines):
+  """
+  :param pipelines: list of pipeline names to include
+
+  :return: list of (name, directory, function, args) tuples
+  """
+  benchmarks = []
+  if "run_anomaly" in pipelines:
+    dataFiles = glob.glob(os.path.join(_REPO_DIR, "run_anomaly", "data", "*.csv"))
+    for dataFile in sorted(dataFiles):
+      dataFile = os.path.basename(dataFile)
+      benchmarks.append(("run_anomaly/" + dataFile, "run_anomaly",
+                         _runAnomalyBenchmark, (dataFile,)))
+  if "hotgym" in pipelines:
+    benchmarks.append(("ensembles/hotgym", "ensembles", _hotgymBenchmark, ()))
+  if "classification" in pipelines:
+    benchmarks.append(("anomaly_classification/test1",
+                       "anomaly_classification", _classificationBenchmark, ()))
+  return benchmarks
+
+
+def _benchmarkProcess(directory, function, args, resultQueue):
+  """
+  Run one benchmark inside a child process and put its measurements on the
+  result queue.
+  """
+  result = {}
+  outputDir = tempfile.mkdtemp()
+  try:
+    os.chdir(os.path.join(_REPO_DIR, directory))
+    sys.path.insert(0, os.getcwd())
+    instrumentation = Instrumentation(keepLatencies=True)
+    startTime = time.time()
+    function(*(args + (outputDir, instrumentation)))
+    result["wallSeconds"] = time.time() - startTime
+    result.update(summarizeLatencies(instrumentation))
+  except Exception:
+    result["error"] = traceback.format_exc()
+  finally:
+    shutil.rmtree(outputDir, ignore_errors=True)
+
+  # ru_maxrss is in kilobytes on Linux
+  result["peakRssMB"] = resource.getrusage(
+    resource.RUSAGE_SELF).ru_maxrss / 1024.0
+  resultQueue.put(result)
+
+
+def summarizeLatencies(instrumentation):
+  """
+  :return: dict with the throughput, latency percentiles and per stage
+    timings of an Instrumentation created with keepLatencies=True
+  """
+  latencies = numpy.array(instrumentation.latencies)
+  if len(latencies) == 0:
+    return {"numRecords": 0}
+  loopSeconds = instrumentation.lastRecord - instrumentation.startTime
+  p50, p95, p99 = numpy.percentile(latencies, [50, 95, 99])
+  return {"numRecords": len(latencies) + 1,
+          "loopSeconds": loopSeconds,
+          "recordsPerSecond": len(latencies) / max(loopSeconds, 1e-9),
+          "latencyMs": {"p50": p50 * 1000.0,
+                        "p95": p95 * 1000.0,
+                        "p99": p99 * 1000.0,
+                        "max": latencies.max() * 1000.0},
+          "stages": instrumentation.summary()["stages"]}
+
+
+def _waitForResult(process, resultQueue, pollSeconds=1.0):
+  """
+  Wait for the result of a benchmark process. If the process dies without
+  putting one on the queue, e.g. after a segfault or being killed for using
+  too much memory, return an error result with its exit code instead of
+  waiting forever.
+  """
+  while True:
+    try:
+      return resultQueue.get(timeout=pollSeconds)
+    except Queue.Empty:
+      if not process.is_alive():
+        break
+  # The process may have put its result just before exiting
+  try:
+    return resultQueue.get(timeout=pollSeconds)
+  except Queue.Empty:
+    return {"error": "Benchmark process died with exit code %s (a negative "
+                     "code is the signal that killed it)" % process.exitcode,
+            "exitCode": process.exitcode}
+
+
+def runBenchmarks(pipelines):
+  """
+  Run the benchmarks for the given pipelines one after the other.
+
+  :return: a dict describing the run, with one entry per benchmark
+  """
+  results = []
+  for name, directory, function, args in listBenchmarks(pipelines):
+    print "Running",name,"..."
+    resultQueue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+      target=_benchmarkProcess, args=(directory, function, args, resultQueue))
+    process.start()
+    result = _waitForResult(process, resultQueue)
+    process.join()
+    result["name"] = name
+    results.append(result)
+    printResult(result)
+
+  return {"timestamp": datetime.datetime.now().isoformat(),
+          "host": platform.node(),
+          "commit": _gitCommit(),
+          "results": results}
+
+
+def printResult(result):
+  if "error" in result:
+    print "  FAILED"
+    print result["error"]
+  elif result["numRecords"] > 0:
+    print ("  %d records, %.1f records/sec, latency p50=%.2fms p95=%.2fms "
+           "p99=%.2fms, peak RSS %.0fMB" % (
+      result["numRecords"], result["recordsPerSecond"],
+      result["latencyMs"]["p50"], result["latencyMs"]["p95"],
+      result["latencyMs"]["p99"], result["peakRssMB"]))
+    for stage in result["stages"]:
+      print "    %-20s %8.1fs total, mean %.3fms" % (
+        stage["name"], stage["totalSeconds"], stage["meanMs"])
+
+
+def compareRuns(previous, current):
+  """
+  Print the change in throughput of every benchmark relative to a previous
+  run.
+  """
+  previousResults = dict((r["name"], r) for r in previous["results"])
+  print
+  print "Compared to the run of",previous["timestamp"],"(commit %s):" % (
+    previous.get("commit"))
+  for result in current["results"]:
+    before = previousResults.get(result["name"])
+    if (before is None or "recordsPerSecond" not in before
+        or "recordsPerSecond" not in result):
+      continue
+    change = 100.0 * (result["recordsPerSecond"] /
+                      before["recordsPerSecond"] - 1.0)
+    print "  %-50s %10.1f -> %10.1f records/sec (%+.1f%%)" % (
+      result["name"], before["recordsPerSecond"], result["recordsPerSecond"],
+      change)
+
+
+def _gitCommit():
+  try:
+    return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                   cwd=_REPO_DIR).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nBenchmarks the example pipelines on the bundled datasets and appends"
+    "\nthe results to a JSON lines file."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--pipelines", default=",".join(_PIPELINES),
+      help="Comma separated list of pipelines to benchmark. "
+      "[default: %default]")
+  parser.add_option("--resultsFile", default="benchmark_results.jsonl",
+      help="Results are appended to this file. [default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+
+  previous = None
+  if os.path.exists(options.resultsFile):
+    with open(options.resultsFile) as fp:
+      lines = fp.read().splitlines()
+    if lines:
+      previous = json.loads(lines[-1])
+
+  run = runBenchmarks(options.pipelines.split(","))
+  with open(options.resultsFile, "a") as fp:
+    fp.write(json.dumps(run) + "\n")
+  print "Results appended to",options.resultsFile
+
+  if previous is not None:
+    compareRuns(previous, run)
@@ -0,0 +1,290 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Fast CSV ingestion. Instead of building a dict and parsing every field of
+every row as it is fed to a model, a whole file (or a chunk of it) is parsed
+up front into typed column arrays. Floats are converted by numpy in a single
+call and ISO 8601 timestamps are parsed in a single call to numpy.datetime64.
+Timestamps with a declared strptime format made of numeric fields, like
+"%m/%d/%y %H:%M", are split into their fields with one regular expression over
+the whole column and assembled with datetime64 arithmetic. Only rows that fail
+the fast paths are parsed with strptime or dateutil.
+"""
+
+import csv
+import datetime
+import itertools
+import re
+
+import dateutil.parser
+import numpy
+
+
+# ISO 8601 timestamps with a UTC offset or "Z". numpy would silently convert
+# these to naive UTC times, so they are left to dateutil, which keeps the
+# time zone.
+_TIMEZONE_PATTERN = re.compile(
+  r"\d:\d\d(:\d\d(\.\d*)?)?\s*(Z|[+-]\d\d(:?\d\d)?)\s*$", re.MULTILINE)
+
+# Regular expressions for the strptime directives of the vectorized path
+_DIRECTIVE_PATTERNS = {
+  "Y": r"(\d{4})",
+  "y": r"(\d{2})",
+  "m": r"(\d{1,2})",
+  "d": r"(\d{1,2})",
+  "H": r"(\d{1,2})",
+  "M": r"(\d{1,2})",
+  "S": r"(\d{1,2})",
+  "f": r"(\d{1,6})",
+}
+
+# Valid range of every directive, as strptime checks it
+_DIRECTIVE_RANGES = {
+  "m": (1, 12),
+  "d": (1, 31),
+  "H": (0, 23),
+  "M": (0, 59),
+  "S": (0, 61),
+}
+
+
+def _compileFormat(timestampFormat):
+  """
+  Translate a strptime format into a regular expression matching one
+  timestamp per line.
+
+  :return: (compiled pattern, list of the directives of its groups), or None
+    if the format contains directives the vectorized path doesn't handle
+  """
+  pattern = ["^"]
+  directives = []
+  for literal, directive in re.findall(r"([^%]*)(%.|$)", timestampFormat):
+    pattern.append(re.escape(literal))
+    if directive == "%%":
+      pattern.append("%")
+    elif directive:
+      if directive[1] not in _DIRECTIVE_PATTERNS:
+        return None
+      if directive[1] in directives or (directive[1] in "Yy" and
+                                        ("Y" in directives or
+                                         "y" in directives)):
+        return None
+      pattern.append(_DIRECTIVE_PATTERNS[directive[1]])
+      directives.append(directive[1])
+  pattern.append("$")
+  if not ("Y" in directives or "y" in directives):
+    return None
+  return re.compile("".join(pattern), re.MULTILINE), directives
+
+
+def _parseFormatted(strings, timestampFormat):
+  """
+  Vectorized strptime for formats made of numeric directives.
+
+  :return: numpy datetime64[us] array, or None if the format or any of the
+    strings can't be handled by the vectorized path
+  """
+  compiled = _compileFormat(timestampFormat)
+  if compiled is None or any("\n" in s for s in strings):
+    return None
+  pattern, directives = compiled
+  matches = pattern.findall("\n".join(strings))
+  if len(matches) != len(strings):
+    return None
+  if len(directives) == 1:
+    matches = [(match,) for match in matches]
+  fields = dict(zip(directives, zip(*matches)))
+
+  values = {}
+  for directive, digits in fields.iteritems():
+    digits = numpy.array(digits)
+    if directive == "f":
+      # Fractions are right padded, "5" is 500000 microseconds
+      digits = numpy.char.ljust(digits, 6, "0")
+    values[directive] = digits.astype(numpy.int64)
+    if directive in _DIRECTIVE_RANGES:
+      low, high = _DIRECTIVE_RANGES[directive]
+      if (values[directive] < low).any() or (values[directive] > high).any():
+        return None
+  if "y" in values:
+    # Same pivot as strptime: 69-99 are 1969-1999, 00-68 are 2000-2068
+    years = values["y"] + numpy.where(values["y"] < 69, 2000, 1900)
+  else:
+    years = values["Y"]
+
+  months = (years - 1970) * 12 + values.get("m", 1) - 1
+  monthStarts = months.astype("datetime64[M]")
+  dates = monthStarts.astype("datetime64[D]") + (values.get("d", 1) - 1)
+  if (dates.astype("datetime64[M]") != monthStarts).any():
+    # A day past the end of its month
+    return None
+  microseconds = (((values.get("H", 0) * 60 + values.get("M", 0)) * 60 +
+                   values.get("S", 0)) * 1000000 + values.get("f", 0))
+  return dates.astype("datetime64[us]") + microseconds
+
+
+def parseTimestamps(strings, timestampFormat=None):
+  """
+  Parse a sequence of timestamp strings.
+
+  :param strings: sequence of timestamp strings
+  :param timestampFormat: strptime format of the timestamps. If None the
+    timestamps are assumed to be ISO 8601 (e.g. "2013-12-02 21:15:00") and the
+    whole column is parsed with one numpy call. ISO timestamps with a UTC
+    offset or "Z" are parsed with dateutil into time zone aware datetimes.
+
+  :return: a numpy object array of datetime.datetime objects
+  """
+  if timestampFormat is None:
+    hasTimezone = _TIMEZONE_PATTERN.search("\n".join(strings)) is not None
+    if not hasTimezone:
+      try:
+        parsed = numpy.array(strings, dtype="datetime64[us]")
+        return parsed.astype(object)
+      except ValueError:
+        pass
+  else:
+    parsed = _parseFormatted(strings, timestampFormat)
+    if parsed is not None:
+      return parsed.astype(object)
+
+  timestamps = numpy.empty(len(strings), dtype=object)
+  for i, s in enumerate(strings):
+    try:
+      if timestampFormat is not None:
+        timestamps[i] = datetime.datetime.strptime(s, timestampFormat)
+      elif _TIMEZONE_PATTERN.search(s) is None:
+        timestamps[i] = numpy.datetime64(s, "us").astype(datetime.datetime)
+      else:
+        timestamps[i] = dateutil.parser.parse(s)
+    except ValueError:
+      timestamps[i] = dateutil.parser.parse(s)
+
+  return timestamps
+
+
+def _toColumns(headers, rows, fieldTypes, timestampFormat, instrumentation):
+  """
+  Convert a list of rows into a dict of typed column arrays.
+  """
+  if fieldTypes is None:
+    fieldTypes = dict((name, "string") for name in headers)
+
+  columnValues = zip(*rows) if rows else [()] * len(headers)
+  columns = {}
+  for name, fieldType in fieldTypes.iteritems():
+    values = columnValues[headers.index(name)]
+    if fieldType == "float":
+      columns[name] = numpy.array(values, dtype=numpy.float64)
+    elif fieldType == "int":
+      columns[name] = numpy.array(values, dtype=numpy.int64)
+    elif fieldType == "datetime":
+      if instrumentation is not None:
+        instrumentation.mark("convert")
+      columns[name] = parseTimestamps(values, timestampFormat)
+      if instrumentation is not None:
+        instrumentation.mark("timestamps")
+    elif fieldType == "string":
+      columns[name] = numpy.array(values, dtype=object)
+    else:
+      raise ValueError("Unknown field type %r for field %s" % (fieldType, name))
+
+  if instrumentation is not None:
+    instrumentation.mark("convert")
+  return columns
+
+
+def readColumnChunks(path, fieldTypes=None, timestampFormat=None, skipRows=0,
+                     chunkSize=10000, instrumentation=None):
+  """
+  Read a CSV file with a header row in chunks of typed columns. Memory use is
+  bounded by chunkSize rows regardless of the size of the file.
+
+  :param path: path to the CSV file
+  :param fieldTypes: dict mapping field names to one of "float", "int",
+    "datetime" or "string". Only these fields are returned. If None all fields
+    are returned as strings.
+  :param timestampFormat: strptime format for "datetime" fields, or None for
+    ISO 8601 timestamps
+  :param skipRows: number of rows to skip after the header row (e.g. the type
+    and flag rows of OPF files)
+  :param chunkSize: maximum number of rows per chunk
+  :param instrumentation: optional common.instrumentation.Instrumentation.
+    The time spent reading CSV rows, parsing timestamps and converting the
+    other fields is charged to the "csv", "timestamps" and "convert" stages.
+
+  :return: a generator of dicts mapping field names to numpy arrays
+  """
+  with open(path) as fin:
+    reader = csv.reader(fin)
+    headers = reader.next()
+    for _ in range(skipRows):
+      reader.next()
+
+    while True:
+      if instrumentation is not None:
+        instrumentation.mark("read")
+      rows = list(itertools.islice(reader, chunkSize))
+      if not rows:
+        break
+      if instrumentation is not None:
+        instrumentation.mark("csv")
+      yield _toColumns(headers, rows, fieldTypes, timestampFormat,
+                       instrumentation)
+
+
+def readColumns(path, fieldTypes=None, timestampFormat=None, skipRows=0,
+                instrumentation=None):
+  """
+  Read a whole CSV file into typed columns. See readColumnChunks() for a
+  description of the parameters.
+
+  :return: a dict mapping field names to numpy arrays
+  """
+  if instrumentation is not None:
+    instrumentation.mark("read")
+  with open(path) as fin:
+    reader = csv.reader(fin)
+    headers = reader.next()
+    for _ in range(skipRows):
+      reader.next()
+    rows = list(reader)
+    if instrumentation is not None:
+      instrumentation.mark("csv")
+    return _toColumns(headers, rows, fieldTypes, timestampFormat,
+                      instrumentation)
+
+
+def iterRecords(columns):
+  """
+  Iterate over the rows of a dict of columns, yielding one small dict per row
+  that can be passed directly to model.run(). Values are plain Python floats,
+  ints, strings and datetimes.
+
+  :param columns: dict mapping field names to numpy arrays
+
+  :return: a generator of dicts, one per row
+  """
+  names = columns.keys()
+  values = [columns[name].tolist() for name in names]
+  for rowValues in itertools.izip(*values):
+    yield dict(itertools.izip(names, rowValues))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for columnar_reader.py.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from columnar_reader import iterRecords, parseTimestamps, readColumnChunks
+
+
+
+class ParseTimestampsTest(unittest.TestCase):
+
+  def testISO(self):
+    strings = ["2013-12-02 21:15:00", "2013-12-02T21:20:30.25", "2013-12-03"]
+    self.assertEqual(list(parseTimestamps(strings)),
+                     [datetime.datetime(2013, 12, 2, 21, 15),
+                      datetime.datetime(2013, 12, 2, 21, 20, 30, 250000),
+                      datetime.datetime(2013, 12, 3)])
+
+
+  def testISOWithTimezoneKeepsTimezone(self):
+    timestamps = parseTimestamps(["2013-12-02 21:15:00",
+                                  "2013-12-02T21:15:00-08:00",
+                                  "2013-12-02T21:15:00Z"])
+    self.assertIsNone(timestamps[0].tzinfo)
+    self.assertEqual(timestamps[1].utcoffset(), datetime.timedelta(hours=-8))
+    self.assertEqual(timestamps[1].replace(tzinfo=None),
+                     datetime.datetime(2013, 12, 2, 21, 15))
+    self.assertEqual(timestamps[2].utcoffset(), datetime.timedelta(0))
+
+
+  def testISOFallsBackToDateutil(self):
+    self.assertEqual(list(parseTimestamps(["Dec 2 2013 9:15 PM"])),
+                     [datetime.datetime(2013, 12, 2, 21, 15)])
+
+
+  def testDeclaredFormatMatchesStrptime(self):
+    timestampFormat = "%m/%d/%y %H:%M"
+    strings = ["7/2/10 0:00", "07/02/10 23:59", "12/31/99 12:30",
+               "2/29/12 1:05", "1/1/68 0:00", "1/1/69 0:00"]
+    self.assertEqual(list(parseTimestamps(strings, timestampFormat)),
+                     [datetime.datetime.strptime(s, timestampFormat)
+                      for s in strings])
+
+
+  def testDeclaredFormatWithFractions(self):
+    timestampFormat = "%Y-%m-%d %H:%M:%S.%f"
+    strings = ["2013-12-02 21:15:00.5", "2013-12-02 21:15:01.000250"]
+    self.assertEqual(list(parseTimestamps(strings, timestampFormat)),
+                     [datetime.datetime.strptime(s, timestampFormat)
+                      for s in strings])
+
+
+  def testDeclaredFormatRejectsInvalidDates(self):
+    with self.assertRaises(ValueError):
+      parseTimestamps(["7/2/10 0:00", "2/30/12 1:05"], "%m/%d/%y %H:%M")
+
+
+  def testUnsupportedDirectivesUseStrptime(self):
+    self.assertEqual(list(parseTimestamps(["Dec 02 2013"], "%b %d %Y")),
+                     [datetime.datetime(2013, 12, 2)])
+
+
+
+class ReadColumnsTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpDir, "data.csv")
+    with open(self.path, "w") as fp:
+      fp.write("timestamp,kw_energy_consumption\n"
+               "datetime,float\n"
+               "T,\n")
+      for i in range(25):
+        fp.write("7/%d/10 %d:00,%d.5\n" % (i + 1, i % 24, i))
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def testChunks(self):
+    chunks = list(readColumnChunks(
+      self.path, {"timestamp": "datetime", "kw_energy_consumption": "float"},
+      timestampFormat="%m/%d/%y %H:%M", skipRows=2, chunkSize=10))
+    self.assertEqual([len(c["timestamp"]) for c in chunks], [10, 10, 5])
+    records = [r for c in chunks for r in iterRecords(c)]
+    self.assertEqual(records[3], {
+      "timestamp": datetime.datetime(2010, 7, 4, 3),
+      "kw_energy_consumption": 3.5})
+    numpy.testing.assert_array_equal(
+      numpy.concatenate([c["kw_energy_consumption"] for c in chunks]),
+      numpy.arange(25) + 0.5)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,248 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Low overhead timing of the stages of a record loop. The loop calls
+mark(stageName) at the end of every stage, which charges the time since the
+previous mark to that stage, and recordProcessed() at the end of every record.
+Time spent in between records (e.g. reading the next record) is charged to
+whatever stage is marked first in the next record.
+
+Each stage keeps a count, a total and a histogram with power of two buckets
+in microseconds, so the cost per mark is one call to time.time() and a few
+additions. A summary can be printed periodically or served as JSON over HTTP
+on localhost.
+"""
+
+import BaseHTTPServer
+import json
+import sys
+import threading
+import time
+
+
+# Bucket b holds durations in [2^(b-1), 2^b) microseconds. The last bucket
+# holds everything above about a minute.
+_NUM_BUCKETS = 28
+
+
+class _Stage(object):
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+    self.histogram = [0] * _NUM_BUCKETS
+
+
+  def add(self, seconds):
+    self.count += 1
+    self.total += seconds
+    if seconds > self.max:
+      self.max = seconds
+    bucket = int(seconds * 1e6).bit_length()
+    self.histogram[min(bucket, _NUM_BUCKETS - 1)] += 1
+
+
+  def percentile(self, q):
+    """
+    Upper bound, in seconds, of the histogram bucket containing the q'th
+    percentile.
+    """
+    target = q / 100.0 * self.count
+    cumulative = 0
+    for bucket, n in enumerate(self.histogram):
+      cumulative += n
+      if n > 0 and cumulative >= target:
+        return min((1 << bucket) / 1e6, self.max)
+    return self.max
+
+
+  def summary(self):
+    return {"count": self.count,
+            "totalSeconds": self.total,
+            "meanMs": 1000.0 * self.total / max(self.count, 1),
+            "p50Ms": 1000.0 * self.percentile(50),
+            "p99Ms": 1000.0 * self.percentile(99),
+            "maxMs": 1000.0 * self.max}
+
+
+
+class Instrumentation(object):
+  """
+  Collects per stage and per record timings for a record loop.
+  """
+
+  def __init__(self, reportInterval=None, stream=sys.stderr,
+               keepLatencies=False):
+    """
+    :param reportInterval: if set, print a summary to stream every this many
+      seconds
+    :param stream: where periodic summaries are printed
+    :param keepLatencies: if True also keep the exact latency of every record
+      in self.latencies, e.g. to compute exact percentiles
+    """
+    self.reportInterval = reportInterval
+    self.stream = stream
+    self.keepLatencies = keepLatencies
+    self.latencies = []
+    self.stages = {}
+    self.stageOrder = []
+    self.record = _Stage()
+    self.startTime = None
+    self.lastMark = None
+    self.lastRecord = None
+    self.lastReport = time.time()
+    self._lock = threading.Lock()
+
+
+  def mark(self, stageName):
+    """
+    Charge the time since the previous mark to stageName. The very first
+    mark only starts the clock.
+    """
+    now = time.time()
+    if self.lastMark is not None:
+      stage = self.stages.get(stageName)
+      if stage is None:
+        with self._lock:
+          stage = self.stages[stageName] = _Stage()
+          self.stageOrder.append(stageName)
+      stage.add(now - self.lastMark)
+    self.lastMark = now
+
+
+  def recordProcessed(self):
+    """
+    Mark the end of a record. The first call only starts the clock, so the
+    latency of a record is the time between two successive calls.
+    """
+    now = time.time()
+    if self.lastRecord is None:
+      self.startTime = now
+    else:
+      latency = now - self.lastRecord
+      self.record.add(latency)
+      if self.keepLatencies:
+        self.latencies.append(latency)
+    self.lastRecord = now
+    self.lastMark = now
+
+    if self.reportInterval and now - self.lastReport >= self.reportInterval:
+      self.printSummary()
+      self.lastReport = now
+
+
+  def summary(self):
+    """
+    :return: a dict with the per record and per stage timings
+    """
+    with self._lock:
+      stageOrder = list(self.stageOrder)
+    elapsed = (self.lastRecord - self.startTime) if self.startTime else 0.0
+    return {"numRecords": self.record.count,
+            "recordsPerSecond": self.record.count / max(elapsed, 1e-9),
+            "record": self.record.summary(),
+            "stages": [dict(self.stages[name].summary(), name=name)
+                       for name in stageOrder]}
+
+
+  def printSummary(self, stream=None):
+    """
+    Print a table with the time spent in each stage. Percentiles are
+    approximate: they are the upper bound of a power of two histogram bucket.
+    """
+    stream = stream or self.stream
+    summary = self.summary()
+    totalTime = sum(s["totalSeconds"] for s in summary["stages"])
+    print >>stream, "%d records, %.1f records/sec" % (
+      summary["numRecords"], summary["recordsPerSecond"])
+    print >>stream, "%-20s %10s %10s %10s %10s %8s" % (
+      "stage", "mean ms", "p50 ms", "p99 ms", "max ms", "% time")
+    for stage in summary["stages"]:
+      print >>stream, "%-20s %10.3f %10.3f %10.3f %10.3f %8.1f" % (
+        stage["name"], stage["meanMs"], stage["p50Ms"], stage["p99Ms"],
+        stage["maxMs"], 100.0 * stage["totalSeconds"] / max(totalTime, 1e-9))
+    record = summary["record"]
+    print >>stream, "%-20s %10.3f %10.3f %10.3f %10.3f" % (
+      "whole record", record["meanMs"], record["p50Ms"], record["p99Ms"],
+      record["maxMs"])
+
+
+  def serve(self, port, host="localhost"):
+    """
+    Serve the current summary as JSON at http://host:port/ from a background
+    thread.
+
+    :return: the HTTP server
+    """
+    instrumentation = self
+
+    class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+      def do_GET(self):
+        body = json.dumps(instrumentation.summary())
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+      def log_message(self, *args):
+        pass
+
+    server = BaseHTTPServer.HTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+
+class NullInstrumentation(object):
+  """
+  Does nothing. Used by record loops when instrumentation is disabled.
+  """
+
+  def mark(self, stageName):
+    pass
+
+
+  def recordProcessed(self):
+    pass
+
+
+  def summary(self):
+    return {"numRecords": 0, "recordsPerSecond": 0.0, "record": {},
+            "stages": []}
+
+
+  def printSummary(self, stream=None):
+    pass
+
+
+  def serve(self, port, host="localhost"):
+    """
+    Nothing is timed, so there is nothing to serve.
+
+    :return: None
+    """
+    return None
@@ -0,0 +1,108 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Cache of pristine models, one per set of model parameters. The first time a
+parameter set is seen the model is built with ModelFactory.create() and saved
+to the cache directory as a template. Later models with the same parameters
+are cloned from the template with ModelFactory.loadFromCheckpoint(), which
+skips building the network from the parameters. The templates are shared by
+all processes using the same cache directory and survive between runs.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+
+def _nupicVersion():
+  try:
+    import pkg_resources
+    return pkg_resources.get_distribution("nupic").version
+  except Exception:
+    return ""
+
+
+
+class ModelTemplateCache(object):
+  """
+  Creates models by cloning cached templates.
+  """
+
+  def __init__(self, cacheDir=None):
+    """
+    :param cacheDir: directory holding the templates. Defaults to
+      model_templates in the system temporary directory.
+    """
+    if cacheDir is None:
+      cacheDir = os.path.join(tempfile.gettempdir(), "model_templates")
+    self.cacheDir = cacheDir
+    self.nupicVersion = _nupicVersion()
+
+
+  def templateKey(self, modelParams):
+    """
+    :return: a hash identifying the parameters, and the NuPIC version since
+      templates saved by one version may not load in another
+    """
+    description = json.dumps(modelParams, sort_keys=True, default=repr)
+    return hashlib.sha1(self.nupicVersion + description).hexdigest()
+
+
+  def create(self, modelParams):
+    """
+    Create a model, like ModelFactory.create(modelParams). modelParams is not
+    modified.
+
+    :return: a new, untrained model
+    """
+    templateDir = os.path.join(self.cacheDir, self.templateKey(modelParams))
+    if os.path.isdir(templateDir):
+      return ModelFactory.loadFromCheckpoint(templateDir)
+
+    model = ModelFactory.create(copy.deepcopy(modelParams))
+    self._saveTemplate(model, templateDir)
+    return model
+
+
+  def _saveTemplate(self, model, templateDir):
+    # Save to a private directory first and rename it into place, so other
+    # processes never see a partially written template
+    if not os.path.isdir(self.cacheDir):
+      try:
+        os.makedirs(self.cacheDir)
+      except OSError:
+        # Created by another process in the meantime
+        pass
+    tmpDir = tempfile.mkdtemp(dir=self.cacheDir)
+    try:
+      model.save(os.path.join(tmpDir, "model"))
+      os.rename(os.path.join(tmpDir, "model"), templateDir)
+    except OSError:
+      # Another process saved the same template first
+      pass
+    finally:
+      shutil.rmtree(tmpDir, ignore_errors=True)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for model_cache.py, with a stand-in for NuPIC's ModelFactory. They
+need NuPIC to import model_cache and are skipped without it.
+"""
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+  import model_cache
+except ImportError:
+  model_cache = None
+
+
+
+class _StubModel(object):
+
+  def __init__(self, params, loaded=False):
+    self.params = params
+    self.loaded = loaded
+
+
+  def save(self, saveDir):
+    os.makedirs(saveDir)
+    with open(os.path.join(saveDir, "params"), "w") as fp:
+      fp.write(repr(self.params))
+
+
+
+class _StubModelFactory(object):
+
+  created = []
+  loaded = []
+
+
+  @classmethod
+  def create(cls, modelParams):
+    cls.created.append(modelParams)
+    return _StubModel(modelParams)
+
+
+  @classmethod
+  def loadFromCheckpoint(cls, saveDir):
+    cls.loaded.append(saveDir)
+    with open(os.path.join(saveDir, "params")) as fp:
+      return _StubModel(eval(fp.read()), loaded=True)
+
+
+
+@unittest.skipIf(model_cache is None, "NuPIC is not installed")
+class ModelTemplateCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.modelFactory = model_cache.ModelFactory
+    _StubModelFactory.created = []
+    _StubModelFactory.loaded = []
+    model_cache.ModelFactory = _StubModelFactory
+    self.cache = model_cache.ModelTemplateCache(
+      os.path.join(self.tmpDir, "templates"))
+
+
+  def tearDown(self):
+    model_cache.ModelFactory = self.modelFactory
+    shutil.rmtree(self.tmpDir)
+
+
+  def testTemplateKeyIgnoresDictOrder(self):
+    items = [("model", "CLA"), ("version", 1),
+             ("modelParams", {"a": 1, "b": [1, 2], "c": {"d": 0.5}})]
+    params = collections.OrderedDict(items)
+    reordered = collections.OrderedDict(reversed(items))
+    self.assertNotEqual(params.keys(), reordered.keys())
+    self.assertEqual(self.cache.templateKey(params),
+                     self.cache.templateKey(reordered))
+
+
+  def testTemplateKeyChangesWithParams(self):
+    params = {"modelParams": {"spParams": {"seed": 1956}}}
+    otherParams = {"modelParams": {"spParams": {"seed": 1957}}}
+    self.assertNotEqual(self.cache.templateKey(params),
+                        self.cache.templateKey(otherParams))
+
+
+  def testSecondCreateLoadsTemplate(self):
+    params = {"modelParams": {"spParams": {"seed": 1956}}}
+    first = self.cache.create(params)
+    self.assertFalse(first.loaded)
+    self.assertEqual(len(_StubModelFactory.created), 1)
+    # The factory gets a copy, the caller's parameters are not modified
+    self.assertIsNot(_StubModelFactory.created[0], params)
+
+    second = self.cache.create(params)
+    self.assertTrue(second.loaded)
+    self.assertEqual(second.params, params)
+    self.assertEqual(len(_StubModelFactory.created), 1)
+    self.assertEqual(_StubModelFactory.loaded,
+                     [os.path.join(self.cache.cacheDir,
+                                   self.cache.templateKey(params))])
+
+
+  def testSaveTemplateToleratesExistingTemplate(self):
+    # Another process renamed its template into place first
+    params = {"modelParams": {"spParams": {"seed": 1956}}}
+    templateDir = os.path.join(self.cache.cacheDir,
+                               self.cache.templateKey(params))
+    _StubModel(params).save(templateDir)
+    with open(os.path.join(templateDir, "marker"), "w") as fp:
+      fp.write("first")
+
+    self.cache._saveTemplate(_StubModel(params), templateDir)
+
+    # The existing template is kept and no temporary directory is left
+    self.assertTrue(os.path.isfile(os.path.join(templateDir, "marker")))
+    self.assertEqual(os.listdir(self.cache.cacheDir),
+                     [os.path.basename(templateDir)])
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,294 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Result sinks for writing model output one row at a time. BufferedCsvSink
+writes CSV files in blocks of rows. NpzSink stores each field as a numpy array
+in a .npz file, which avoids formatting every number as text and is much
+faster to load back for analysis. Use createSink() to pick one based on the
+file extension.
+"""
+
+import csv
+import datetime
+import os
+
+import numpy
+
+
+class BufferedCsvSink(object):
+  """
+  Writes rows to a CSV file, buffering them and writing them in blocks.
+  """
+
+  def __init__(self, path, fieldNames, bufferSize=1000, append=False):
+    """
+    :param path: path of the output file
+    :param fieldNames: list of column names, written as the header row
+    :param bufferSize: number of rows to buffer before writing them out
+    :param append: if True, append to an existing file and do not write the
+      header row
+    """
+    self.path = path
+    self.fieldNames = fieldNames
+    self.bufferSize = bufferSize
+    self._file = open(path, "ab" if append else "wb")
+    self._writer = csv.writer(self._file)
+    self._buffer = []
+    if not append:
+      self._writer.writerow(fieldNames)
+
+
+  def write(self, row):
+    """
+    Add a row. The row must have one value per field name.
+    """
+    self._buffer.append(row)
+    if len(self._buffer) >= self.bufferSize:
+      self._writer.writerows(self._buffer)
+      self._buffer = []
+
+
+  def flush(self):
+    """
+    Write out all buffered rows and flush the file.
+    """
+    self._writer.writerows(self._buffer)
+    self._buffer = []
+    self._file.flush()
+
+
+  def close(self):
+    self.flush()
+    self._file.close()
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    self.close()
+
+
+
+class NpzSink(object):
+  """
+  Stores rows as one numpy array per field and saves them to a .npz file.
+  Rows are converted to arrays in blocks, so memory use is close to that of
+  the final arrays. Datetime fields are stored as datetime64[us] arrays and
+  missing (None) values in numeric fields as NaN.
+
+  flush() only saves the rows written since the previous flush, to a part
+  file next to the output file, so flushing costs time proportional to the
+  new rows rather than to everything written so far. close() merges the parts
+  into the .npz file. Use loadNpz() to read the output of a sink that wasn't
+  closed, e.g. after a crash.
+  """
+
+  def __init__(self, path, fieldNames, blockSize=10000, append=False):
+    """
+    :param path: path of the output .npz file
+    :param fieldNames: list of field names, used as the array names
+    :param blockSize: number of rows to collect before converting to arrays
+    :param append: if True, and the file exists, keep the arrays already
+      stored in it and append new rows to them
+    """
+    self.path = path
+    self.fieldNames = fieldNames
+    self.blockSize = blockSize
+    self._rows = []
+    self._blocks = dict((name, []) for name in fieldNames)
+    self._unsaved = dict((name, []) for name in fieldNames)
+    if append:
+      existing = loadNpz(path)
+      for name in fieldNames:
+        if name in existing:
+          self._blocks[name].append(existing[name])
+    _removeParts(path)
+    self._numParts = 0
+
+
+  def write(self, row):
+    """
+    Add a row. The row must have one value per field name.
+    """
+    self._rows.append(row)
+    if len(self._rows) >= self.blockSize:
+      self._convertRows()
+
+
+  def flush(self):
+    """
+    Save the rows written since the last flush to a new part file. Every file
+    is written under a temporary name and then renamed, so readers never see
+    a partially written file.
+    """
+    self._convertRows()
+    if not any(self._unsaved.itervalues()):
+      return
+    arrays = dict((name, _concatenate(blocks))
+                  for name, blocks in self._unsaved.iteritems())
+    _saveNpz(_partPath(self.path, self._numParts), arrays)
+    self._numParts += 1
+    self._unsaved = dict((name, []) for name in self.fieldNames)
+
+
+  def close(self):
+    """
+    Save all rows to the .npz file and remove the part files.
+    """
+    self._convertRows()
+    arrays = dict((name, _concatenate(self._blocks[name]))
+                  for name in self.fieldNames)
+    _saveNpz(self.path, arrays)
+    _removeParts(self.path)
+    self._numParts = 0
+    self._unsaved = dict((name, []) for name in self.fieldNames)
+
+
+  def __enter__(self):
+    return self
+
+
+  def __exit__(self, *args):
+    self.close()
+
+
+  def _convertRows(self):
+    if not self._rows:
+      return
+    for name, values in zip(self.fieldNames, zip(*self._rows)):
+      block = _toArray(values)
+      self._blocks[name].append(block)
+      self._unsaved[name].append(block)
+    self._rows = []
+
+
+
+def _toArray(values):
+  """
+  Convert the values of one field to a numpy array that numpy.load() can
+  read without allow_pickle, i.e. not an object array.
+  """
+  if isinstance(values[0], datetime.datetime):
+    return numpy.array(values, dtype="datetime64[us]")
+  if any(value is None for value in values):
+    try:
+      # float() of None fails but numpy turns it into NaN
+      return numpy.array(values, dtype=numpy.float64)
+    except (TypeError, ValueError):
+      values = ["" if value is None else value for value in values]
+  return numpy.array(values)
+
+
+def _concatenate(blocks):
+  if not blocks:
+    return numpy.array([])
+  return numpy.concatenate(blocks)
+
+
+def _saveNpz(path, arrays):
+  tmpPath = path + ".tmp.npz"
+  numpy.savez(tmpPath, **arrays)
+  os.rename(tmpPath, path)
+
+
+def _partPath(path, partNumber):
+  return "%s.part%06d.npz" % (path, partNumber)
+
+
+def _partPaths(path):
+  directory, name = os.path.split(path)
+  prefix = name + ".part"
+  return sorted(os.path.join(directory, fileName)
+                for fileName in os.listdir(directory or os.curdir)
+                if fileName.startswith(prefix) and fileName.endswith(".npz") and
+                fileName[len(prefix):-len(".npz")].isdigit())
+
+
+def _removeParts(path):
+  for partPath in _partPaths(path):
+    os.remove(partPath)
+
+
+def loadNpz(path):
+  """
+  Load the arrays written by an NpzSink, including the rows of any flushes
+  that haven't been merged into the .npz file yet because the sink wasn't
+  closed.
+
+  :param path: path of the .npz file
+  :return: dict mapping field names to numpy arrays. Empty if nothing was
+    written.
+  """
+  blocks = {}
+  paths = _partPaths(path)
+  if os.path.exists(path):
+    paths.insert(0, path)
+  for npzPath in paths:
+    npz = numpy.load(npzPath)
+    for name in npz.files:
+      blocks.setdefault(name, []).append(npz[name])
+    npz.close()
+  return dict((name, _concatenate(arrays))
+              for name, arrays in blocks.iteritems())
+
+
+def truncateOutput(path, numRows):
+  """
+  Truncate an existing output file written by one of the sinks so that it
+  contains only its first numRows rows. This is used when resuming from a
+  checkpoint, since rows written after the checkpoint will be recomputed.
+
+  :param path: path of the output file
+  :param numRows: number of rows to keep (not counting a CSV header row)
+  """
+  if path.endswith(".npz"):
+    arrays = loadNpz(path)
+    if arrays:
+      _saveNpz(path, dict((name, array[:numRows])
+                          for name, array in arrays.iteritems()))
+    _removeParts(path)
+    return
+
+  if not os.path.exists(path):
+    return
+  with open(path, "rb") as fp:
+    lines = fp.readlines()
+  with open(path, "wb") as fp:
+    fp.writelines(lines[:numRows + 1])
+
+
+def createSink(path, fieldNames, append=False):
+  """
+  Create a sink for the given output path. Paths ending in .npz get an
+  NpzSink, everything else a BufferedCsvSink.
+
+  :param path: path of the output file
+  :param fieldNames: list of field names
+  :param append: append to an existing output file
+
+  :return: a sink with write(row), flush() and close() methods
+  """
+  if path.endswith(".npz"):
+    return NpzSink(path, fieldNames, append=append)
+  return BufferedCsvSink(path, fieldNames, append=append)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for result_sinks.py.
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from result_sinks import createSink, loadNpz, NpzSink, truncateOutput
+
+
+FIELDS = ["timestamp", "value", "label"]
+
+
+
+def _rows(start, stop):
+  return [[datetime.datetime(2014, 1, 1) + datetime.timedelta(minutes=i),
+           float(i), "r%d" % i] for i in range(start, stop)]
+
+
+
+class NpzSinkTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpDir, "out.npz")
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def assertRows(self, arrays, rows):
+    self.assertEqual(arrays["timestamp"].dtype, numpy.dtype("datetime64[us]"))
+    self.assertEqual(arrays["timestamp"].astype(object).tolist(),
+                     [row[0] for row in rows])
+    numpy.testing.assert_array_equal(arrays["value"],
+                                     [row[1] for row in rows])
+    self.assertEqual(arrays["label"].tolist(), [row[2] for row in rows])
+
+
+  def testRoundTrip(self):
+    rows = _rows(0, 25)
+    with createSink(self.path, FIELDS) as sink:
+      self.assertIsInstance(sink, NpzSink)
+      for row in rows:
+        sink.write(row)
+    npz = numpy.load(self.path)
+    self.assertRows(npz, rows)
+    npz.close()
+    self.assertEqual(os.listdir(self.tmpDir), ["out.npz"])
+
+
+  def testFlushWritesOnlyNewRows(self):
+    sink = NpzSink(self.path, FIELDS, blockSize=4)
+    for i, row in enumerate(_rows(0, 10)):
+      sink.write(row)
+      if i in (2, 6):
+        sink.flush()
+    # Each flush saved its own part, and nothing has been merged yet
+    self.assertEqual(sorted(os.listdir(self.tmpDir)),
+                     ["out.npz.part000000.npz", "out.npz.part000001.npz"])
+    self.assertRows(loadNpz(self.path), _rows(0, 7))
+    sink.close()
+    self.assertEqual(os.listdir(self.tmpDir), ["out.npz"])
+    self.assertRows(loadNpz(self.path), _rows(0, 10))
+
+
+  def testNoneIsStoredWithoutObjectArrays(self):
+    with NpzSink(self.path, ["value", "label"]) as sink:
+      sink.write([1.0, "a"])
+      sink.write([None, None])
+    npz = numpy.load(self.path, allow_pickle=False)
+    numpy.testing.assert_array_equal(npz["value"], [1.0, numpy.nan])
+    self.assertEqual(npz["label"].tolist(), ["a", ""])
+    npz.close()
+
+
+  def testAppend(self):
+    with NpzSink(self.path, FIELDS) as sink:
+      for row in _rows(0, 5):
+        sink.write(row)
+    with NpzSink(self.path, FIELDS, append=True) as sink:
+      for row in _rows(5, 8):
+        sink.write(row)
+    self.assertRows(loadNpz(self.path), _rows(0, 8))
+
+
+  def testTruncateMergesParts(self):
+    sink = NpzSink(self.path, FIELDS)
+    for row in _rows(0, 10):
+      sink.write(row)
+      sink.flush()
+    truncateOutput(self.path, 4)
+    self.assertEqual(os.listdir(self.tmpDir), ["out.npz"])
+    self.assertRows(loadNpz(self.path), _rows(0, 4))
+
+
+
+class BufferedCsvSinkTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpDir, "out.csv")
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def testAppendAfterTruncate(self):
+    with createSink(self.path, ["x"]) as sink:
+      for i in range(10):
+        sink.write([i])
+    truncateOutput(self.path, 6)
+    with createSink(self.path, ["x"], append=True) as sink:
+      sink.write([6])
+    with open(self.path) as fp:
+      self.assertEqual(fp.read().split(), ["x"] + [str(i) for i in range(7)])
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -22,15 +22,27 @@
 
 """A simple client to create a CLA model for hotgym."""
 
-import csv
+from optparse import OptionParser
 import copy
-import datetime
+import json
+import os
+import sys
 import numpy
 
 from nupic.data.datasethelpers import findDataset
 from nupic.frameworks.opf.modelfactory import ModelFactory
 
 import model_params
+from parallel_ensemble import ParallelEnsemble, buildModels
+from rls_combiner import RecursiveLeastSquares
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import iterRecords, readColumns
+from common.instrumentation import Instrumentation, NullInstrumentation
+from common.model_cache import ModelTemplateCache
+from common.result_sinks import createSink
 
 
 _DATA_PATH = "extra/hotgym/rec-center-hourly.csv"
@@ -39,108 +51,238 @@ _DATA_PATH = "extra/hotgym/rec-center-hourly.csv"
 _NUM_RECORDS = 4300
 
 
-def createModel(seed=1956):
-  params = model_params.MODEL_PARAMS
+def memberParams(seed, resolution):
+  """
+  :return: a copy of model_params.MODEL_PARAMS with the given SP seed and
+    consumption encoder resolution. The shared parameters are not modified.
+  """
+  params = copy.deepcopy(model_params.MODEL_PARAMS)
   params['modelParams']['spParams']['seed'] = seed
-
-  # Randomly change encoder resolution to be in [0.78, 0.98], i.e. 0.88 +/- 0.1
   params['modelParams']['sensorParams']['encoders']['consumption'][
-    'resolution'] = 0.78 + numpy.random.random()*.2
+    'resolution'] = resolution
+  return params
+
+
+def memberSpecs(numModels, seed=1956):
+  """
+  Derive the configuration of every member from a single ensemble seed. Each
+  member gets its own SP seed and an encoder resolution in [0.78, 0.98],
+  i.e. 0.88 +/- 0.1. The same seed always gives the same members.
+
+  :return: list of dicts with the member index, SP seed and resolution
+  """
+  random = numpy.random.RandomState(seed)
+  return [{"member": i, "seed": seed + i,
+           "resolution": 0.78 + random.random_sample()*.2}
+          for i in range(numModels)]
+
+
+def createModel(seed, resolution, modelCache=None):
+  params = memberParams(seed, resolution)
 
-  return ModelFactory.create(model_params.MODEL_PARAMS)
+  if modelCache is not None:
+    return ModelTemplateCache(modelCache).create(params)
+  return ModelFactory.create(params)
 
 
 def setupModel(model):
   model.enableInference({'predictedField': 'consumption'})
 
 
-def runHotgym():
-  models = []
-  previousPredictions = []
+def createMember(seed, resolution, modelCache=None):
+  model = createModel(seed, resolution, modelCache)
+  setupModel(model)
+  return model
+
+
+def predict(model, modelInput):
+  result = model.run(modelInput)
+  return result.inferences["multiStepBestPredictions"][1]
+
+
+def runHotgym(outputPath="output.csv", numWorkers=1, combiner="lstsq",
+              instrumentation=None, modelCache=None, numModels=14, seed=1956,
+              buildWorkers=1):
+  """
+  Run the ensemble on the hotgym data, writing the individual and combined
+  predictions to outputPath. Use a .npz extension to write numpy arrays
+  instead of CSV.
+
+  :param outputPath: path of the output file
+  :param numWorkers: if more than one, the models are spread over this many
+    worker processes and run in parallel for every record
+  :param combiner: how the least squares ensemble weights are fit. "lstsq"
+    periodically re-solves least squares over the last lstNumRows records,
+    "rls" updates the weights after every record with recursive least squares.
+  :param instrumentation: optional common.instrumentation.Instrumentation
+    that times each stage of the record loop
+  :param modelCache: if set, models are cloned from templates kept in this
+    directory (see common/model_cache.py)
+  :param numModels: number of models in the ensemble
+  :param seed: ensemble seed that every member configuration is derived from.
+    The configurations are saved to outputPath + ".members.json".
+  :param buildWorkers: number of processes used to create the models when
+    they are run in this process (numWorkers is 1). By default they are
+    created one after the other. The models built by a pool are saved and
+    loaded back serially in this process, which only pays off when creating
+    a model takes much longer than loading it; None uses one per core.
+  """
+  if instrumentation is None:
+    instrumentation = NullInstrumentation()
+
+  previousPredictions = [0.0] * numModels
   bestPrediction = 0.0
   lstPrediction = 0.0
 
-  # Setup all the models. Here each model has a different SP seed.
-  for i in range(14):
-    models.append(createModel(1956+i))
-
-  for m in models:
-    setupModel(m)
-    previousPredictions.append(0.0)
+  # Setup all the models. Here each model has a different SP seed and
+  # encoder resolution, derived from the ensemble seed so that runs, and the
+  # serial and parallel ensembles, get exactly the same models.
+  specs = memberSpecs(numModels, seed)
+  with open(outputPath + ".members.json", "w") as fp:
+    json.dump({"seed": seed, "members": specs}, fp, indent=2)
+  for spec in specs:
+    print "Member %(member)d: seed %(seed)d, resolution %(resolution).4f" % spec
+  memberArgs = [(spec["seed"], spec["resolution"], modelCache)
+                for spec in specs]
+  if numWorkers > 1:
+    # Each worker creates its own group of models, concurrently
+    ensemble = ParallelEnsemble(createMember, memberArgs, predict, numWorkers)
+    runMembers = ensemble.run
+  else:
+    ensemble = None
+    if buildWorkers == 1:
+      models = [createModel(*args) for args in memberArgs]
+    else:
+      models = buildModels(createModel, memberArgs, buildWorkers)
+    for model in models:
+      setupModel(model)
+    runMembers = lambda modelInput: [predict(m, modelInput) for m in models]
 
-  # The best least squares predictor. Initialize with 1.0/len(models)
-  bestFit = numpy.ones(len(models)) / len(models)
+  # The best least squares predictor. Initialize with 1.0/numModels
+  bestFit = numpy.ones(numModels) / numModels
 
-  print "Running ensemble with",len(models),"models. This could take a while!"
+  print "Running ensemble with",numModels,"models. This could take a while!"
 
   # Matrix to hold the last month's worth of predictions and actuals
   lstNumRows = 2000
-  a = numpy.zeros((lstNumRows,len(models)))
+  a = numpy.zeros((lstNumRows,numModels))
   b = numpy.zeros(lstNumRows)
 
-  with open("output.csv","wb") as outputFile:
-    csvWriter = csv.writer(outputFile)
-    csvWriter.writerow(["timestamp", "consumption", "predictions"])
-    with open (findDataset(_DATA_PATH)) as fin:
-      reader = csv.reader(fin)
-      headers = reader.next()
-      reader.next()
-      reader.next()
-      for i, record in enumerate(reader, start=1):
-
-        # Prepare input dict for feeding each model
-        modelInput = dict(zip(headers, record))
-        modelInput["consumption"] = float(modelInput["consumption"])
-        modelInput["timestamp"] = datetime.datetime.strptime(
-            modelInput["timestamp"], "%m/%d/%y %H:%M")
-
-        # Run each model and get each prediction and running sum
-        results = []
-        predictions = []
-        sum = 0
-        lstSum = 0
-        for k,m in enumerate(models):
-          result = m.run(modelInput)
-          prediction = result.inferences["multiStepBestPredictions"][1]
-          results.append(result)
-          predictions.append(prediction)
-          sum += prediction
-          lstSum += bestFit[k]*prediction
-
-        # # Write results to the output CSV file
-        if i>1:
-          row = [modelInput["timestamp"], modelInput["consumption"]]
-          row.extend(previousPredictions)
-          row.append(bestPrediction)
-          row.append(lstPrediction)
-          csvWriter.writerow(row)
-
-          # Keep a rolling store of the last lstNumRows of predictions and
-          # actuals
-          a[i%lstNumRows] = previousPredictions
-          b[i%lstNumRows] = modelInput["consumption"]
-          # Redo the least squares estimate on the last lstNumRows every week
-          if (i > 300 + lstNumRows) and ( i% 24*7 == 0):
-            print "Iteration: %d, doing least squares fit using " \
-                  "the last %d predictions!" % (i,lstNumRows)
-            x = numpy.linalg.lstsq(a,b)
-            bestFit = x[0]
-            # Print the weights and the average residual squared error
-            print bestFit,x[1][0]/lstNumRows
-
-
-        # Compute best prediction (to be used next timestamp)
-        # Save current predictions for later output. This shifts the
-        # predictions so that they are lined up with the timestamps they are
-        # actually predicting.
-        previousPredictions = copy.deepcopy(predictions)
-        bestPrediction = sum / len(models)
-        lstPrediction = lstSum
-
-        if i%200 == 0: print "iteration:",i
-        if i == _NUM_RECORDS:
-          break
+  # Recursive least squares, with a forgetting factor giving an effective
+  # window similar to lstNumRows
+  rls = RecursiveLeastSquares(numModels, 1.0 - 1.0/lstNumRows)
+
+  fieldNames = ["timestamp", "consumption"]
+  fieldNames.extend(["prediction%d" % k for k in range(numModels)])
+  fieldNames.extend(["average_prediction", "lst_prediction"])
+  with createSink(outputPath, fieldNames) as sink:
+    # Parse the whole file into typed columns up front. The first two rows
+    # after the header contain the field types and flags.
+    columns = readColumns(findDataset(_DATA_PATH),
+                          {"timestamp": "datetime", "consumption": "float"},
+                          timestampFormat="%m/%d/%y %H:%M", skipRows=2,
+                          instrumentation=instrumentation)
+    for i, modelInput in enumerate(iterRecords(columns), start=1):
+      instrumentation.mark("read")
+
+      # Run each model and get each prediction and running sum
+      predictions = runMembers(modelInput)
+      instrumentation.mark("models")
+      sum = 0
+      lstSum = 0
+      for k,prediction in enumerate(predictions):
+        sum += prediction
+        lstSum += bestFit[k]*prediction
+
+      # # Write results to the output CSV file
+      if i>1:
+        row = [modelInput["timestamp"], modelInput["consumption"]]
+        row.extend(previousPredictions)
+        row.append(bestPrediction)
+        row.append(lstPrediction)
+        sink.write(row)
+        instrumentation.mark("write")
+
+        if combiner == "rls":
+          # Update the weights with every record, but only start using them
+          # once the individual models have had some time to learn
+          rls.update(previousPredictions, modelInput["consumption"])
+          if i > 300:
+            bestFit = rls.bestFit
+
+        # Keep a rolling store of the last lstNumRows of predictions and
+        # actuals
+        a[i%lstNumRows] = previousPredictions
+        b[i%lstNumRows] = modelInput["consumption"]
+        # Redo the least squares estimate on the last lstNumRows every week
+        if combiner == "lstsq" and (i > 300 + lstNumRows) and ( i% 24*7 == 0):
+          print "Iteration: %d, doing least squares fit using " \
+                "the last %d predictions!" % (i,lstNumRows)
+          x = numpy.linalg.lstsq(a,b)
+          bestFit = x[0]
+          # Print the weights and the average residual squared error
+          print bestFit,x[1][0]/lstNumRows
+        instrumentation.mark("combine")
+
+
+      # Compute best prediction (to be used next timestamp)
+      # Save current predictions for later output. This shifts the
+      # predictions so that they are lined up with the timestamps they are
+      # actually predicting.
+      previousPredictions = copy.deepcopy(predictions)
+      bestPrediction = sum / numModels
+      lstPrediction = lstSum
+
+      instrumentation.recordProcessed()
+
+      if i%200 == 0: print "iteration:",i
+      if i == _NUM_RECORDS:
+        break
+
+  if ensemble is not None:
+    ensemble.close()
 
 
 if __name__ == "__main__":
-  runHotgym()
+  parser = OptionParser("\n%prog [options]"
+                        "\n%prog --help"
+                        "\n"
+                        "\nRuns an ensemble of HTM models on the hotgym data.")
+  parser.add_option("--outputFile", default="output.csv",
+      help="Output file. Use a .npz extension to write numpy arrays instead "
+      "of CSV. [default: %default]")
+  parser.add_option("--workers", default=1, type=int,
+      help="Number of worker processes to run the models in. "
+      "[default: %default]")
+
+  parser.add_option("--numModels", default=14, type=int,
+      help="Number of models in the ensemble. [default: %default]")
+  parser.add_option("--seed", default=1956, type=int,
+      help="Ensemble seed the configuration of every model is derived from. "
+      "[default: %default]")
+  parser.add_option("--buildWorkers", default=1, type=int,
+      help="Number of processes used to create the models when --workers is "
+      "1. The models are loaded back one after the other, so this only "
+      "helps when creating a model is much slower than loading it. "
+      "[default: %default]")
+
+  parser.add_option("--combiner", default="lstsq", choices=["lstsq", "rls"],
+      help="How to fit the least squares ensemble: lstsq refits periodically "
+      "over a rolling window, rls updates the weights with every record. "
+      "[default: %default]")
+  parser.add_option("--modelCache", default=None,
+      help="If set, clone the models from templates kept in this directory. "
+      "[default: %default]")
+  parser.add_option("--instrument", default=None, type=float,
+      help="Time each stage of the record loop and print a summary every "
+      "this many seconds and at the end. [default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  instrumentation = None
+  if options.instrument:
+    instrumentation = Instrumentation(reportInterval=options.instrument)
+  runHotgym(options.outputFile, options.workers, options.combiner,
+            instrumentation, options.modelCache, options.numModels,
+            options.seed, options.buildWorkers)
+  if instrumentation is not None:
+    instrumentation.printSummary()
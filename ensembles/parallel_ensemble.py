@@ -0,0 +1,178 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Run the members of an ensemble in parallel. The members are split into
+contiguous groups and each group lives in its own worker process for the
+whole run. Every record is broadcast to all workers and the predictions are
+gathered back in member order.
+
+buildModels() only parallelizes model construction, for ensembles that are
+run in the current process.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import traceback
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+
+def _workerLoop(connection, createMember, predict, memberArgs):
+  """
+  Worker process: create this worker's members, then answer every record
+  received on the connection with the list of member predictions.
+  """
+  try:
+    members = [createMember(*args) for args in memberArgs]
+    connection.send(None)
+    while True:
+      modelInput = connection.recv()
+      if modelInput is None:
+        break
+      connection.send([predict(m, modelInput) for m in members])
+  except Exception:
+    connection.send(RuntimeError(traceback.format_exc()))
+  finally:
+    connection.close()
+
+
+
+class ParallelEnsemble(object):
+  """
+  Runs ensemble members in a fixed set of worker processes.
+  """
+
+  def __init__(self, createMember, memberArgs, predict, numWorkers=None):
+    """
+    :param createMember: function called as createMember(*args) inside a
+      worker to create a member model
+    :param memberArgs: list with the createMember arguments for each member
+    :param predict: function called as predict(member, modelInput) inside a
+      worker. It must return the member's prediction.
+    :param numWorkers: number of worker processes. Defaults to the number of
+      cores, but never more than the number of members.
+    """
+    if numWorkers is None:
+      numWorkers = multiprocessing.cpu_count()
+    numWorkers = max(1, min(numWorkers, len(memberArgs)))
+
+    self.numMembers = len(memberArgs)
+    self.connections = []
+    self.workers = []
+
+    # Split the members into contiguous groups, one per worker, so that
+    # concatenating the results of each worker preserves member order
+    groupSize, remainder = divmod(len(memberArgs), numWorkers)
+    start = 0
+    for w in range(numWorkers):
+      end = start + groupSize + (1 if w < remainder else 0)
+      parentConnection, childConnection = multiprocessing.Pipe()
+      worker = multiprocessing.Process(
+        target=_workerLoop,
+        args=(childConnection, createMember, predict, memberArgs[start:end]))
+      worker.daemon = True
+      worker.start()
+      childConnection.close()
+      self.connections.append(parentConnection)
+      self.workers.append(worker)
+      start = end
+
+    # Wait until every worker has created its members
+    self._gather()
+
+
+  def run(self, modelInput):
+    """
+    Send a record to every member.
+
+    :return: list with the prediction of each member, in member order
+    """
+    for connection in self.connections:
+      connection.send(modelInput)
+    return self._gather()
+
+
+  def close(self):
+    """
+    Stop the worker processes.
+    """
+    for connection in self.connections:
+      try:
+        connection.send(None)
+      except IOError:
+        # The worker already exited after an error
+        pass
+      connection.close()
+    for worker in self.workers:
+      worker.join()
+    self.connections = []
+    self.workers = []
+
+
+  def _gather(self):
+    predictions = []
+    for connection in self.connections:
+      reply = connection.recv()
+      if isinstance(reply, Exception):
+        self.close()
+        raise reply
+      if reply is not None:
+        predictions.extend(reply)
+    return predictions
+
+
+
+def _buildAndSave(args):
+  createModel, modelArgs, saveDir = args
+  createModel(*modelArgs).save(saveDir)
+
+
+def buildModels(createModel, modelArgs, numWorkers=None):
+  """
+  Create models concurrently in a pool of worker processes. Each worker
+  saves its model and the models are loaded back in this process, in order.
+  Loading is serial, so this is only faster than creating the models one
+  after the other when creating a model takes much longer than loading it.
+
+  :param createModel: function called as createModel(*args) inside a worker.
+    It must be a module level function so it can be pickled.
+  :param modelArgs: list with the createModel arguments for each model
+  :param numWorkers: number of worker processes. Defaults to the number of
+    cores.
+
+  :return: list of models, one per entry of modelArgs
+  """
+  workDir = tempfile.mkdtemp()
+  try:
+    saveDirs = [os.path.join(workDir, str(i)) for i in range(len(modelArgs))]
+    pool = multiprocessing.Pool(numWorkers)
+    try:
+      pool.map(_buildAndSave, [(createModel, args, saveDir)
+                               for args, saveDir in zip(modelArgs, saveDirs)])
+    finally:
+      pool.close()
+      pool.join()
+    return [ModelFactory.loadFromCheckpoint(saveDir) for saveDir in saveDirs]
+  finally:
+    shutil.rmtree(workDir, ignore_errors=True)
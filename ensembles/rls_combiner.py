@@ -0,0 +1,81 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Recursive least squares (RLS) combiner for ensemble predictions. Instead of
+re-solving a least squares problem over a window of past predictions, the
+combination weights are updated after every record in O(N^2) time for N
+models. A forgetting factor slightly below 1 makes old records count less,
+which plays the same role as the rolling window.
+
+See https://en.wikipedia.org/wiki/Recursive_least_squares_filter
+"""
+
+import numpy
+
+
+class RecursiveLeastSquares(object):
+  """
+  Incrementally fits weights w such that y ~= dot(w, x), where x holds the
+  predictions of the individual models and y is the actual value.
+  """
+
+  def __init__(self, numInputs, forgettingFactor=1.0 - 1.0/2000, delta=100.0):
+    """
+    :param numInputs: number of models in the ensemble
+    :param forgettingFactor: weight of the past relative to the newest record.
+      1 - 1/n gives an effective window of roughly n records.
+    :param delta: initial value of the diagonal of the inverse correlation
+      matrix. Large values let the weights move quickly away from their
+      initial values.
+    """
+    self.forgettingFactor = forgettingFactor
+
+    # Start from the simple average, like the batch least squares ensemble
+    self.bestFit = numpy.ones(numInputs) / numInputs
+
+    # Inverse of the (exponentially weighted) input correlation matrix
+    self.P = numpy.eye(numInputs) * delta
+
+
+  def update(self, x, y):
+    """
+    Update the weights with a new set of model predictions and the value they
+    were predicting.
+
+    :param x: the predictions of each model
+    :param y: the actual value
+
+    :return: the prediction error of the weights before the update
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    Px = self.P.dot(x)
+    gain = Px / (self.forgettingFactor + x.dot(Px))
+    error = y - self.bestFit.dot(x)
+
+    self.bestFit += gain * error
+    self.P -= numpy.outer(gain, Px)
+    self.P /= self.forgettingFactor
+
+    # Rounding errors slowly make P asymmetric, which makes RLS unstable
+    self.P = 0.5 * (self.P + self.P.T)
+
+    return error
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for rls_combiner.py.
+"""
+
+import unittest
+
+import numpy
+
+from rls_combiner import RecursiveLeastSquares
+
+
+
+class RecursiveLeastSquaresTest(unittest.TestCase):
+
+  def setUp(self):
+    random = numpy.random.RandomState(42)
+    self.numInputs = 5
+    self.X = random.normal(10.0, 3.0, (400, self.numInputs))
+    self.trueWeights = numpy.array([0.5, 0.2, 0.1, 0.3, -0.1])
+    self.y = self.X.dot(self.trueWeights) + random.normal(0.0, 0.1, 400)
+
+
+  def testMatchesRegularizedLeastSquares(self):
+    # Without forgetting, RLS gives exactly the least squares fit regularized
+    # towards the initial weights by the initial P = delta * I
+    delta = 100.0
+    rls = RecursiveLeastSquares(self.numInputs, forgettingFactor=1.0,
+                                delta=delta)
+    for x, y in zip(self.X, self.y):
+      rls.update(x, y)
+
+    initial = numpy.ones(self.numInputs) / self.numInputs
+    expected = numpy.linalg.solve(
+      self.X.T.dot(self.X) + numpy.eye(self.numInputs) / delta,
+      self.X.T.dot(self.y) + initial / delta)
+    numpy.testing.assert_allclose(rls.bestFit, expected, rtol=1e-6)
+
+
+  def testConvergesToLstsq(self):
+    rls = RecursiveLeastSquares(self.numInputs, forgettingFactor=1.0,
+                                delta=1e6)
+    for x, y in zip(self.X, self.y):
+      rls.update(x, y)
+    expected = numpy.linalg.lstsq(self.X, self.y, rcond=None)[0]
+    numpy.testing.assert_allclose(rls.bestFit, expected, atol=1e-4)
+
+
+  def testUpdateReturnsErrorBeforeUpdate(self):
+    rls = RecursiveLeastSquares(2)
+    self.assertAlmostEqual(rls.update([1.0, 3.0], 5.0), 3.0)
+
+
+  def testForgettingTracksChangingWeights(self):
+    rls = RecursiveLeastSquares(self.numInputs,
+                                forgettingFactor=1.0 - 1.0 / 50)
+    newWeights = self.trueWeights[::-1]
+    for x in self.X:
+      rls.update(x, x.dot(self.trueWeights))
+    for x in self.X:
+      rls.update(x, x.dot(newWeights))
+    numpy.testing.assert_allclose(rls.bestFit, newWeights, atol=1e-3)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -22,11 +22,18 @@
 
 """
 Simple tests of residue number systems. I did this mostly to build up some
-intuitions for grid cells. The implementation is super inefficient.
+intuitions for grid cells. The list based functions are super inefficient.
+The functions ending in Array work on whole numpy arrays of numbers at once
+and are what you want for anything beyond a few thousand numbers.
 
 See https://en.wikipedia.org/wiki/Residue_number_system for more details.
 """
 
+from fractions import gcd
+
+import numpy
+
+
 def rnsEncode(x, moduli):
   """
   :param x: the number you want to encode
@@ -82,6 +89,238 @@ def rnsMultiply(xr, yr, moduli):
   return residueEncoding
 
 
+def _smallestUnsignedDtype(maxValue):
+  """
+  :return: the smallest unsigned numpy integer dtype that can hold maxValue
+  """
+  for dtype in (numpy.uint8, numpy.uint16, numpy.uint32, numpy.uint64):
+    if maxValue <= numpy.iinfo(dtype).max:
+      return numpy.dtype(dtype)
+  raise ValueError("%d does not fit in a 64 bit integer" % maxValue)
+
+
+def rnsDtype(moduli):
+  """
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: the smallest unsigned numpy dtype that can hold every residue
+  """
+  return _smallestUnsignedDtype(max(moduli) - 1)
+
+
+def rnsEncodeArray(x, moduli):
+  """
+  :param x: array (or anything numpy.asarray accepts) of integers to encode.
+    Negative numbers are fine: they are encoded like their positive
+    equivalent modulo each modulus.
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: array of shape x.shape + (len(moduli),) holding the encoding of
+    each number, with dtype rnsDtype(moduli)
+  """
+  x = numpy.asarray(x, dtype=numpy.int64)
+  m = numpy.asarray(moduli, dtype=numpy.int64)
+  return (x[..., numpy.newaxis] % m).astype(rnsDtype(moduli))
+
+
+def _rnsArrayOperation(xr, yr, moduli, maxIntermediate, operation):
+  """
+  Apply operation to two arrays of encodings in a dtype wide enough for the
+  intermediate result, reduce modulo each modulus and return the result in
+  the compact dtype. Arrays broadcast against each other, e.g. a single
+  encoding can be combined with an array of encodings.
+  """
+  wideDtype = _smallestUnsignedDtype(maxIntermediate)
+  m = numpy.asarray(moduli, dtype=wideDtype)
+  xr = numpy.asarray(xr).astype(wideDtype, copy=False)
+  yr = numpy.asarray(yr).astype(wideDtype, copy=False)
+  result = operation(xr, yr, m)
+  result %= m
+  return result.astype(rnsDtype(moduli), copy=False)
+
+
+def rnsAddArray(xr, yr, moduli):
+  """
+  :param xr: array of rns encodings of x, last axis over the moduli
+  :param yr: array of rns encodings of y, broadcastable against xr
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: array of rns encodings of x+y
+  """
+  return _rnsArrayOperation(xr, yr, moduli, 2 * (max(moduli) - 1),
+                            lambda x, y, m: x + y)
+
+
+def rnsSubtractArray(xr, yr, moduli):
+  """
+  :param xr: array of rns encodings of x, last axis over the moduli
+  :param yr: array of rns encodings of y, broadcastable against xr
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: array of rns encodings of x-y
+  """
+  # Add m before subtracting so that unsigned residues never go negative
+  return _rnsArrayOperation(xr, yr, moduli, 2 * max(moduli),
+                            lambda x, y, m: x + (m - y))
+
+
+def rnsMultiplyArray(xr, yr, moduli):
+  """
+  :param xr: array of rns encodings of x, last axis over the moduli
+  :param yr: array of rns encodings of y, broadcastable against xr
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: array of rns encodings of x*y
+  """
+  return _rnsArrayOperation(xr, yr, moduli, (max(moduli) - 1) ** 2,
+                            lambda x, y, m: x * y)
+
+
+def _modularInverse(a, m):
+  """
+  :return: the number b in [0, m) such that a*b = 1 modulo m
+  """
+  # Extended Euclidean algorithm
+  oldR, r = a % m, m
+  oldS, s = 1, 0
+  while r != 0:
+    quotient = oldR // r
+    oldR, r = r, oldR - quotient * r
+    oldS, s = s, oldS - quotient * s
+  if oldR != 1:
+    raise ValueError("%d has no inverse modulo %d" % (a, m))
+  return oldS % m
+
+
+# Decoding constants for each moduli tuple, see _decodingConstants()
+_decodingConstantsCache = {}
+
+
+def _decodingConstants(moduli):
+  """
+  Compute, or return the cached, constants needed to decode encodings in this
+  residue number system.
+
+  :return: a dict with the range M of the system, the dtype to compute in,
+    the CRT weights M/m_i and inverses of M/m_i modulo m_i, and the inverses
+    of m_1*...*m_(i-1) modulo m_i used by mixed radix conversion.
+  """
+  key = tuple(int(m) for m in moduli)
+  constants = _decodingConstantsCache.get(key)
+  if constants is not None:
+    return constants
+
+  M = rnsRange(key)
+  product = 1
+  for m in key:
+    product *= m
+  if product != M:
+    raise ValueError("The moduli %s are not pairwise coprime, so encodings "
+                     "can't be decoded uniquely" % (key,))
+
+  # Sums of two numbers below M and products of two residues must not
+  # overflow. Otherwise fall back to (slow) arrays of Python integers.
+  int64Max = numpy.iinfo(numpy.int64).max
+  if 2 * M < int64Max and max(key) ** 2 < int64Max:
+    dtype = numpy.dtype(numpy.int64)
+  else:
+    dtype = numpy.dtype(object)
+
+  weights = [M // m for m in key]
+  prefixes = [1]
+  for m in key[:-1]:
+    prefixes.append(prefixes[-1] * m)
+  constants = {
+    "range": M,
+    "dtype": dtype,
+    "crtWeights": weights,
+    "crtInverses": [_modularInverse(w, m) for w, m in zip(weights, key)],
+    "prefixes": prefixes,
+    "prefixInverses": [_modularInverse(p, m) for p, m in zip(prefixes, key)],
+  }
+  _decodingConstantsCache[key] = constants
+  return constants
+
+
+def _shiftToRange(x, M, xmin, dtype):
+  """
+  Map numbers in [0, M) to the equivalent numbers in [xmin, xmin+M).
+  """
+  if xmin == 0:
+    return x
+  return numpy.asarray((x - xmin % M) % M + xmin, dtype=dtype)
+
+
+def rnsDecodeArray(xr, moduli, xmin=0):
+  """
+  Decode rns encodings with the Chinese Remainder Theorem. The moduli must be
+  pairwise coprime.
+
+  :param xr: array of rns encodings, last axis over the moduli
+  :param moduli: a list of moduli defining this residue number system
+  :param xmin: the decoded numbers are the unique numbers with these
+    encodings in [xmin, xmin + rnsRange(moduli))
+
+  :return: array of shape xr.shape[:-1] holding the decoded numbers
+  """
+  constants = _decodingConstants(moduli)
+  M = constants["range"]
+  dtype = constants["dtype"]
+  xr = numpy.asarray(xr)
+
+  x = numpy.zeros(xr.shape[:-1], dtype=dtype)
+  for i, m in enumerate(moduli):
+    # (r_i * inverse) is reduced modulo m_i first, so term < M
+    term = (xr[..., i].astype(dtype) * constants["crtInverses"][i]) % m
+    x += term * constants["crtWeights"][i]
+    x %= M
+
+  return _shiftToRange(x, M, xmin, dtype)
+
+
+def rnsMixedRadixDigitsArray(xr, moduli):
+  """
+  Convert rns encodings to mixed radix form, i.e. the digits a_i such that
+  x = a_1 + a_2*m_1 + a_3*m_1*m_2 + ... with 0 <= a_i < m_i. Unlike residues,
+  mixed radix digits can be compared lexicographically (last digit first) to
+  compare the numbers. The moduli must be pairwise coprime.
+
+  :param xr: array of rns encodings, last axis over the moduli
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: array of the same shape as xr holding the digits
+  """
+  constants = _decodingConstants(moduli)
+  dtype = constants["dtype"]
+  xr = numpy.asarray(xr)
+
+  digits = numpy.zeros(xr.shape, dtype=dtype)
+  # The number reconstructed from the digits computed so far
+  x = numpy.zeros(xr.shape[:-1], dtype=dtype)
+  for i, m in enumerate(moduli):
+    digit = ((xr[..., i].astype(dtype) - x % m) % m *
+             constants["prefixInverses"][i]) % m
+    digits[..., i] = digit
+    x += digit * constants["prefixes"][i]
+
+  return digits
+
+
+def rnsDecodeMixedRadixArray(xr, moduli, xmin=0):
+  """
+  Decode rns encodings by mixed radix conversion. Gives the same results as
+  rnsDecodeArray(), but every intermediate value stays below the decoded
+  number. See rnsDecodeArray() for a description of the parameters.
+  """
+  constants = _decodingConstants(moduli)
+  digits = rnsMixedRadixDigitsArray(xr, moduli)
+  x = numpy.zeros(digits.shape[:-1], dtype=constants["dtype"])
+  for i in range(len(moduli)):
+    x += digits[..., i] * constants["prefixes"][i]
+
+  return _shiftToRange(x, constants["range"], xmin, constants["dtype"])
+
+
 def rnsAmbiguityList(xr, xmin, xmax, moduli):
   """
   Return all integer numbers in [xmin,xmox] that have the same encoding as xr.
@@ -104,9 +343,30 @@ def rnsAmbiguityList(xr, xmin, xmax, moduli):
   return ambiguousNumbers
 
 
+def rnsRange(moduli):
+  """
+  :param moduli: a list of moduli defining this residue number system
+
+  :return: the least common multiple of the moduli. Two numbers have the same
+    encoding if and only if they differ by a multiple of this, so any range of
+    this many consecutive numbers is encoded unambiguously.
+  """
+  result = 1
+  for m in moduli:
+    result = result * m // gcd(result, m)
+  return result
+
+
 def rnsComputeAmbiguity(moduli, xmin, xmax):
   """
-  Figure out the overall ambiguity of this RNS system in the 1,1000 range.
+  Figure out the overall ambiguity of this RNS system in the [xmin,xmax]
+  range.
+
+  The numbers in the range with the same encoding are exactly the numbers in
+  the same residue class modulo L = rnsRange(moduli). With N = xmax-xmin+1
+  numbers and N = q*L + r, r of the L classes contain q+1 numbers and the
+  others contain q numbers. Each number in a class of size n is ambiguous with
+  n-1 other numbers, so the answer can be computed in constant time.
 
   :param moduli: a list of moduli defining this residue number system
   :param xmin: min range to try and encode
@@ -115,13 +375,34 @@ def rnsComputeAmbiguity(moduli, xmin, xmax):
   :return: a pair containing the total number of ambiguous encodings and the
   overall probability that any particular number will be ambiguous.
   """
+  numbers = xmax - xmin + 1
+  L = rnsRange(moduli)
+  q, r = divmod(numbers, L)
+
+  # r classes of size q+1 and L-r classes of size q
+  ambiguity = r * (q + 1) * q + (L - r) * q * (q - 1)
+  numAmbiguous = 0
+  if q >= 1:
+    numAmbiguous += r * (q + 1)
+  if q >= 2:
+    numAmbiguous += (L - r) * q
+
+  return (ambiguity, float(numAmbiguous) / numbers)
+
+
+def rnsComputeAmbiguityBruteForce(moduli, xmin, xmax):
+  """
+  Same as rnsComputeAmbiguity(), but computed by comparing the encodings of
+  every pair of numbers in the range. Only useful for checking
+  rnsComputeAmbiguity() on small ranges.
+  """
 
   # Highly inefficient way of figuring this out, but hey!
   ambiguity = 0
   numAmbiguous = 0
   for i in range(xmin,xmax+1):
     ir = rnsEncode(i, moduli)
-    ambiguousNumbers = rnsAmbiguityList(ir, xmin, xmax, rns)
+    ambiguousNumbers = rnsAmbiguityList(ir, xmin, xmax, moduli)
     if len(ambiguousNumbers) > 1:
       ambiguity += len(ambiguousNumbers) - 1
       numAmbiguous += 1
@@ -155,6 +436,25 @@ if __name__ == "__main__":
     rnsMultiply(rnsEncode(2,rns), xr, rns),
     rnsMultiply(xr, yr, rns),rns)
 
+  # The same operations on a million pairs of numbers at once
+  xs = numpy.random.randint(0, 10000, 1000000)
+  ys = numpy.random.randint(0, 10000, 1000000)
+  xsr = rnsEncodeArray(xs, rns)
+  ysr = rnsEncodeArray(ys, rns)
+  print
+  print "Array encodings use dtype", xsr.dtype, "and shape", xsr.shape
+  print "Array operations match:", (
+    (rnsAddArray(xsr, ysr, rns) == rnsEncodeArray(xs+ys, rns)).all() and
+    (rnsSubtractArray(xsr, ysr, rns) == rnsEncodeArray(xs-ys, rns)).all() and
+    (rnsMultiplyArray(xsr, ysr, rns) == rnsEncodeArray(xs*ys, rns)).all())
+
+  # Numbers in [0, 3*5*11*13) can be decoded back from their encodings
+  xs = numpy.random.randint(0, rnsRange(rns), 1000000)
+  xsr = rnsEncodeArray(xs, rns)
+  print "CRT decoding matches:", (rnsDecodeArray(xsr, rns) == xs).all()
+  print "Mixed radix decoding matches:", (
+    rnsDecodeMixedRadixArray(xsr, rns) == xs).all()
+
   # Compute ambiguity of some rns systems
 
   # 3 moduli are not large enough
@@ -198,4 +498,12 @@ if __name__ == "__main__":
   a, p = rnsComputeAmbiguity(rns, 0, 1000)
   print "Overall ambiguity for range [0,1000] =", a
   print "Probability of ambiguity =", p
+  print "Same with brute force =", rnsComputeAmbiguityBruteForce(rns, 0, 1000)
+
+  # The closed form makes huge ranges instant
+  print
+  print "RNS system=",rns,"has range",rnsRange(rns)
+  a, p = rnsComputeAmbiguity(rns, 0, 10**9)
+  print "Overall ambiguity for range [0,10^9] =", a
+  print "Probability of ambiguity =", p
 
@@ -0,0 +1,137 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+A sparse distributed encoder based on a residue number system, a bit like a
+set of grid cell modules. Each modulus m gets a block of m bits and the
+residue r of a number modulo m turns on the bits r, r+1, ..., r+w-1 of that
+block (wrapping around). With w=1 this is a one-hot code per modulus.
+Numbers less than the LCM of the moduli apart never get identical codes.
+
+The active bits of every possible residue are computed once, so encoding a
+batch of numbers is a residue computation and a table lookup.
+"""
+
+import numpy
+
+from rns import rnsEncodeArray, rnsRange
+
+
+class RNSEncoder(object):
+  """
+  Encodes integers, or floats scaled by a resolution, as the indices of the
+  active bits of an RNS code. The method names follow the NuPIC encoders.
+  """
+
+  def __init__(self, moduli, resolution=1.0, offset=0.0,
+               activeBitsPerModulus=1, name="rns"):
+    """
+    :param moduli: a list of moduli defining the residue number system
+    :param resolution: floats are mapped to the integer
+      floor((value - offset) / resolution) before encoding
+    :param offset: see resolution
+    :param activeBitsPerModulus: number of active bits in each modulus block.
+      With more than one bit, nearby residues share bits.
+    :param name: name of the encoded field
+    """
+    if activeBitsPerModulus > min(moduli):
+      raise ValueError("activeBitsPerModulus (%d) can't be larger than the "
+                       "smallest modulus (%d)" % (activeBitsPerModulus,
+                                                  min(moduli)))
+    self.moduli = list(moduli)
+    self.resolution = float(resolution)
+    self.offset = float(offset)
+    self.activeBitsPerModulus = activeBitsPerModulus
+    self.name = name
+
+    # _blocks[i][r] holds the sorted indices of the active bits for residue r
+    # of modulus i, already shifted to the start of the block
+    self._blocks = []
+    start = 0
+    for m in self.moduli:
+      bits = (numpy.arange(m)[:, numpy.newaxis] +
+              numpy.arange(activeBitsPerModulus)) % m
+      bits.sort(axis=1)
+      self._blocks.append((bits + start).astype(numpy.uint32))
+      start += m
+    self._width = start
+
+
+  def getWidth(self):
+    return self._width
+
+
+  def getActiveBitCount(self):
+    return self.activeBitsPerModulus * len(self.moduli)
+
+
+  def getRange(self):
+    """
+    :return: how many consecutive integers are encoded without two of them
+      getting the same code
+    """
+    return rnsRange(self.moduli)
+
+
+  def getDescription(self):
+    return [(self.name, 0)]
+
+
+  def toIntegers(self, values):
+    """
+    :return: the integers that values are mapped to before encoding
+    """
+    values = numpy.asarray(values)
+    if values.dtype.kind in "iu" and self.resolution == 1.0 and (
+        self.offset == 0.0):
+      return values.astype(numpy.int64, copy=False)
+    return numpy.floor((values - self.offset) /
+                       self.resolution).astype(numpy.int64)
+
+
+  def encodeIndices(self, values):
+    """
+    :param values: a number or an array of numbers
+
+    :return: array of shape values.shape + (getActiveBitCount(),) holding
+      the sorted indices of the active bits of each number
+    """
+    residues = rnsEncodeArray(self.toIntegers(values), self.moduli)
+    return numpy.concatenate(
+      [block[residues[..., i]] for i, block in enumerate(self._blocks)],
+      axis=-1)
+
+
+  def encodeIntoArray(self, inputData, output):
+    """
+    Write the dense encoding of a single number into output.
+    """
+    output[:] = 0
+    output[self.encodeIndices(inputData)] = 1
+
+
+  def encode(self, inputData):
+    """
+    :return: the dense encoding of a single number as a uint8 array
+    """
+    output = numpy.zeros(self._width, dtype=numpy.uint8)
+    self.encodeIntoArray(inputData, output)
+    return output
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for the numpy array functions in rns.py.
+"""
+
+import unittest
+
+import numpy
+
+from rns import (rnsComputeAmbiguity, rnsComputeAmbiguityBruteForce,
+                 rnsDecodeArray, rnsDecodeMixedRadixArray, rnsEncode,
+                 rnsEncodeArray, rnsMixedRadixDigitsArray, rnsRange)
+
+
+
+class RNSArrayTest(unittest.TestCase):
+
+  def testEncodeArrayMatchesEncode(self):
+    moduli = [3, 5, 11, 13]
+    x = numpy.arange(-50, 50)
+    encoded = rnsEncodeArray(x, moduli)
+    self.assertEqual(encoded.shape, (100, 4))
+    for number, encoding in zip(x, encoded):
+      self.assertEqual(list(encoding), rnsEncode(int(number), moduli))
+
+
+  def testCRTRoundTrip(self):
+    moduli = [3, 5, 11, 13]
+    x = numpy.arange(rnsRange(moduli))
+    decoded = rnsDecodeArray(rnsEncodeArray(x, moduli), moduli)
+    numpy.testing.assert_array_equal(decoded, x)
+
+
+  def testMixedRadixRoundTrip(self):
+    moduli = [3, 5, 11, 13]
+    x = numpy.arange(rnsRange(moduli))
+    decoded = rnsDecodeMixedRadixArray(rnsEncodeArray(x, moduli), moduli)
+    numpy.testing.assert_array_equal(decoded, x)
+
+
+  def testDecodeIntoShiftedWindow(self):
+    moduli = [7, 9, 10]
+    x = numpy.arange(-300, 330)
+    encoded = rnsEncodeArray(x, moduli)
+    numpy.testing.assert_array_equal(rnsDecodeArray(encoded, moduli, -300), x)
+    numpy.testing.assert_array_equal(
+      rnsDecodeMixedRadixArray(encoded, moduli, -300), x)
+
+
+  def testLargeModuliRoundTrip(self):
+    # The range doesn't fit in int64, so decoding uses Python integers
+    moduli = [2147483647, 2147483629, 2147483587, 2147483579, 2147483563]
+    x = numpy.array([0, 1, 12345678901234567, 2 ** 62 + 3], dtype=object)
+    encoded = numpy.array([rnsEncode(int(v), moduli) for v in x])
+    self.assertEqual(list(rnsDecodeArray(encoded, moduli)), list(x))
+    self.assertEqual(list(rnsDecodeMixedRadixArray(encoded, moduli)), list(x))
+
+
+  def testMixedRadixDigitsOrderNumbers(self):
+    moduli = [3, 5, 7]
+    x = numpy.arange(rnsRange(moduli))
+    digits = rnsMixedRadixDigitsArray(rnsEncodeArray(x, moduli), moduli)
+    # Sorting by the digits, most significant (last) first, gives x back
+    order = numpy.lexsort(digits.T)
+    numpy.testing.assert_array_equal(order, x)
+
+
+  def testNonCoprimeModuliRaise(self):
+    with self.assertRaises(ValueError):
+      rnsDecodeArray(rnsEncodeArray([1, 2], [4, 6]), [4, 6])
+
+
+  def testAmbiguityMatchesBruteForce(self):
+    random = numpy.random.RandomState(42)
+    for _ in range(20):
+      moduli = sorted(random.choice(range(2, 12), 3, replace=False))
+      xmin = int(random.randint(-20, 20))
+      xmax = xmin + int(random.randint(0, 200))
+      self.assertEqual(rnsComputeAmbiguity(moduli, xmin, xmax),
+                       rnsComputeAmbiguityBruteForce(moduli, xmin, xmax))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
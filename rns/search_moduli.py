@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Search for good residue number systems. Candidate moduli sets are enumerated
+in increasing order under some constraints, scored on their ambiguity over a
+target range and on their encoding width (the sum of the moduli, i.e. the
+number of bits of a one bit per residue encoding), and the best ones are
+printed.
+
+Partial sets are pruned as soon as they break a constraint. When unambiguous
+sets are required, a partial set is also pruned if even the largest remaining
+moduli can't bring the LCM of the set up to the size of the range. The search
+is split by first modulus over a pool of worker processes.
+"""
+
+from optparse import OptionParser
+from fractions import gcd
+import heapq
+import multiprocessing
+import sys
+import time
+
+from rns import rnsComputeAmbiguity
+
+
+def _lcm(a, b):
+  return a * b // gcd(a, b)
+
+
+def _searchFrom(args):
+  """
+  Enumerate and score all candidate sets starting with the given first
+  modulus.
+
+  :return: (best candidates, number of sets scored, number of sets pruned).
+    Candidates are (probability, width, ambiguity, moduli) tuples.
+  """
+  first, options = args
+  numbers = options["xmax"] - options["xmin"] + 1
+  best = []
+  stats = {"scored": 0, "pruned": 0}
+
+  # largestProducts[k] is the product of the k largest allowed moduli, an
+  # upper bound on how much k more moduli can grow the LCM
+  largestProducts = [1]
+  for k in range(options["count"]):
+    largestProducts.append(largestProducts[-1] * (options["maxModulus"] - k))
+
+  def extend(moduli, lcm):
+    if len(moduli) == options["count"]:
+      # Only reached without the check below for a set of one modulus
+      if options["unambiguous"] and lcm < numbers:
+        stats["pruned"] += 1
+        return
+      stats["scored"] += 1
+      ambiguity, probability = rnsComputeAmbiguity(
+        moduli, options["xmin"], options["xmax"])
+      candidate = (probability, sum(moduli), ambiguity, tuple(moduli))
+      if len(best) < options["top"]:
+        heapq.heappush(best, _Reversed(candidate))
+      elif candidate < best[0].value:
+        heapq.heapreplace(best, _Reversed(candidate))
+      return
+
+    remaining = options["count"] - len(moduli)
+    low = moduli[-1] + 1
+    high = options["maxModulus"]
+    if options["minRatio"]:
+      low = max(low, int(moduli[-1] * options["minRatio"] + 0.999999))
+    if options["maxRatio"]:
+      high = min(high, int(moduli[-1] * options["maxRatio"]))
+
+    for m in xrange(low, high + 1):
+      if options["coprime"] and any(gcd(m, p) != 1 for p in moduli):
+        continue
+      newLcm = _lcm(lcm, m)
+
+      if (options["unambiguous"] and
+          newLcm * largestProducts[remaining - 1] < numbers):
+        stats["pruned"] += 1
+        continue
+
+      extend(moduli + [m], newLcm)
+
+  extend([first], first)
+  return ([c.value for c in best], stats["scored"], stats["pruned"])
+
+
+
+class _Reversed(object):
+  """
+  Inverts the ordering of a value, so that heapq keeps the worst of the best
+  candidates at the top of the heap.
+  """
+
+  def __init__(self, value):
+    self.value = value
+
+
+  def __lt__(self, other):
+    return self.value > other.value
+
+
+
+def searchModuli(count, maxModulus, xmin=0, xmax=1000, minModulus=2,
+                 coprime=True, minRatio=None, maxRatio=None,
+                 unambiguous=False, top=10, numWorkers=None):
+  """
+  Find the best moduli sets of a given size.
+
+  :param count: number of moduli in each set
+  :param maxModulus: largest modulus allowed
+  :param xmin: min of the range the sets should encode
+  :param xmax: max of the range the sets should encode
+  :param minModulus: smallest modulus allowed
+  :param coprime: only consider pairwise coprime sets
+  :param minRatio: if set, each modulus must be at least this many times the
+    previous one
+  :param maxRatio: if set, each modulus must be at most this many times the
+    previous one. Together with minRatio this restricts the search to roughly
+    geometric spacings, like grid cell modules.
+  :param unambiguous: only consider sets that encode the range unambiguously
+  :param top: number of sets to return
+  :param numWorkers: number of worker processes, defaults to the number of
+    cores
+
+  :return: (candidates, number of sets scored, number of (partial) sets
+    pruned).
+    candidates is a list of (probability of ambiguity, width, total
+    ambiguity, moduli) tuples, best first: lowest probability of ambiguity,
+    then smallest width.
+  """
+  options = {"count": count, "maxModulus": maxModulus, "xmin": xmin,
+             "xmax": xmax, "coprime": coprime, "minRatio": minRatio,
+             "maxRatio": maxRatio, "unambiguous": unambiguous, "top": top}
+  tasks = [(first, options) for first in range(max(minModulus, 1),
+                                                maxModulus + 1)]
+
+  candidates = []
+  scored = pruned = 0
+  pool = multiprocessing.Pool(numWorkers)
+  try:
+    for best, s, p in pool.imap_unordered(_searchFrom, tasks):
+      candidates.extend(best)
+      scored += s
+      pruned += p
+  finally:
+    pool.close()
+    pool.join()
+
+  return sorted(candidates)[:top], scored, pruned
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nSearches for residue number systems with low ambiguity and small"
+    "\nencoding width over a range of numbers."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--count", default=4, type=int,
+      help="Number of moduli in each set. [default: %default]")
+  parser.add_option("--minModulus", default=2, type=int,
+      help="Smallest modulus allowed. [default: %default]")
+  parser.add_option("--maxModulus", default=30, type=int,
+      help="Largest modulus allowed. [default: %default]")
+  parser.add_option("--xmin", default=0, type=int,
+      help="Min of the range to encode. [default: %default]")
+  parser.add_option("--xmax", default=1000, type=int,
+      help="Max of the range to encode. [default: %default]")
+  parser.add_option("--allowNonCoprime", action="store_true", default=False,
+      help="Also consider sets that are not pairwise coprime.")
+  parser.add_option("--minRatio", default=None, type=float,
+      help="Each modulus must be at least this many times the previous one. "
+      "[default: %default]")
+  parser.add_option("--maxRatio", default=None, type=float,
+      help="Each modulus must be at most this many times the previous one. "
+      "[default: %default]")
+  parser.add_option("--unambiguous", action="store_true", default=False,
+      help="Only consider sets that encode the whole range unambiguously.")
+  parser.add_option("--top", default=10, type=int,
+      help="Number of sets to print. [default: %default]")
+  parser.add_option("--workers", default=None, type=int,
+      help="Number of worker processes. Defaults to the number of cores.")
+
+  options, args = parser.parse_args(sys.argv[1:])
+
+  startTime = time.time()
+  candidates, scored, pruned = searchModuli(
+    options.count, options.maxModulus, options.xmin, options.xmax,
+    options.minModulus, not options.allowNonCoprime, options.minRatio,
+    options.maxRatio, options.unambiguous, options.top, options.workers)
+
+  print "Scored",scored,"moduli sets and pruned",pruned,"(partial) sets in",(
+    "%.1f seconds" % (time.time() - startTime))
+  print "%-30s %12s %8s %15s" % ("moduli", "P(ambiguous)", "width",
+                                 "ambiguity")
+  for probability, width, ambiguity, moduli in candidates:
+    print "%-30s %12.6f %8d %15d" % (list(moduli), probability, width,
+                                     ambiguity)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for search_moduli.py.
+"""
+
+import itertools
+import unittest
+
+from rns import rnsComputeAmbiguity, rnsRange
+from search_moduli import searchModuli
+
+
+
+class SearchModuliTest(unittest.TestCase):
+
+  def testMatchesExhaustiveSearch(self):
+    candidates, scored, _ = searchModuli(3, 12, xmin=0, xmax=200, top=5,
+                                         numWorkers=1)
+    expected = []
+    for moduli in itertools.combinations(range(2, 13), 3):
+      if rnsRange(moduli) != moduli[0] * moduli[1] * moduli[2]:
+        continue
+      ambiguity, probability = rnsComputeAmbiguity(moduli, 0, 200)
+      expected.append((probability, sum(moduli), ambiguity, moduli))
+    self.assertEqual(scored, len(expected))
+    self.assertEqual(candidates, sorted(expected)[:5])
+
+
+  def testUnambiguousSets(self):
+    candidates, _, _ = searchModuli(3, 15, xmin=0, xmax=999, top=20,
+                                    unambiguous=True, numWorkers=1)
+    self.assertTrue(candidates)
+    for _, _, ambiguity, moduli in candidates:
+      self.assertEqual(ambiguity, 0)
+      self.assertGreaterEqual(rnsRange(moduli), 1000)
+
+
+  def testUnambiguousSingleModulus(self):
+    candidates, scored, _ = searchModuli(1, 1005, xmin=0, xmax=999, top=10,
+                                         unambiguous=True, numWorkers=1)
+    self.assertEqual([moduli for _, _, _, moduli in candidates],
+                     [(m,) for m in range(1000, 1006)])
+    self.assertEqual(scored, 6)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+A long lived host for running anomaly detection on many metric streams at
+once. Streams are sharded across worker processes using a stable hash of the
+stream id. Each worker owns the CLA model and anomaly likelihood object for
+its streams, so models are created once and never move between processes.
+"""
+
+from optparse import OptionParser
+import sys
+import time
+import zlib
+import itertools
+import Queue
+import datetime
+import multiprocessing
+
+from run_anomaly import (OUTPUT_FIELDS, createLikelihood, createModel,
+                         createOptionParser)
+from run_parallel import loadManifest
+from common.columnar_reader import iterRecords, readColumnChunks
+from common.result_sinks import createSink
+
+
+def workerForStream(streamId, numWorkers):
+  """
+  Return the index of the worker that owns the given stream. This uses crc32
+  rather than hash() so that the mapping is the same in every process and
+  every run.
+  """
+  return (zlib.crc32(str(streamId)) & 0xffffffff) % numWorkers
+
+
+def _workerLoop(workerIndex, inputQueue, outputQueue):
+  """
+  Main loop of a worker process. Messages on the input queue are tuples:
+
+    ("stream", streamId, options)               register or reconfigure a stream
+    ("record", streamId, timestamp, value)      score a single record
+    ("stop",)                                   shut down the worker
+
+  Results are put on the output queue as tuples:
+
+    ("result", streamId, timestamp, value, anomalyScore, likelihood,
+     logLikelihood)
+    ("error", streamId, message)
+    ("stopped", workerIndex, {streamId: numRecords})
+  """
+  streamOptions = {}
+  models = {}
+  numRecords = {}
+
+  while True:
+    message = inputQueue.get()
+    command = message[0]
+
+    if command == "record":
+      _, streamId, timestamp, value = message
+      try:
+        if streamId not in models:
+          options = streamOptions.get(streamId)
+          if options is None:
+            options = createOptionParser().get_default_values()
+          models[streamId] = (createModel(options),
+                              createLikelihood(options))
+          numRecords[streamId] = 0
+        model, anomalyLikelihood = models[streamId]
+
+        result = model.run({"dttm": timestamp, "value": value})
+        anomalyScore = result.inferences['anomalyScore']
+        likelihood = anomalyLikelihood.anomalyProbability(
+          value, anomalyScore, timestamp)
+        logLikelihood = anomalyLikelihood.computeLogLikelihood(likelihood)
+        numRecords[streamId] += 1
+        outputQueue.put(("result", streamId, timestamp, value, anomalyScore,
+                         likelihood, logLikelihood))
+      except Exception as e:
+        outputQueue.put(("error", streamId, repr(e)))
+
+    elif command == "stream":
+      _, streamId, options = message
+      streamOptions[streamId] = options
+
+    elif command == "stop":
+      outputQueue.put(("stopped", workerIndex, numRecords))
+      return
+
+
+
+class ModelHost(object):
+  """
+  Keeps one (model, anomaly likelihood) pair per stream id, sharded across a
+  fixed set of worker processes. Records for a stream are always routed to
+  the same worker, so each model is created once, on first use, and results
+  for a given stream come back in the order they were submitted.
+  """
+
+  def __init__(self, numWorkers=None, queueSize=1000):
+    """
+    :param numWorkers: number of worker processes. Defaults to the number of
+      cores.
+    :param queueSize: maximum number of pending records per worker. submit()
+      blocks when the owning worker is this far behind.
+    """
+    if numWorkers is None:
+      numWorkers = multiprocessing.cpu_count()
+    self.numWorkers = numWorkers
+    self.queueSize = queueSize
+    self.outputQueue = multiprocessing.Queue()
+    self.inputQueues = []
+    self.workers = []
+    self.recordCounts = {}
+
+
+  def start(self):
+    """
+    Start the worker processes.
+    """
+    for workerIndex in range(self.numWorkers):
+      inputQueue = multiprocessing.Queue(self.queueSize)
+      worker = multiprocessing.Process(
+        target=_workerLoop, args=(workerIndex, inputQueue, self.outputQueue))
+      worker.daemon = True
+      worker.start()
+      self.inputQueues.append(inputQueue)
+      self.workers.append(worker)
+
+
+  def addStream(self, streamId, options):
+    """
+    Configure a stream before its first record arrives. Streams that are never
+    configured use the run_anomaly.py defaults.
+
+    :param streamId: the id of the stream
+    :param options: run_anomaly options (min, max, resolution) for the stream
+    """
+    self._queueFor(streamId).put(("stream", streamId, options))
+
+
+  def submit(self, streamId, timestamp, value):
+    """
+    Send a record to the worker that owns its stream. Blocks if that worker's
+    queue is full.
+    """
+    self._queueFor(streamId).put(("record", streamId, timestamp, value))
+
+
+  def getResult(self, timeout=None):
+    """
+    Return the next result tuple from any worker (see _workerLoop for the
+    format), or None if nothing arrived within timeout seconds.
+    """
+    try:
+      return self.outputQueue.get(timeout=timeout)
+    except Queue.Empty:
+      return None
+
+
+  def stop(self, resultCallback=None):
+    """
+    Ask every worker to finish its pending records and exit. Results that are
+    still in flight are passed to resultCallback.
+
+    :return: a dict mapping each stream id to the number of records processed
+    """
+    for inputQueue in self.inputQueues:
+      inputQueue.put(("stop",))
+
+    numStopped = 0
+    while numStopped < self.numWorkers:
+      message = self.outputQueue.get()
+      if message[0] == "stopped":
+        self.recordCounts.update(message[2])
+        numStopped += 1
+      elif resultCallback is not None:
+        resultCallback(message)
+
+    for worker in self.workers:
+      worker.join()
+    self.workers = []
+    self.inputQueues = []
+    return self.recordCounts
+
+
+  def _queueFor(self, streamId):
+    return self.inputQueues[workerForStream(streamId, self.numWorkers)]
+
+
+
+def replayManifest(manifestPath, numWorkers=None):
+  """
+  Simple driver for the model host: every job in the manifest becomes a
+  stream, and the records of all streams are interleaved as if they were
+  arriving live. Results are written to each job's output file.
+  """
+  jobs = loadManifest(manifestPath)
+  host = ModelHost(numWorkers)
+  host.start()
+
+  sinks = {}
+  readers = {}
+  for options in jobs:
+    streamId = options.inputFile
+    host.addStream(streamId, options)
+    sinks[streamId] = createSink(options.outputFile, OUTPUT_FIELDS)
+    chunks = readColumnChunks(options.inputFile,
+                              {"dttm": "datetime", "value": "float"})
+    readers[streamId] = itertools.chain.from_iterable(
+      iterRecords(columns) for columns in chunks)
+
+  def handleResult(message):
+    if message[0] == "result":
+      sinks[message[1]].write(message[2:])
+    elif message[0] == "error":
+      print "Error in stream",message[1],":",message[2]
+
+  print "Starting processing of",len(jobs),"streams on",host.numWorkers,(
+    "workers at"),datetime.datetime.now()
+  startTime = time.time()
+  while readers:
+    for streamId in readers.keys():
+      try:
+        inputData = readers[streamId].next()
+      except StopIteration:
+        del readers[streamId]
+        continue
+      host.submit(streamId, inputData["dttm"], inputData["value"])
+
+    # Drain whatever results are ready without blocking the producer
+    message = host.getResult(timeout=0)
+    while message is not None:
+      handleResult(message)
+      message = host.getResult(timeout=0)
+
+  recordCounts = host.stop(handleResult)
+  for sink in sinks.values():
+    sink.close()
+
+  elapsed = time.time() - startTime
+  totalRecords = sum(recordCounts.values())
+  print "Completed processing",totalRecords,"records at",datetime.datetime.now()
+  print "Throughput: %.1f records/sec" % (totalRecords / max(elapsed, 1e-6))
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nReplays every data file in a JSON manifest as a live stream through a"
+    "\nsharded model host. Records from all streams are interleaved."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--manifest",
+                    help="Path to the JSON manifest. (default: %default)",
+                    dest="manifest", default="manifest.json")
+  parser.add_option("--workers", default=None, type=int,
+      help="Number of worker processes. [default: number of cores]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  replayManifest(options.manifest, options.workers)
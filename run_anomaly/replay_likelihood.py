@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Re-tune the anomaly likelihood without rerunning the HTM models. The raw
+anomaly scores that run_anomaly.py saves in its output files are replayed
+through the same anomaly likelihood estimator that wrote the file (the
+"likelihood" option of its manifest entry) for every combination of
+likelihood parameters, and the number of records above each threshold is
+counted.
+
+With StreamingAnomalyLikelihood each parameter combination is scored in one
+vectorized pass over a file and all thresholds are counted at once, so
+sweeping all the bundled datasets takes about a second. NuPIC's
+AnomalyLikelihood has to be replayed one record at a time, which is much
+slower, and its averaging window can't be changed.
+"""
+
+from optparse import OptionParser
+import itertools
+import os
+import sys
+import time
+
+import numpy
+from nupic.algorithms.anomaly_likelihood import AnomalyLikelihood
+
+from run_parallel import loadManifest
+from streaming_likelihood import StreamingAnomalyLikelihood
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import readColumns
+from common.result_sinks import createSink, loadNpz
+
+
+_PARAMETER_NAMES = ["learningPeriod", "historicWindowSize",
+                    "reestimationPeriod", "averagingWindow"]
+
+SWEEP_FIELDS = (["outputFile", "likelihood"] + _PARAMETER_NAMES +
+                ["threshold", "logLikelihoodThreshold", "numDetections",
+                 "fractionDetected"])
+
+# NuPIC's AnomalyLikelihood always averages over this many scores
+_NUPIC_AVERAGING_WINDOW = 10
+
+
+def loadScores(path):
+  """
+  :param path: an output file written by run_anomaly.py, CSV or .npz
+
+  :return: (values, raw scores) numpy arrays with the metric value and the
+    raw anomaly score of every record
+  """
+  if path.endswith(".npz"):
+    columns = loadNpz(path)
+  else:
+    columns = readColumns(path, {"value": "float", "_raw_score": "float"})
+  return (columns["value"].astype(numpy.float64),
+          columns["_raw_score"].astype(numpy.float64))
+
+
+def countDetections(likelihoods, thresholds):
+  """
+  :return: numpy array with the number of likelihoods strictly above each
+    threshold, like the likelihood > threshold test in run_anomaly.py
+  """
+  ordered = numpy.sort(likelihoods)
+  return len(ordered) - numpy.searchsorted(ordered, thresholds, side="right")
+
+
+def replayLikelihoods(values, rawScores, parameters, estimator="streaming"):
+  """
+  Compute the anomaly likelihood of every record with one estimator.
+
+  :param values: numpy array of metric values, in record order
+  :param rawScores: numpy array of raw anomaly scores, in record order
+  :param parameters: dict of StreamingAnomalyLikelihood parameters
+  :param estimator: "streaming" for StreamingAnomalyLikelihood or "nupic" for
+    NuPIC's AnomalyLikelihood, like the --likelihood option of run_anomaly.py
+
+  :return: numpy array with the likelihood of every record
+  """
+  if estimator == "streaming":
+    likelihood = StreamingAnomalyLikelihood(**parameters)
+    return likelihood.anomalyProbabilities(values, rawScores)
+  if estimator != "nupic":
+    raise ValueError("Unknown anomaly likelihood estimator: %s" % estimator)
+
+  if parameters["averagingWindow"] != _NUPIC_AVERAGING_WINDOW:
+    raise ValueError("NuPIC's AnomalyLikelihood can only average over %d "
+                     "scores" % _NUPIC_AVERAGING_WINDOW)
+  likelihood = AnomalyLikelihood(
+    learningPeriod=parameters["learningPeriod"],
+    historicWindowSize=parameters["historicWindowSize"],
+    reestimationPeriod=parameters["reestimationPeriod"])
+  return numpy.array([likelihood.anomalyProbability(value, rawScore)
+                      for value, rawScore in itertools.izip(values,
+                                                            rawScores)])
+
+
+def sweep(values, rawScores, parameterSets, thresholds, estimator="streaming"):
+  """
+  Replay raw anomaly scores for every parameter set and threshold.
+
+  :param values: numpy array of metric values, in record order
+  :param rawScores: numpy array of raw anomaly scores, in record order
+  :param parameterSets: list of dicts of StreamingAnomalyLikelihood
+    parameters
+  :param thresholds: list of likelihood thresholds
+  :param estimator: the estimator that wrote the scores, see
+    replayLikelihoods(). Parameter sets it can't replay are skipped with a
+    warning.
+
+  :return: list of (parameters, detection counts) pairs, one per parameter
+    set, where detection counts has one entry per threshold
+  """
+  thresholds = numpy.asarray(thresholds, dtype=numpy.float64)
+  results = []
+  for parameters in parameterSets:
+    try:
+      likelihoods = replayLikelihoods(values, rawScores, parameters, estimator)
+    except ValueError as e:
+      print "Skipping",parameters,":",e
+      continue
+    results.append((parameters, countDetections(likelihoods, thresholds)))
+  return results
+
+
+def _parseList(value, type=float):
+  return [type(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nReplays the raw anomaly scores saved by run_anomaly.py through the"
+    "\nanomaly likelihood for many parameters and thresholds at once."
+    "\nRun run_parallel.py first to create the output files listed in the"
+    "\nmanifest. Parameters and thresholds are comma separated lists and"
+    "\nevery combination is tried."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--manifest", default="manifest.json",
+      help="JSON list of jobs whose output files are replayed. "
+      "[default: %default]")
+  parser.add_option("--thresholds", default="0.999,0.9999,0.99999",
+      help="Likelihood thresholds. [default: %default]")
+  parser.add_option("--learningPeriod", default="288",
+      help="[default: %default]")
+  parser.add_option("--historicWindowSize", default="8640",
+      help="[default: %default]")
+  parser.add_option("--reestimationPeriod", default="100",
+      help="[default: %default]")
+  parser.add_option("--averagingWindow", default="10",
+      help="[default: %default]")
+  parser.add_option("--outputFile", default=None,
+      help="If set, write one row per file, parameter set and threshold to "
+      "this file (CSV or .npz). [default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+
+  thresholds = _parseList(options.thresholds)
+  logThresholds = StreamingAnomalyLikelihood.computeLogLikelihood(
+    numpy.asarray(thresholds))
+  parameterSets = [
+    dict(zip(_PARAMETER_NAMES, values)) for values in itertools.product(
+      *[_parseList(getattr(options, name), int) for name in _PARAMETER_NAMES])]
+
+  startTime = time.time()
+  rows = []
+  for job in loadManifest(options.manifest):
+    if not os.path.exists(job.outputFile):
+      print "Skipping",job.outputFile,"which doesn't exist yet"
+      continue
+    values, rawScores = loadScores(job.outputFile)
+    if len(rawScores) == 0:
+      print "Skipping",job.outputFile,"which is empty"
+      continue
+
+    print
+    print os.path.basename(job.outputFile),"(%d records, %s likelihood)" % (
+      len(rawScores), job.likelihood)
+    print ("".join("%20s" % name for name in _PARAMETER_NAMES) +
+           "".join("%12s" % t for t in thresholds))
+    for parameters, counts in sweep(values, rawScores, parameterSets,
+                                    thresholds, job.likelihood):
+      print ("".join("%20d" % parameters[name] for name in _PARAMETER_NAMES) +
+             "".join("%12d" % c for c in counts))
+      for threshold, logThreshold, count in zip(thresholds, logThresholds,
+                                                counts):
+        rows.append([job.outputFile, job.likelihood] +
+                    [parameters[name] for name in _PARAMETER_NAMES] +
+                    [threshold, float(logThreshold), count,
+                     float(count) / len(rawScores)])
+
+  print
+  print "Replayed",len(parameterSets),"parameter sets and",len(thresholds),(
+    "thresholds in %.2f seconds" % (time.time() - startTime))
+
+  if options.outputFile is not None:
+    with createSink(options.outputFile, SWEEP_FIELDS) as sink:
+      for row in rows:
+        sink.write(row)
+    print "Results written to",options.outputFile
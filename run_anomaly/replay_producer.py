@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Replays a data file as a live metric feed for stream_anomaly.py. Each record
+is sent as a line "dttm,value,sentAt" where sentAt is the time.time() at which
+it was sent, so the consumer can measure end to end latency.
+"""
+
+from optparse import OptionParser
+import itertools
+import os
+import sys
+import time
+
+from stream_io import openOutput
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import readColumns
+
+
+def replay(inputFile, output, rate=0.0):
+  """
+  Send every record of inputFile to output.
+
+  :param inputFile: CSV file with dttm and value fields
+  :param output: where to send the records (see stream_io.parseAddress)
+  :param rate: records per second, or 0 to send as fast as the consumer
+    accepts them
+
+  :return: the number of records sent
+  """
+  columns = readColumns(inputFile, {"dttm": "string", "value": "string"})
+  outputFile = openOutput(output)
+
+  startTime = time.time()
+  numRecords = 0
+  for timestamp, value in itertools.izip(columns["dttm"], columns["value"]):
+    if rate > 0:
+      delay = startTime + numRecords / rate - time.time()
+      if delay > 0:
+        time.sleep(delay)
+    outputFile.write("%s,%s,%.6f\n" % (timestamp, value, time.time()))
+    outputFile.flush()
+    numRecords += 1
+
+  if outputFile is not sys.stdout:
+    outputFile.close()
+
+  elapsed = time.time() - startTime
+  print >>sys.stderr, "Sent %d records in %.1fs (%.1f records/sec)" % (
+    numRecords, elapsed, numRecords / max(elapsed, 1e-6))
+  return numRecords
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nReplays a data file as a live feed of 'dttm,value,sentAt' lines on"
+    "\nstdout or a local socket."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--inputFile",
+                    help="Path to data file. (default: %default)",
+                    dest="inputFile", default="data/cpu_cc0c5.csv")
+  parser.add_option("--output", default="-",
+      help="Where to send records: -, tcp:HOST:PORT or unix:PATH. "
+      "[default: %default]")
+  parser.add_option("--rate", default=0.0, type=float,
+      help="Records per second, 0 for as fast as possible. "
+      "[default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  replay(options.inputFile, options.output, options.rate)
@@ -25,87 +25,287 @@ A simple client to run CLA anomaly detection using the OPF.
 """
 
 from optparse import OptionParser
+import copy
+import os
 import sys
-import csv
 import math
 import datetime
+import itertools
 import dateutil.parser
 import json
+import time
+import pickle
+import shutil
 
 from nupic.frameworks.opf.modelfactory import ModelFactory
 from nupic.frameworks.opf.predictionmetricsmanager import MetricsManager
 
 from nupic.algorithms.anomaly_likelihood import AnomalyLikelihood
 
-def runAnomaly(options):
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import iterRecords, readColumnChunks
+from common.instrumentation import Instrumentation, NullInstrumentation
+from common.model_cache import ModelTemplateCache
+from streaming_likelihood import StreamingAnomalyLikelihood
+from value_stats import getValueStats, resolutionFromStats
+from common.result_sinks import createSink, truncateOutput
+
+_MODEL_PARAMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                  "model_params.json")
+
+OUTPUT_FIELDS = ["timestamp", "value",
+                  "_raw_score", "likelihood_score", "log_likelihood_score"]
+
+
+# Parsed contents of model_params.json, see loadModelParams()
+_modelParams = None
+
+
+def loadModelParams():
   """
-  Create and run a CLA Model on the given dataset (based on the hotgym anomaly
-  client in NuPIC).
+  :return: a fresh copy of the parameters in model_params.json. The file is
+    only parsed once per process.
   """
-  # Load the model params JSON
-  with open("model_params.json") as fp:
-    modelParams = json.load(fp)
+  global _modelParams
+  if _modelParams is None:
+    with open(_MODEL_PARAMS_PATH) as fp:
+      _modelParams = json.load(fp)
+  return copy.deepcopy(_modelParams)
+
+
+def createModel(options, valueStats=None):
+  """
+  Create a CLA model from model_params.json, with the encoder resolution
+  derived from the min, max and resolution in options.
+
+  If options.autoResolution is set and no resolution is given, the resolution
+  is derived from statistics of the values instead: valueStats if given (see
+  value_stats.py), otherwise the cached statistics of options.inputFile.
+
+  If options.modelCache is set, the model is cloned from a template in that
+  directory (see common/model_cache.py).
+  """
+  modelParams = loadModelParams()
 
   # Update the resolution value for the encoder
   sensorParams = modelParams['modelParams']['sensorParams']
   numBuckets = modelParams['modelParams']['sensorParams']['encoders']['value'].pop('numBuckets')
   resolution = options.resolution
+  if resolution is None and options.autoResolution:
+    if valueStats is None:
+      valueStats = getValueStats(options.inputFile,
+                                 maxRecords=options.statsRecords)
+    print "Value statistics:",valueStats
+    resolution = resolutionFromStats(valueStats, numBuckets)
   if resolution is None:
     resolution = max(0.001,
                      (options.max - options.min) / numBuckets)
   print "Using resolution value: {0}".format(resolution)
   sensorParams['encoders']['value']['resolution'] = resolution
 
-  model = ModelFactory.create(modelParams)
+  if options.modelCache:
+    model = ModelTemplateCache(options.modelCache).create(modelParams)
+  else:
+    model = ModelFactory.create(modelParams)
   model.enableInference({'predictedField': 'value'})
-  with open (options.inputFile) as fin:
-    
-    # Open file and setup headers
-    # Here we write the log likelihood value as the 'anomaly score'
-    # The actual CLA outputs are labeled 'raw anomaly score'
-    reader = csv.reader(fin)
-    csvWriter = csv.writer(open(options.outputFile,"wb"))
-    csvWriter.writerow(["timestamp", "value",
-                        "_raw_score", "likelihood_score", "log_likelihood_score"])
-    headers = reader.next()
-    
+  return model
+
+
+def createLikelihood(options):
+  """
+  Create the anomaly likelihood object selected by options.likelihood: NuPIC's
+  AnomalyLikelihood, or the constant memory StreamingAnomalyLikelihood.
+  """
+  if options.likelihood == "streaming":
+    return StreamingAnomalyLikelihood()
+  return AnomalyLikelihood()
+
+
+def saveCheckpoint(checkpointDir, model, anomalyLikelihood, numRecords,
+                   lastTimestamp):
+  """
+  Save the model, the anomaly likelihood state and the position in the input
+  file to checkpointDir. The checkpoint is written to a temporary directory
+  first and then moved into place, so a crash while checkpointing never
+  leaves a partially written checkpoint behind.
+
+  :param checkpointDir: directory to write the checkpoint to
+  :param model: the CLA model
+  :param anomalyLikelihood: the AnomalyLikelihood object
+  :param numRecords: number of input records processed so far
+  :param lastTimestamp: timestamp of the last record processed
+  """
+  tmpDir = checkpointDir + ".tmp"
+  oldDir = checkpointDir + ".old"
+  for d in (tmpDir, oldDir):
+    if os.path.exists(d):
+      shutil.rmtree(d)
+
+  model.save(os.path.join(tmpDir, "model"))
+  with open(os.path.join(tmpDir, "likelihood.pkl"), "wb") as fp:
+    pickle.dump(anomalyLikelihood, fp, pickle.HIGHEST_PROTOCOL)
+  with open(os.path.join(tmpDir, "state.json"), "w") as fp:
+    json.dump({"numRecords": numRecords,
+               "lastTimestamp": lastTimestamp.isoformat()}, fp)
+
+  if os.path.exists(checkpointDir):
+    os.rename(checkpointDir, oldDir)
+  os.rename(tmpDir, checkpointDir)
+  if os.path.exists(oldDir):
+    shutil.rmtree(oldDir)
+
+
+def loadCheckpoint(checkpointDir):
+  """
+  Load a checkpoint written by saveCheckpoint().
+
+  :return: a tuple (model, anomalyLikelihood, numRecords, lastTimestamp)
+  """
+  model = ModelFactory.loadFromCheckpoint(os.path.join(checkpointDir, "model"))
+  model.enableInference({'predictedField': 'value'})
+  with open(os.path.join(checkpointDir, "likelihood.pkl"), "rb") as fp:
+    anomalyLikelihood = pickle.load(fp)
+  with open(os.path.join(checkpointDir, "state.json")) as fp:
+    state = json.load(fp)
+
+  return (model, anomalyLikelihood, state["numRecords"],
+          dateutil.parser.parse(state["lastTimestamp"]))
+
+
+def runAnomaly(options, instrumentation=None):
+  """
+  Create and run a CLA Model on the given dataset (based on the hotgym anomaly
+  client in NuPIC).
+
+  If options.checkpointDir is set, the model and anomaly likelihood state are
+  checkpointed every options.checkpointRecords records and/or
+  options.checkpointSeconds seconds. If options.resumeFrom is set, the model is
+  loaded from that checkpoint instead of being created, the input is skipped
+  up to the last processed record and results are appended to the output
+  file.
+
+  :param options: the run_anomaly options
+  :param instrumentation: optional common.instrumentation.Instrumentation
+    that times each stage of the record loop. If None and
+    options.instrument is set, one is created that prints a summary every
+    options.instrument seconds.
+
+  :return: the number of records processed by this call
+  """
+  if instrumentation is None:
+    # --metricsPort needs the timings even without periodic summaries
+    if options.instrument or options.metricsPort:
+      instrumentation = Instrumentation(reportInterval=options.instrument)
+    else:
+      instrumentation = NullInstrumentation()
+  if options.metricsPort:
+    instrumentation.serve(options.metricsPort)
+
+  if options.resumeFrom is not None:
+    model, anomalyLikelihood, i, resumeTimestamp = loadCheckpoint(
+      options.resumeFrom)
+    print "Resuming from",options.resumeFrom,"after",i,"records (",(
+      resumeTimestamp),")"
+    # Drop any results written after the checkpoint was taken
+    truncateOutput(options.outputFile, i)
+    append = True
+  else:
+    model = createModel(options)
     # The anomaly likelihood object
-    anomalyLikelihood = AnomalyLikelihood()
+    anomalyLikelihood = createLikelihood(options)
+    i = 0
+    resumeTimestamp = None
+    append = False
+  firstRecord = i
+  lastCheckpointRecord = i
+  lastCheckpointTime = time.time()
+
+  # Setup the output. The sink is chosen from the file extension: .npz files
+  # store one numpy array per field, anything else is written as CSV.
+  # Here we write the log likelihood value as the 'anomaly score'
+  # The actual CLA outputs are labeled 'raw anomaly score'
+  with createSink(options.outputFile, OUTPUT_FIELDS, append) as sink:
+
+    # The input file is parsed in chunks of typed columns rather than one
+    # dict at a time
+    chunks = readColumnChunks(options.inputFile,
+                              {"dttm": "datetime", "value": "float"},
+                              instrumentation=instrumentation)
+    records = itertools.chain.from_iterable(
+      iterRecords(columns) for columns in chunks)
+
+    # Seek past the records already seen by a resumed model. Timestamps are
+    # not always unique, so the seek is by record count and the timestamp is
+    # only used to check that this is the input the checkpoint came from.
+    if resumeTimestamp is not None:
+      lastSkipped = None
+      for lastSkipped in itertools.islice(records, i):
+        pass
+      if lastSkipped is None or lastSkipped["dttm"] != resumeTimestamp:
+        print "Warning: record",i,"of",options.inputFile,(
+          "does not match the checkpoint timestamp"),resumeTimestamp
     
     # Iterate through each record in the CSV file
     print "Starting processing at",datetime.datetime.now()
-    for i, record in enumerate(reader, start=1):
-      
-      # Convert input data to a dict so we can pass it into the model
-      inputData = dict(zip(headers, record))
-      inputData["value"] = float(inputData["value"])
-      inputData["dttm"] = dateutil.parser.parse(inputData["dttm"])
-      #inputData["dttm"] = datetime.datetime.now()
+    for inputData in records:
+      instrumentation.mark("read")
+
+      i += 1
       
       # Send it to the CLA and get back the raw anomaly score
       result = model.run(inputData)
       anomalyScore = result.inferences['anomalyScore']
+      instrumentation.mark("model.run")
       
       # Compute the Anomaly Likelihood
       likelihood = anomalyLikelihood.anomalyProbability(
         inputData["value"], anomalyScore, inputData["dttm"])
+      instrumentation.mark("anomalyProbability")
       logLikelihood = anomalyLikelihood.computeLogLikelihood(likelihood)
-      if likelihood > 0.9999:
+      instrumentation.mark("computeLogLikelihood")
+      if likelihood > options.threshold:
         print "Anomaly detected:",inputData['dttm'],inputData['value'],likelihood
 
-      # Write results to the output CSV file
-      csvWriter.writerow([inputData["dttm"], inputData["value"],
-                          anomalyScore, likelihood, logLikelihood])
+      # Write results to the output file
+      sink.write([inputData["dttm"], inputData["value"],
+                  anomalyScore, likelihood, logLikelihood])
+      instrumentation.mark("write")
 
       # Progress report
       if (i%1000) == 0: print i,"records processed"
 
+      # Periodic checkpoint. The output file is flushed first so that it never
+      # lags behind the checkpoint.
+      if options.checkpointDir is not None and (
+          (options.checkpointRecords and
+           i - lastCheckpointRecord >= options.checkpointRecords) or
+          (options.checkpointSeconds and
+           time.time() - lastCheckpointTime >= options.checkpointSeconds)):
+        sink.flush()
+        saveCheckpoint(options.checkpointDir, model, anomalyLikelihood, i,
+                       inputData["dttm"])
+        lastCheckpointRecord = i
+        lastCheckpointTime = time.time()
+        instrumentation.mark("checkpoint")
+
+      instrumentation.recordProcessed()
+
   print "Completed processing",i,"records at",datetime.datetime.now()
+  if options.instrument:
+    instrumentation.printSummary()
   print "Anomaly scores for",options.inputFile,
   print "have been written to",options.outputFile
 
+  return i - firstRecord
 
-if __name__ == "__main__":
+
+def createOptionParser():
+  """
+  Return the OptionParser for run_anomaly, shared with the scripts that build
+  run_anomaly options programmatically (e.g. run_parallel.py).
+  """
   helpString = (
     "\n%prog [options] [uid]"
     "\n%prog --help"
@@ -123,7 +323,8 @@ if __name__ == "__main__":
                     dest="inputFile", default="data/cpu_cc0c5.csv")
   parser.add_option("--outputFile",
                     help="Output file. Results will be written to this file."
-                    " (default: %default)", 
+                    " Use a .npz extension to write numpy arrays instead of"
+                    " CSV. (default: %default)", 
                     dest="outputFile", default="anomaly_scores.csv")
   parser.add_option("--max", default=100.0, type=float,
       help="Maximum number for the value field. [default: %default]")
@@ -131,11 +332,50 @@ if __name__ == "__main__":
       help="Minimum number for the value field. [default: %default]")
   parser.add_option("--resolution", default=None, type=float,
       help="Resolution for the value field (overrides min and max). [default: %default]")
-  
-  options, args = parser.parse_args(sys.argv[1:])
+  parser.add_option("--autoResolution", default=False, action="store_true",
+      help="Derive the resolution from statistics of the input values "
+      "instead of min and max. The statistics are cached next to the input "
+      "file.")
+  parser.add_option("--statsRecords", default=None, type=int,
+      help="With --autoResolution, only use the first this many records. "
+      "[default: all]")
+  parser.add_option("--modelCache", default=None,
+      help="If set, keep a template of the untrained model in this "
+      "directory and clone new models from it, which is faster than "
+      "building them. [default: %default]")
+  parser.add_option("--checkpointDir", default=None,
+      help="If set, periodically checkpoint the model and anomaly likelihood "
+      "state to this directory. [default: %default]")
+  parser.add_option("--checkpointRecords", default=5000, type=int,
+      help="Checkpoint every this many records (0 to disable). "
+      "[default: %default]")
+  parser.add_option("--checkpointSeconds", default=None, type=float,
+      help="Checkpoint at least every this many seconds. [default: %default]")
+  parser.add_option("--resumeFrom", default=None,
+      help="Resume from the checkpoint in this directory, skipping input "
+      "records up to the last processed record and appending to the "
+      "output file. [default: %default]")
+  parser.add_option("--threshold", default=0.9999, type=float,
+      help="Print records whose anomaly likelihood is above this threshold. "
+      "replay_likelihood.py helps to choose it. [default: %default]")
+  parser.add_option("--likelihood", default="nupic",
+      choices=["nupic", "streaming"],
+      help="Anomaly likelihood implementation: nupic, or streaming for the "
+      "constant time and memory version in streaming_likelihood.py. "
+      "[default: %default]")
+  parser.add_option("--instrument", default=None, type=float,
+      help="Time each stage of the record loop and print a summary every "
+      "this many seconds and at the end. [default: %default]")
+  parser.add_option("--metricsPort", default=None, type=int,
+      help="Serve the stage timings as JSON on this localhost port. "
+      "[default: %default]")
 
-  # Run it
-  runAnomaly(options)
+  return parser
 
 
+if __name__ == "__main__":
+  parser = createOptionParser()
+  options, args = parser.parse_args(sys.argv[1:])
 
+  # Run it
+  runAnomaly(options)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for checkpointing and resuming in run_anomaly.py. They need NuPIC and
+are skipped without it.
+"""
+
+import csv
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy
+
+try:
+  import run_anomaly
+except ImportError:
+  run_anomaly = None
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import readColumns
+from common.result_sinks import loadNpz
+
+
+
+@unittest.skipIf(run_anomaly is None, "NuPIC is not installed")
+class ResumeTest(unittest.TestCase):
+
+  numRecords = 300
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.inputFile = os.path.join(self.tmpDir, "input.csv")
+    start = datetime.datetime(2014, 1, 1)
+    # Timestamps that repeat and go backwards, like daylight saving time
+    # changes, must not confuse the seek on resume
+    self.timestamps = [start + datetime.timedelta(minutes=5 * (i % 120))
+                       for i in range(self.numRecords)]
+    self.values = [float(i % 17) for i in range(self.numRecords)]
+    self._writeInput(self.inputFile, self.numRecords)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _writeInput(self, path, numRecords):
+    with open(path, "wb") as fp:
+      writer = csv.writer(fp)
+      writer.writerow(["dttm", "value"])
+      for timestamp, value in zip(self.timestamps[:numRecords],
+                                  self.values[:numRecords]):
+        writer.writerow([timestamp.strftime("%Y-%m-%d %H:%M:%S"), value])
+
+
+  def _options(self, inputFile, outputFile, **kwargs):
+    options = run_anomaly.createOptionParser().get_default_values()
+    options.inputFile = inputFile
+    options.outputFile = outputFile
+    options.min = 0.0
+    options.max = 20.0
+    for name, value in kwargs.iteritems():
+      setattr(options, name, value)
+    return options
+
+
+  def _resumeAfterCrash(self, outputFile):
+    checkpointDir = os.path.join(self.tmpDir, "checkpoint")
+
+    # A run that checkpointed after 100 records and got to record 170 before
+    # it died: the output has rows that the checkpoint hasn't seen
+    crashedInput = os.path.join(self.tmpDir, "crashed.csv")
+    self._writeInput(crashedInput, 170)
+    run_anomaly.runAnomaly(self._options(crashedInput, outputFile,
+                                         checkpointDir=checkpointDir,
+                                         checkpointRecords=100))
+
+    processed = run_anomaly.runAnomaly(self._options(
+      self.inputFile, outputFile, resumeFrom=checkpointDir))
+    self.assertEqual(processed, self.numRecords - 100)
+
+
+  def testResumeCsvWithoutDuplicateOrDroppedRows(self):
+    outputFile = os.path.join(self.tmpDir, "output.csv")
+    self._resumeAfterCrash(outputFile)
+    columns = readColumns(outputFile, {"timestamp": "datetime",
+                                       "value": "float"})
+    self.assertEqual(list(columns["timestamp"]), self.timestamps)
+    self.assertEqual(list(columns["value"]), self.values)
+
+
+  def testResumeNpzWithoutDuplicateOrDroppedRows(self):
+    outputFile = os.path.join(self.tmpDir, "output.npz")
+    self._resumeAfterCrash(outputFile)
+    arrays = loadNpz(outputFile)
+    self.assertEqual(arrays["timestamp"].astype(object).tolist(),
+                     self.timestamps)
+    numpy.testing.assert_array_equal(arrays["value"], self.values)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
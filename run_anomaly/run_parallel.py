@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Run anomaly detection on many data files in parallel. Each job in the manifest
+is an independent call to runAnomaly() and is executed in its own worker
+process, so throughput scales with the number of cores.
+"""
+
+from optparse import OptionParser
+import os
+import sys
+import json
+import time
+import datetime
+import traceback
+import multiprocessing
+
+from run_anomaly import createOptionParser, runAnomaly
+
+
+def loadManifest(manifestPath):
+  """
+  Read a JSON manifest containing a list of jobs. Each job is a dict with an
+  inputFile, an outputFile and optionally min, max and resolution. Any option
+  not given in a job gets the same default as run_anomaly.py. Relative paths
+  are interpreted relative to the manifest file.
+
+  :param manifestPath: path to the JSON manifest
+
+  :return: a list of options objects, one per job, suitable for runAnomaly()
+  """
+  with open(manifestPath) as fp:
+    jobSpecs = json.load(fp)
+
+  baseDir = os.path.dirname(os.path.abspath(manifestPath))
+  jobs = []
+  for spec in jobSpecs:
+    options = createOptionParser().get_default_values()
+    for key, value in spec.iteritems():
+      setattr(options, str(key), value)
+    options.inputFile = os.path.join(baseDir, options.inputFile)
+    options.outputFile = os.path.join(baseDir, options.outputFile)
+    jobs.append(options)
+
+  return jobs
+
+
+def runJob(options):
+  """
+  Run a single job inside a worker process. Exceptions are caught here so that
+  one bad stream does not take down the rest of the run.
+
+  :return: a dict summarizing the job
+  """
+  startTime = time.time()
+  summary = {"inputFile": options.inputFile,
+             "outputFile": options.outputFile,
+             "numRecords": 0,
+             "error": None}
+  try:
+    summary["numRecords"] = runAnomaly(options)
+  except Exception:
+    summary["error"] = traceback.format_exc()
+  summary["elapsed"] = time.time() - startTime
+  return summary
+
+
+def runParallel(jobs, numWorkers=None):
+  """
+  Run the given jobs across a pool of worker processes.
+
+  :param jobs: a list of options objects, as returned by loadManifest()
+  :param numWorkers: number of worker processes. Defaults to the number of
+    cores.
+
+  :return: a list with one summary dict per job, in completion order
+  """
+  if numWorkers is None:
+    numWorkers = multiprocessing.cpu_count()
+  numWorkers = max(1, min(numWorkers, len(jobs)))
+
+  print "Running",len(jobs),"jobs on",numWorkers,"workers at",(
+    datetime.datetime.now())
+  startTime = time.time()
+
+  # Each worker only runs a single job so the memory used by a model is
+  # returned to the OS as soon as its stream is done.
+  pool = multiprocessing.Pool(numWorkers, maxtasksperchild=1)
+  summaries = []
+  try:
+    for summary in pool.imap_unordered(runJob, jobs):
+      summaries.append(summary)
+      if summary["error"] is None:
+        print "[%d/%d] Finished %s: %d records in %.1fs" % (
+          len(summaries), len(jobs), summary["inputFile"],
+          summary["numRecords"], summary["elapsed"])
+      else:
+        print "[%d/%d] FAILED %s:" % (len(summaries), len(jobs),
+                                      summary["inputFile"])
+        print summary["error"]
+    pool.close()
+  except KeyboardInterrupt:
+    pool.terminate()
+    raise
+  finally:
+    pool.join()
+
+  printSummary(summaries, time.time() - startTime)
+  return summaries
+
+
+def printSummary(summaries, elapsed):
+  """
+  Print per-stream and overall throughput.
+  """
+  print
+  print "%-50s %10s %10s %12s" % ("stream", "records", "seconds",
+                                  "records/sec")
+  totalRecords = 0
+  for summary in sorted(summaries, key=lambda s: s["inputFile"]):
+    name = os.path.basename(summary["inputFile"])
+    if summary["error"] is not None:
+      print "%-50s %10s" % (name, "FAILED")
+      continue
+    totalRecords += summary["numRecords"]
+    print "%-50s %10d %10.1f %12.1f" % (
+      name, summary["numRecords"], summary["elapsed"],
+      summary["numRecords"] / max(summary["elapsed"], 1e-6))
+
+  numFailed = len([s for s in summaries if s["error"] is not None])
+  print
+  print "Processed %d records from %d streams (%d failed) in %.1fs" % (
+    totalRecords, len(summaries), numFailed, elapsed)
+  print "Overall throughput: %.1f records/sec" % (
+    totalRecords / max(elapsed, 1e-6))
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nRuns NuPIC anomaly detection on every job in a JSON manifest using a"
+    "\npool of worker processes. See manifest.json for an example that is"
+    "\nequivalent to run_all.sh."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--manifest",
+                    help="Path to the JSON manifest. (default: %default)",
+                    dest="manifest", default="manifest.json")
+  parser.add_option("--workers", default=None, type=int,
+      help="Number of worker processes. [default: number of cores]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+
+  summaries = runParallel(loadManifest(options.manifest), options.workers)
+  if any(s["error"] is not None for s in summaries):
+    sys.exit(1)
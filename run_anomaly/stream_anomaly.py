@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Run CLA anomaly detection on a live feed of records arriving on stdin or a
+local socket. Each input line is "dttm,value" with an optional third field
+"sentAt" (time.time() when the record was sent, as written by
+replay_producer.py). Every record is scored as soon as it arrives and one
+result line is written per record.
+
+Records are handed from a reader thread to the model through a bounded queue.
+When the model falls behind the queue fills up, the reader stops reading and
+the sender is blocked, so end to end latency is bounded by roughly queueSize
+times the time it takes to score one record.
+"""
+
+from optparse import OptionParser
+import csv
+import itertools
+import sys
+import time
+import Queue
+import threading
+
+import numpy
+
+from run_anomaly import OUTPUT_FIELDS, createLikelihood, createModel
+from stream_io import iterLines
+from value_stats import StreamingStats
+from common.columnar_reader import parseTimestamps
+
+
+def _readRecords(address, recordQueue, serveForever):
+  """
+  Reader thread: put (line, arrivalTime) on the queue for every line that
+  arrives, then None at the end of the stream.
+  """
+  for line in iterLines(address, serveForever):
+    recordQueue.put((line, time.time()))
+  recordQueue.put(None)
+
+
+def _parseRecords(recordQueue, timestampFormat):
+  """
+  Yield (timestamp, value, sentAt) for every record on the queue. A header
+  line is skipped, and so is anything else that doesn't parse, with a message
+  on stderr.
+  """
+  firstLine = True
+  while True:
+    item = recordQueue.get()
+    if item is None:
+      break
+    line, arrivalTime = item
+
+    fields = line.strip().split(",")
+    try:
+      value = float(fields[1])
+      sentAt = float(fields[2]) if len(fields) > 2 else arrivalTime
+      timestamp = parseTimestamps([fields[0]], timestampFormat)[0]
+    except (IndexError, ValueError, OverflowError):
+      if not firstLine:
+        print >>sys.stderr, "Skipping malformed record:",line.strip()
+      continue
+    finally:
+      firstLine = False
+    yield timestamp, value, sentAt
+
+
+def streamAnomaly(options):
+  """
+  Score records from options.input until the stream ends.
+
+  With options.autoResolution, the first options.statsRecords records are
+  buffered and the encoder resolution is derived from their values before the
+  model is created.
+
+  :return: a numpy array with the end to end latency in seconds of every
+    record scored
+  """
+  if options.outputFile == "-":
+    outputFile = sys.stdout
+  else:
+    outputFile = open(options.outputFile, "wb")
+  csvWriter = csv.writer(outputFile)
+  csvWriter.writerow(OUTPUT_FIELDS)
+
+  recordQueue = Queue.Queue(options.queueSize)
+  reader = threading.Thread(target=_readRecords,
+                            args=(options.input, recordQueue,
+                                  options.serveForever))
+  reader.daemon = True
+  reader.start()
+
+  latencies = []
+  print >>sys.stderr, "Waiting for records on",options.input
+  records = _parseRecords(recordQueue, options.timestampFormat)
+  valueStats = None
+  if options.autoResolution and options.resolution is None:
+    warmup = list(itertools.islice(records, options.statsRecords))
+    if warmup:
+      stats = StreamingStats()
+      stats.update([value for _, value, _ in warmup])
+      valueStats = stats.summary()
+    else:
+      # The stream ended before any records arrived, use min and max
+      options.autoResolution = False
+    records = itertools.chain(warmup, records)
+  model = createModel(options, valueStats)
+  anomalyLikelihood = createLikelihood(options)
+
+  try:
+    for timestamp, value, sentAt in records:
+      result = model.run({"dttm": timestamp, "value": value})
+      anomalyScore = result.inferences['anomalyScore']
+      likelihood = anomalyLikelihood.anomalyProbability(
+        value, anomalyScore, timestamp)
+      logLikelihood = anomalyLikelihood.computeLogLikelihood(likelihood)
+      if likelihood > options.threshold:
+        print >>sys.stderr, "Anomaly detected:",timestamp,value,likelihood
+
+      csvWriter.writerow([timestamp, value,
+                          anomalyScore, likelihood, logLikelihood])
+      outputFile.flush()
+      latencies.append(time.time() - sentAt)
+  except KeyboardInterrupt:
+    pass
+
+  if outputFile is not sys.stdout:
+    outputFile.close()
+
+  latencies = numpy.array(latencies)
+  printLatencySummary(latencies)
+  return latencies
+
+
+def printLatencySummary(latencies):
+  """
+  Print latency percentiles to stderr.
+  """
+  if len(latencies) == 0:
+    print >>sys.stderr, "No records processed"
+    return
+  p50, p95, p99 = numpy.percentile(latencies, [50, 95, 99]) * 1000.0
+  print >>sys.stderr, "Processed %d records" % len(latencies)
+  print >>sys.stderr, (
+    "End to end latency (ms): p50=%.2f p95=%.2f p99=%.2f max=%.2f" % (
+    p50, p95, p99, latencies.max() * 1000.0))
+
+
+if __name__ == "__main__":
+  helpString = (
+    "\n%prog [options]"
+    "\n%prog --help"
+    "\n"
+    "\nRuns NuPIC anomaly detection on a live feed of 'dttm,value[,sentAt]'"
+    "\nlines read from stdin or a local socket. Use replay_producer.py to"
+    "\nreplay one of the data files as a live feed."
+    "\nNote: it is important to set min and max properly according to data."
+  )
+
+  parser = OptionParser(helpString)
+  parser.add_option("--input", default="-",
+      help="Where to read records from: -, tcp:HOST:PORT or unix:PATH. "
+      "[default: %default]")
+  parser.add_option("--outputFile", default="anomaly_scores_stream.csv",
+      help="Output file, - for stdout. [default: %default]")
+  parser.add_option("--serveForever", default=False, action="store_true",
+      help="Keep accepting socket connections instead of exiting when the "
+      "first one closes.")
+  parser.add_option("--queueSize", default=100, type=int,
+      help="Maximum number of records waiting to be scored before the sender "
+      "is blocked. [default: %default]")
+  parser.add_option("--timestampFormat", default=None,
+      help="strptime format of the timestamps. [default: ISO 8601]")
+  parser.add_option("--max", default=100.0, type=float,
+      help="Maximum number for the value field. [default: %default]")
+  parser.add_option("--min", default=0.0, type=float,
+      help="Minimum number for the value field. [default: %default]")
+  parser.add_option("--resolution", default=None, type=float,
+      help="Resolution for the value field (overrides min and max). [default: %default]")
+  parser.add_option("--modelCache", default=None,
+      help="If set, clone the model from a template kept in this directory. "
+      "[default: %default]")
+  parser.add_option("--autoResolution", default=False, action="store_true",
+      help="Derive the resolution from the values of the first "
+      "--statsRecords records instead of min and max.")
+  parser.add_option("--statsRecords", default=1000, type=int,
+      help="Number of records buffered for --autoResolution. "
+      "[default: %default]")
+  parser.add_option("--threshold", default=0.9999, type=float,
+      help="Print records whose anomaly likelihood is above this threshold. "
+      "[default: %default]")
+  parser.add_option("--likelihood", default="nupic",
+      choices=["nupic", "streaming"],
+      help="Anomaly likelihood implementation: nupic, or streaming for the "
+      "constant time and memory version in streaming_likelihood.py. "
+      "[default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  streamAnomaly(options)
@@ -0,0 +1,110 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Helpers for reading and writing newline delimited records over stdin/stdout,
+local TCP sockets or Unix domain sockets. Addresses are given as:
+
+  -                 stdin or stdout
+  tcp:HOST:PORT     a TCP socket, e.g. tcp:localhost:9000
+  unix:PATH         a Unix domain socket, e.g. unix:/tmp/anomaly.sock
+"""
+
+import os
+import socket
+import sys
+
+
+def parseAddress(address):
+  """
+  :param address: an address in one of the forms described above
+
+  :return: a pair (family, socketAddress). family is None for stdin/stdout.
+  """
+  if address in ("-", "stdin", "stdout"):
+    return None, None
+  if address.startswith("tcp:"):
+    host, port = address[len("tcp:"):].rsplit(":", 1)
+    return socket.AF_INET, (host, int(port))
+  if address.startswith("unix:"):
+    return socket.AF_UNIX, address[len("unix:"):]
+  raise ValueError("Unknown address %r. Use -, tcp:HOST:PORT or unix:PATH"
+                   % address)
+
+
+def iterLines(address, serveForever=False):
+  """
+  Yield lines as they arrive on stdin or on a listening socket. For sockets
+  one connection is served at a time. Nothing more is read until the caller
+  asks for the next line, so a slow caller applies backpressure all the way
+  to the sender.
+
+  :param address: where to read from (see parseAddress)
+  :param serveForever: if True keep accepting new connections, otherwise
+    stop after the first connection is closed
+  """
+  family, socketAddress = parseAddress(address)
+  if family is None:
+    # readline() rather than iterating over the file, which reads ahead in
+    # large blocks and would hold back records
+    for line in iter(sys.stdin.readline, ""):
+      yield line
+    return
+
+  listener = socket.socket(family, socket.SOCK_STREAM)
+  if family == socket.AF_UNIX:
+    if os.path.exists(socketAddress):
+      os.unlink(socketAddress)
+  else:
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  listener.bind(socketAddress)
+  listener.listen(1)
+  try:
+    while True:
+      connection, _ = listener.accept()
+      connectionFile = connection.makefile("rb")
+      for line in iter(connectionFile.readline, ""):
+        yield line
+      connectionFile.close()
+      connection.close()
+      if not serveForever:
+        break
+  finally:
+    listener.close()
+    if family == socket.AF_UNIX and os.path.exists(socketAddress):
+      os.unlink(socketAddress)
+
+
+def openOutput(address):
+  """
+  Open stdout or connect to a listening socket for writing.
+
+  :param address: where to write to (see parseAddress)
+
+  :return: a file like object
+  """
+  family, socketAddress = parseAddress(address)
+  if family is None:
+    return sys.stdout
+
+  connection = socket.socket(family, socket.SOCK_STREAM)
+  connection.connect(socketAddress)
+  return connection.makefile("wb")
@@ -0,0 +1,425 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+An anomaly likelihood estimator with O(1) work per record and bounded memory.
+
+It follows NuPIC's AnomalyLikelihood: raw anomaly scores are smoothed with a
+short moving average, a normal distribution is fitted to the smoothed scores
+of a long historic window (leaving out the initial learning period), and the
+likelihood is one minus the tail probability of the current smoothed score.
+Like NuPIC it
+
+- fits a "null" distribution that reports everything as not anomalous when
+  the metric values in the window are flat, and
+- lowers the second and later of consecutive likelihoods above 0.99999 to
+  0.999, like _filterLikelihoods(), so a single incident doesn't raise a
+  stream of red alerts.
+
+Instead of keeping the (timestamp, value, score) history and refitting the
+distribution from scratch every reestimationPeriod records, the smoothed
+scores and the metric values are kept in fixed size ring buffers together
+with their running sums and sums of squares, so refitting is just reading off
+means and variances.
+
+The differences from NuPIC are small: the moving averages at the start of
+the historic window are computed with the scores that came before the window
+rather than restarting at the start of the window, and timestamps are
+ignored, as they are by NuPIC's estimator.
+"""
+
+import math
+
+import numpy
+
+
+# Same lower bounds on the fitted distribution as NuPIC's estimateNormal()
+_MIN_MEAN = 0.03
+_MIN_VARIANCE = 0.0003
+
+# Metric values with a lower variance than this are considered flat, and the
+# null distribution of NuPIC's nullDistribution() is used
+_FLAT_VARIANCE = 1.5e-5
+_NULL_MEAN = 0.5
+_NULL_STDEV = 1000.0
+
+# Thresholds of NuPIC's _filterLikelihoods(), as tail probabilities
+_RED_THRESHOLD = 1.0 - 0.99999
+_YELLOW_THRESHOLD = 1.0 - 0.999
+
+_erfc = numpy.frompyfunc(math.erfc, 1, 1)
+
+
+def _tailProbability(x, mean, stdev):
+  """
+  Probability that a normal variable deviates from its mean by more than x.
+  x, mean and stdev can be numbers or numpy arrays.
+  """
+  z = numpy.abs(x - mean) / stdev
+  return 0.5 * _erfc(z / 1.4142).astype(numpy.float64)
+
+
+def _filter(tails, previousTails):
+  """
+  NuPIC's _filterLikelihoods(): a tail probability in the red zone is raised
+  to the yellow threshold if the previous record was in the red zone too. The
+  previous record's tail probability is the unfiltered one.
+  """
+  return numpy.where((tails <= _RED_THRESHOLD) &
+                     (previousTails <= _RED_THRESHOLD),
+                     _YELLOW_THRESHOLD, tails)
+
+
+
+class StreamingAnomalyLikelihood(object):
+  """
+  Replacement for nupic.algorithms.anomaly_likelihood.AnomalyLikelihood with
+  constant time updates, constant memory and batch scoring. See the module
+  docstring for the differences.
+  """
+
+  def __init__(self, learningPeriod=288, estimationSamples=100,
+               historicWindowSize=8640, reestimationPeriod=100,
+               averagingWindow=10):
+    """
+    The parameters have the same meaning and defaults as in NuPIC.
+
+    :param learningPeriod: number of initial records whose scores are left out
+      of the distribution, because the model is still learning
+    :param estimationSamples: number of records after the learning period
+      before the distribution is first fitted. Until then the likelihood is
+      0.5.
+    :param historicWindowSize: number of smoothed scores the distribution is
+      fitted to
+    :param reestimationPeriod: the distribution is refitted every this many
+      records
+    :param averagingWindow: size of the moving average applied to raw scores
+    """
+    self.learningPeriod = learningPeriod
+    self.estimationSamples = estimationSamples
+    self.historicWindowSize = historicWindowSize
+    self.reestimationPeriod = reestimationPeriod
+    self.averagingWindow = averagingWindow
+    self.iteration = 0
+
+    # The last averagingWindow raw scores and their sum
+    self._recent = numpy.zeros(averagingWindow)
+    self._recentCount = 0
+    self._recentPosition = 0
+    self._recentTotal = 0.0
+
+    # The moving average of the previous record, for the filter
+    self._previousAverage = None
+
+    # The last historicWindowSize smoothed scores, their sum and sum of squares
+    self._averages = numpy.zeros(historicWindowSize)
+    self._averagesCount = 0
+    self._averagesPosition = 0
+    self._sum = 0.0
+    self._sumSquares = 0.0
+
+    # The metric values of the same records, minus the first value ever seen
+    # so that the variance of a flat metric is exactly zero
+    self._values = numpy.zeros(historicWindowSize)
+    self._valueShift = None
+    self._valueSum = 0.0
+    self._valueSumSquares = 0.0
+
+    # The fitted distribution
+    self._mean = None
+    self._stdev = None
+
+
+  @property
+  def probationaryPeriod(self):
+    return self.learningPeriod + self.estimationSamples
+
+
+  @staticmethod
+  def computeLogLikelihood(likelihood):
+    """
+    Same as AnomalyLikelihood.computeLogLikelihood(), but also works on numpy
+    arrays.
+    """
+    return numpy.log(1.0000000001 - likelihood) / -23.02585084720009
+
+
+  def anomalyProbability(self, value, anomalyScore, timestamp=None):
+    """
+    Compute the likelihood of the next anomaly score. timestamp is ignored, it
+    is accepted for compatibility with AnomalyLikelihood.
+
+    :param value: the metric value, used to detect flat metrics
+    :param anomalyScore: the raw anomaly score of the model
+
+    :return: the anomaly likelihood, between 0 and 1
+    """
+    average = self._addRecentScore(anomalyScore)
+    if self._valueShift is None:
+      self._valueShift = value
+
+    if self.iteration < self.probationaryPeriod:
+      likelihood = 0.5
+    else:
+      if self._stdev is None or self.iteration % self.reestimationPeriod == 0:
+        self._estimate()
+      tail = 0.5 * math.erfc(abs(average - self._mean) / self._stdev / 1.4142)
+      if self._previousAverage is not None and tail <= _RED_THRESHOLD:
+        previousTail = 0.5 * math.erfc(
+          abs(self._previousAverage - self._mean) / self._stdev / 1.4142)
+        if previousTail <= _RED_THRESHOLD:
+          tail = _YELLOW_THRESHOLD
+      likelihood = 1.0 - tail
+
+    if self.iteration >= self.learningPeriod:
+      self._addAverage(average, value - self._valueShift)
+    self._previousAverage = average
+    self.iteration += 1
+
+    return likelihood
+
+
+  def anomalyProbabilities(self, values, anomalyScores):
+    """
+    Vectorized version of anomalyProbability() for arrays of consecutive
+    metric values and anomaly scores. Gives the same results, up to rounding,
+    and leaves the estimator in the same state as calling
+    anomalyProbability() for every record.
+
+    :return: numpy array with the likelihood of every score
+    """
+    scores = numpy.asarray(anomalyScores, dtype=numpy.float64)
+    n = len(scores)
+    if n == 0:
+      return numpy.zeros(0)
+    if self._valueShift is None:
+      self._valueShift = float(values[0])
+    shiftedValues = (numpy.asarray(values, dtype=numpy.float64) -
+                     self._valueShift)
+    iterations = self.iteration + numpy.arange(n)
+
+    # Moving averages, over the raw scores that came before this batch too
+    recent = _ordered(self._recent, self._recentCount, self._recentPosition)
+    allScores = numpy.concatenate([recent, scores])
+    cumulative = numpy.concatenate([[0.0], numpy.cumsum(allScores)])
+    counts = numpy.minimum(self.averagingWindow,
+                           self._recentCount + numpy.arange(1, n + 1))
+    ends = len(recent) + numpy.arange(1, n + 1)
+    averages = (cumulative[ends] - cumulative[ends - counts]) / counts
+
+    # The smoothed scores that go into the distribution, and for each record
+    # how many of them were added before it
+    previous = _ordered(self._averages, self._averagesCount,
+                        self._averagesPosition)
+    added = iterations >= self.learningPeriod
+    allAverages = numpy.concatenate([previous, averages[added]])
+    sums = numpy.concatenate([[0.0], numpy.cumsum(allAverages)])
+    sumSquares = numpy.concatenate([[0.0], numpy.cumsum(allAverages ** 2)])
+    numBefore = len(previous) + numpy.cumsum(added) - added
+
+    # The same for the metric values
+    allValues = numpy.concatenate([
+      _ordered(self._values, self._averagesCount, self._averagesPosition),
+      shiftedValues[added]])
+    valueSums = numpy.concatenate([[0.0], numpy.cumsum(allValues)])
+    valueSumSquares = numpy.concatenate([[0.0], numpy.cumsum(allValues ** 2)])
+
+    # Records at which the distribution is refitted
+    scored = iterations >= self.probationaryPeriod
+    refit = scored & (iterations % self.reestimationPeriod == 0)
+    if self._stdev is None and scored.any():
+      refit[numpy.argmax(scored)] = True
+    refitIndices = numpy.nonzero(refit)[0]
+
+    windowEnds = numBefore[refitIndices]
+    windowStarts = windowEnds - numpy.minimum(self.historicWindowSize,
+                                              windowEnds)
+    windowSizes = numpy.maximum(windowEnds - windowStarts, 1)
+    means = (sums[windowEnds] - sums[windowStarts]) / windowSizes
+    variances = ((sumSquares[windowEnds] - sumSquares[windowStarts]) /
+                 windowSizes - means ** 2)
+    means = numpy.maximum(means, _MIN_MEAN)
+    stdevs = numpy.sqrt(numpy.maximum(variances, _MIN_VARIANCE))
+
+    valueMeans = (valueSums[windowEnds] - valueSums[windowStarts]) / windowSizes
+    valueVariances = ((valueSumSquares[windowEnds] -
+                       valueSumSquares[windowStarts]) / windowSizes -
+                      valueMeans ** 2)
+    flat = valueVariances < _FLAT_VARIANCE
+    means[flat] = _NULL_MEAN
+    stdevs[flat] = _NULL_STDEV
+
+    # The distribution in effect for every record: the last refit at or
+    # before it, or the one fitted before this batch
+    lastRefit = numpy.maximum.accumulate(
+      numpy.where(refit, numpy.arange(n), -1))
+    if self._stdev is not None:
+      means = numpy.concatenate([[self._mean], means])
+      stdevs = numpy.concatenate([[self._stdev], stdevs])
+      which = numpy.searchsorted(refitIndices, lastRefit) + (lastRefit >= 0)
+    else:
+      which = numpy.searchsorted(refitIndices, lastRefit)
+    which = numpy.where(scored, which, 0)
+
+    likelihoods = numpy.full(n, 0.5)
+    if scored.any():
+      # The previous record's tail probability is computed with the
+      # distribution of the current record, as NuPIC does after refitting
+      previousAverages = numpy.concatenate([
+        [numpy.nan if self._previousAverage is None else self._previousAverage],
+        averages[:-1]])
+      scoredMeans = means[which[scored]]
+      scoredStdevs = stdevs[which[scored]]
+      tails = _tailProbability(averages[scored], scoredMeans, scoredStdevs)
+      with numpy.errstate(invalid="ignore"):
+        previousTails = _tailProbability(previousAverages[scored],
+                                         scoredMeans, scoredStdevs)
+        likelihoods[scored] = 1.0 - _filter(tails, previousTails)
+
+    # Leave the estimator in the same state as after scoring one at a time
+    self._recentCount = min(self.averagingWindow, self._recentCount + n)
+    self._recentPosition = self._recentCount % self.averagingWindow
+    _fillRing(self._recent, allScores, self._recentCount)
+    self._recentTotal = self._recent[:self._recentCount].sum()
+    self._averagesCount = min(self.historicWindowSize,
+                              self._averagesCount + int(added.sum()))
+    self._averagesPosition = self._averagesCount % self.historicWindowSize
+    _fillRing(self._averages, allAverages, self._averagesCount)
+    _fillRing(self._values, allValues, self._averagesCount)
+    self._resetSums()
+    self._previousAverage = float(averages[-1])
+    if len(refitIndices) > 0:
+      self._mean = float(means[-1])
+      self._stdev = float(stdevs[-1])
+    self.iteration += n
+
+    return likelihoods
+
+
+  def _addRecentScore(self, anomalyScore):
+    """
+    Add a raw score to the moving average window.
+
+    :return: the new moving average
+    """
+    if self._recentCount == self.averagingWindow:
+      self._recentTotal -= self._recent[self._recentPosition]
+    else:
+      self._recentCount += 1
+    self._recent[self._recentPosition] = anomalyScore
+    self._recentTotal += anomalyScore
+    self._recentPosition = (self._recentPosition + 1) % self.averagingWindow
+    return self._recentTotal / self._recentCount
+
+
+  def _addAverage(self, average, shiftedValue):
+    """
+    Add a smoothed score and its shifted metric value to the historic window.
+    """
+    if self._averagesCount == self.historicWindowSize:
+      old = self._averages[self._averagesPosition]
+      self._sum -= old
+      self._sumSquares -= old * old
+      old = self._values[self._averagesPosition]
+      self._valueSum -= old
+      self._valueSumSquares -= old * old
+    else:
+      self._averagesCount += 1
+    self._averages[self._averagesPosition] = average
+    self._sum += average
+    self._sumSquares += average * average
+    self._values[self._averagesPosition] = shiftedValue
+    self._valueSum += shiftedValue
+    self._valueSumSquares += shiftedValue * shiftedValue
+    self._averagesPosition = ((self._averagesPosition + 1) %
+                              self.historicWindowSize)
+
+    # Recompute the sums exactly once per trip around the ring, so rounding
+    # errors can't accumulate
+    if self._averagesPosition == 0:
+      self._resetSums()
+
+
+  def _resetSums(self):
+    window = self._averages[:self._averagesCount]
+    self._sum = window.sum()
+    self._sumSquares = numpy.dot(window, window)
+    window = self._values[:self._averagesCount]
+    self._valueSum = window.sum()
+    self._valueSumSquares = numpy.dot(window, window)
+
+
+  def _estimate(self):
+    """
+    Fit the normal distribution to the smoothed scores in the window, or use
+    the null distribution if the metric values in the window are flat.
+    """
+    n = max(self._averagesCount, 1)
+    valueMean = self._valueSum / n
+    if self._valueSumSquares / n - valueMean * valueMean < _FLAT_VARIANCE:
+      self._mean = _NULL_MEAN
+      self._stdev = _NULL_STDEV
+      return
+    mean = self._sum / n
+    variance = self._sumSquares / n - mean * mean
+    self._mean = max(mean, _MIN_MEAN)
+    self._stdev = math.sqrt(max(variance, _MIN_VARIANCE))
+
+
+  def __getstate__(self):
+    # Only store the filled part of the ring buffers
+    state = self.__dict__.copy()
+    state["_recent"] = self._recent[:self._recentCount].copy()
+    state["_averages"] = self._averages[:self._averagesCount].copy()
+    state["_values"] = self._values[:self._averagesCount].copy()
+    return state
+
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    recent = numpy.zeros(self.averagingWindow)
+    recent[:self._recentCount] = state["_recent"]
+    self._recent = recent
+    averages = numpy.zeros(self.historicWindowSize)
+    averages[:self._averagesCount] = state["_averages"]
+    self._averages = averages
+    values = numpy.zeros(self.historicWindowSize)
+    values[:self._averagesCount] = state["_values"]
+    self._values = values
+
+
+
+def _fillRing(ring, values, count):
+  """
+  Replace the contents of a ring buffer with the last count values, oldest
+  first.
+  """
+  ring[:] = 0.0
+  ring[:count] = values[len(values) - count:]
+
+
+def _ordered(ring, count, position):
+  """
+  :return: the values in a ring buffer, oldest first
+  """
+  if count < len(ring):
+    return ring[:count]
+  return numpy.concatenate([ring[position:], ring[:position]])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for streaming_likelihood.py.
+"""
+
+import pickle
+import unittest
+
+import numpy
+
+from streaming_likelihood import StreamingAnomalyLikelihood
+
+
+PARAMETERS = {"learningPeriod": 100, "estimationSamples": 50,
+              "historicWindowSize": 400, "reestimationPeriod": 50}
+
+
+
+def _data(n=2000, seed=42):
+  random = numpy.random.RandomState(seed)
+  values = random.normal(50.0, 5.0, n)
+  scores = random.beta(0.5, 5.0, n)
+  # A burst of high scores, which gives consecutive likelihoods in the red
+  # zone
+  scores[1200:1220] = 1.0
+  return values, scores
+
+
+
+class StreamingAnomalyLikelihoodTest(unittest.TestCase):
+
+  def _incremental(self, values, scores, estimator=None):
+    estimator = estimator or StreamingAnomalyLikelihood(**PARAMETERS)
+    return numpy.array([estimator.anomalyProbability(value, score)
+                        for value, score in zip(values, scores)])
+
+
+  def testBatchMatchesIncremental(self):
+    values, scores = _data()
+    expected = self._incremental(values, scores)
+    batch = StreamingAnomalyLikelihood(**PARAMETERS)
+    numpy.testing.assert_allclose(batch.anomalyProbabilities(values, scores),
+                                  expected, rtol=0, atol=1e-10)
+
+
+  def testBatchesInChunksMatchIncremental(self):
+    values, scores = _data()
+    expected = self._incremental(values, scores)
+    batch = StreamingAnomalyLikelihood(**PARAMETERS)
+    chunks = [batch.anomalyProbabilities(values[i:i + 137], scores[i:i + 137])
+              for i in range(0, len(scores), 137)]
+    numpy.testing.assert_allclose(numpy.concatenate(chunks), expected,
+                                  rtol=0, atol=1e-10)
+
+
+  def testMixedBatchAndIncrementalState(self):
+    values, scores = _data()
+    expected = self._incremental(values, scores)
+    estimator = StreamingAnomalyLikelihood(**PARAMETERS)
+    first = estimator.anomalyProbabilities(values[:700], scores[:700])
+    rest = self._incremental(values[700:], scores[700:], estimator)
+    numpy.testing.assert_allclose(numpy.concatenate([first, rest]), expected,
+                                  rtol=0, atol=1e-10)
+
+
+  def testPickleMidStream(self):
+    values, scores = _data()
+    expected = self._incremental(values, scores)
+    estimator = StreamingAnomalyLikelihood(**PARAMETERS)
+    first = self._incremental(values[:900], scores[:900], estimator)
+    restored = pickle.loads(pickle.dumps(estimator, pickle.HIGHEST_PROTOCOL))
+    rest = self._incremental(values[900:], scores[900:], restored)
+    numpy.testing.assert_allclose(numpy.concatenate([first, rest]), expected,
+                                  rtol=0, atol=1e-10)
+
+
+  def testProbationaryPeriod(self):
+    values, scores = _data()
+    likelihoods = self._incremental(values, scores)
+    numpy.testing.assert_array_equal(likelihoods[:150], 0.5)
+    self.assertTrue((likelihoods[150:] != 0.5).all())
+
+
+  def testConsecutiveRedLikelihoodsAreFiltered(self):
+    values, scores = _data()
+    likelihoods = self._incremental(values, scores)
+    burst = likelihoods[1200:1225]
+    red = burst > 0.99999
+    # Only the first of each run of red likelihoods is kept, the following
+    # ones are lowered to 0.999
+    self.assertTrue(red.any())
+    self.assertFalse((red[1:] & red[:-1]).any())
+    self.assertTrue((numpy.abs(burst - 0.999) < 1e-12).any())
+
+
+  def testFlatMetricUsesNullDistribution(self):
+    values, scores = _data()
+    values[:] = 1234567.0
+    likelihoods = self._incremental(values, scores)
+    numpy.testing.assert_allclose(likelihoods, 0.5, atol=1e-3)
+    batch = StreamingAnomalyLikelihood(**PARAMETERS)
+    numpy.testing.assert_allclose(batch.anomalyProbabilities(values, scores),
+                                  likelihoods, rtol=0, atol=1e-10)
+
+
+  def testComputeLogLikelihood(self):
+    likelihoods = numpy.array([0.5, 0.999, 0.99999])
+    numpy.testing.assert_allclose(
+      StreamingAnomalyLikelihood.computeLogLikelihood(likelihoods),
+      [0.0301, 0.3, 0.5], atol=1e-4)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
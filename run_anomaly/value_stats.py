@@ -0,0 +1,183 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Statistics of the value field of a data file, used to choose the encoder
+resolution automatically instead of passing --min and --max by hand.
+
+The file is scanned once in chunks. Min, max, mean and standard deviation
+are exact; quantiles are computed from a fixed size uniform random sample
+(reservoir sampling), so memory use doesn't depend on the size of the file.
+The results are cached in a small JSON file next to the data file, keyed by
+the size and modification time of the data file.
+"""
+
+import json
+import os
+import sys
+
+import numpy
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import readColumnChunks
+
+
+DEFAULT_QUANTILES = (0.01, 0.99)
+
+
+class StreamingStats(object):
+  """
+  Accumulates statistics over chunks of values.
+  """
+
+  def __init__(self, sampleSize=10000, seed=42):
+    self.count = 0
+    self.min = numpy.inf
+    self.max = -numpy.inf
+    self.sum = 0.0
+    self.sumSquares = 0.0
+    self.sample = numpy.zeros(sampleSize)
+    self.random = numpy.random.RandomState(seed)
+
+
+  def update(self, values):
+    values = numpy.asarray(values, dtype=numpy.float64)
+    values = values[~numpy.isnan(values)]
+    if len(values) == 0:
+      return
+    self.min = min(self.min, values.min())
+    self.max = max(self.max, values.max())
+    self.sum += values.sum()
+    self.sumSquares += numpy.dot(values, values)
+
+    # Reservoir sampling: the i'th value (counting from 0) replaces a random
+    # sample slot with probability sampleSize / (i+1). Later values win
+    # when several land on the same slot, like in the sequential algorithm.
+    sampleSize = len(self.sample)
+    numFill = max(0, min(len(values), sampleSize - self.count))
+    self.sample[self.count:self.count + numFill] = values[:numFill]
+    rest = values[numFill:]
+    if len(rest) > 0:
+      positions = self.count + numFill + numpy.arange(len(rest))
+      slots = (self.random.random_sample(len(rest)) *
+               (positions + 1)).astype(numpy.int64)
+      replace = slots < sampleSize
+      self.sample[slots[replace]] = rest[replace]
+    self.count += len(values)
+
+
+  def summary(self, quantiles=DEFAULT_QUANTILES):
+    """
+    :return: dict with count, min, max, mean, stdev and the given quantiles,
+      keyed by "q" + the quantile, e.g. "q0.01"
+    """
+    if self.count == 0:
+      raise ValueError("No values to compute statistics from")
+    mean = self.sum / self.count
+    summary = {"count": self.count,
+               "min": float(self.min),
+               "max": float(self.max),
+               "mean": mean,
+               "stdev": float(numpy.sqrt(max(0.0, self.sumSquares / self.count
+                                             - mean * mean)))}
+    sample = self.sample[:min(self.count, len(self.sample))]
+    for q, value in zip(quantiles, numpy.percentile(sample,
+                                                    [100.0 * q
+                                                     for q in quantiles])):
+      summary["q%g" % q] = float(value)
+    return summary
+
+
+
+def computeValueStats(path, field="value", maxRecords=None,
+                      quantiles=DEFAULT_QUANTILES):
+  """
+  Scan a data file once and compute the statistics of one field.
+
+  :param path: CSV data file
+  :param field: name of the field
+  :param maxRecords: only look at the first this many records
+  :param quantiles: quantiles to estimate
+
+  :return: see StreamingStats.summary()
+  """
+  stats = StreamingStats()
+  numRecords = 0
+  for columns in readColumnChunks(path, {field: "float"}):
+    values = columns[field]
+    if maxRecords is not None:
+      values = values[:maxRecords - numRecords]
+    stats.update(values)
+    numRecords += len(values)
+    if maxRecords is not None and numRecords >= maxRecords:
+      break
+  return stats.summary(quantiles)
+
+
+def getValueStats(path, field="value", maxRecords=None,
+                  quantiles=DEFAULT_QUANTILES):
+  """
+  Same as computeValueStats(), but the result is cached in path + ".stats.json"
+  and reused as long as the size and modification time of the file are
+  unchanged.
+  """
+  cachePath = path + ".stats.json"
+  info = os.stat(path)
+  key = {"size": info.st_size, "mtime": info.st_mtime, "field": field,
+         "maxRecords": maxRecords, "quantiles": list(quantiles)}
+
+  try:
+    with open(cachePath) as fp:
+      cached = json.load(fp)
+    if cached["key"] == key:
+      return cached["stats"]
+  except (IOError, ValueError, KeyError):
+    pass
+
+  stats = computeValueStats(path, field, maxRecords, quantiles)
+  try:
+    with open(cachePath, "w") as fp:
+      json.dump({"key": key, "stats": stats}, fp, indent=2)
+  except IOError:
+    # E.g. a read only data directory. The stats are just recomputed next time.
+    pass
+  return stats
+
+
+def resolutionFromStats(stats, numBuckets, padding=0.2,
+                        quantiles=DEFAULT_QUANTILES):
+  """
+  Choose an encoder resolution that spreads the bulk of the values over
+  numBuckets buckets. The range between the low and high quantiles is used
+  rather than min and max so that a few extreme values don't make the
+  resolution too coarse. The range is widened by padding times its size on
+  each side, without going past the min and max.
+
+  :return: the resolution
+  """
+  low = stats["q%g" % quantiles[0]]
+  high = stats["q%g" % quantiles[1]]
+  pad = (high - low) * padding
+  low = max(stats["min"], low - pad)
+  high = min(stats["max"], high + pad)
+  return max(0.001, (high - low) / numBuckets)
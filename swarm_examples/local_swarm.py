@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+A simple local swarm. Reads a search definition like basic_search_def.json,
+generates candidate models (combinations of the included fields times random
+draws of the main encoder, SP, TP and classifier parameters), and evaluates
+them in a pool of worker processes on this machine. No database is needed.
+
+Every candidate's score is cached on disk, keyed by a hash of its model
+parameters, its fields, the number of records it is run on and the contents
+of the data file. Re-running a search after a small change, e.g. adding a
+field to the search definition, only evaluates the new candidates.
+
+With successive halving all candidates are first run on a short prefix of
+the data. Only the best 1/eta of them are run on a prefix eta times longer,
+and so on until the survivors are run on the whole data file. Most
+candidates are discarded after seeing a small part of the data, which cuts
+the number of records run through models, the more so the more candidates
+there are.
+"""
+
+from optparse import OptionParser
+import copy
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+import numpy
+
+from nupic.frameworks.opf.modelfactory import ModelFactory
+
+import model_params
+from search_def import loadSearchDef
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import iterRecords, readColumns
+
+
+# Number of random parameter draws per field combination for each swarmSize
+_SWARM_SIZES = {"small": 2, "medium": 6, "large": 15}
+
+# The error is measured over at most this many of the last records, like the
+# window=1000 of the swarm's altMAPE metric
+_ERROR_WINDOW = 1000
+
+# By default no successive halving rung is shorter than this. Errors over
+# much less than the error window are dominated by how fast a model learns,
+# or on periodic data by where in a period the prefix ends.
+_MIN_RUNG_RECORDS = _ERROR_WINDOW // 2
+
+
+def dataHash(path):
+  """
+  :return: sha1 of the contents of a file
+  """
+  sha1 = hashlib.sha1()
+  with open(path, "rb") as fp:
+    for block in iter(lambda: fp.read(1 << 20), ""):
+      sha1.update(block)
+  return sha1.hexdigest()
+
+
+def _candidateRandom(seed, fields, drawIndex):
+  """
+  :return: RandomState for the drawIndex-th parameter draw of a field
+    combination, independent of the other combinations
+  """
+  description = json.dumps([seed, fields, drawIndex])
+  return numpy.random.RandomState(
+    int(hashlib.sha1(description).hexdigest()[:8], 16))
+
+
+def generateCandidates(searchDef, candidatesPerCombination=None, maxFields=3,
+                       seed=42):
+  """
+  Generate the candidates of a search. Every combination of at most maxFields
+  included fields that contains the predicted field gets
+  candidatesPerCombination random parameter draws. The same arguments always
+  give the same candidates. Each draw is seeded from its own fields and
+  index, so adding a field or raising candidatesPerCombination or maxFields
+  only adds candidates and leaves the existing ones, and their cached
+  scores, unchanged.
+
+  :param candidatesPerCombination: defaults to the number for the search
+    definition's swarmSize
+  :return: list of candidates, dicts with "fields" and "params"
+  """
+  if candidatesPerCombination is None:
+    candidatesPerCombination = _SWARM_SIZES[searchDef.get("swarmSize",
+                                                          "medium")]
+  predictedField = searchDef["inferenceArgs"]["predictedField"]
+  otherFields = [field["fieldName"] for field in searchDef["includedFields"]
+                 if field["fieldName"] != predictedField]
+
+  candidates = []
+  for numOther in range(min(maxFields, len(otherFields) + 1)):
+    for others in itertools.combinations(otherFields, numOther):
+      fields = [predictedField] + list(others)
+      for drawIndex in range(candidatesPerCombination):
+        random = _candidateRandom(seed, fields, drawIndex)
+        activationThreshold = int(random.randint(12, 17))
+        candidates.append({
+          "fields": list(fields),
+          "params": {
+            "n": int(random.randint(22, 522)),
+            "alpha": float(random.uniform(0.0001, 0.1)),
+            "synPermInactiveDec": float(random.uniform(0.0005, 0.1)),
+            "activationThreshold": activationThreshold,
+            "minThreshold": int(random.randint(9, activationThreshold)),
+            "pamLength": int(random.randint(1, 6)),
+          }})
+  return candidates
+
+
+def candidateModelParams(searchDef, candidate):
+  """
+  :return: the model parameters of a candidate, a modified copy of
+    model_params.MODEL_PARAMS
+  """
+  params = copy.deepcopy(model_params.MODEL_PARAMS)
+  modelParams = params["modelParams"]
+  inferenceType = searchDef.get("inferenceType", "TemporalAnomaly")
+  if inferenceType == "MultiStep":
+    inferenceType = "TemporalMultiStep"
+  modelParams["inferenceType"] = inferenceType
+
+  fieldInfo = dict((field["fieldName"], field)
+                   for field in searchDef["includedFields"])
+  candidateParams = candidate["params"]
+  for name in candidate["fields"]:
+    modelParams["sensorParams"]["encoders"][name] = {
+      "fieldname": name,
+      "name": name,
+      "type": "ScalarEncoder",
+      "minval": fieldInfo[name]["minValue"],
+      "maxval": fieldInfo[name]["maxValue"],
+      "clipInput": True,
+      "w": 21,
+      "n": candidateParams["n"],
+    }
+
+  if "spCoincInputPoolPct" in searchDef:
+    modelParams["spParams"]["potentialPct"] = searchDef["spCoincInputPoolPct"]
+  modelParams["spParams"]["synPermInactiveDec"] = (
+    candidateParams["synPermInactiveDec"])
+  for name in ("activationThreshold", "minThreshold", "pamLength"):
+    modelParams["tpParams"][name] = candidateParams[name]
+  modelParams["clParams"]["alpha"] = candidateParams["alpha"]
+  modelParams["clParams"]["steps"] = ",".join(
+    str(step) for step in searchDef["inferenceArgs"]["predictionSteps"])
+  return params
+
+
+def altMAPE(actual, predicted):
+  """
+  :return: the swarm's altMAPE error in percent, the sum of the absolute
+    errors divided by the sum of the absolute actual values
+  """
+  actual = numpy.asarray(actual, dtype=numpy.float64)
+  predicted = numpy.asarray(predicted, dtype=numpy.float64)
+  return 100.0 * (numpy.abs(actual - predicted).sum() /
+                  max(numpy.abs(actual).sum(), 1e-12))
+
+
+def evaluate(modelParams, dataPath, fields, predictedField, step=1,
+             numRecords=None):
+  """
+  Run a model over the first numRecords records of a data file.
+
+  :return: the altMAPE error of the step ahead predictions of predictedField
+    over the last _ERROR_WINDOW records
+  """
+  model = ModelFactory.create(modelParams)
+  model.enableInference({"predictedField": predictedField})
+  columns = readColumns(dataPath, dict((name, "float") for name in fields),
+                        skipRows=2)
+
+  actual = []
+  predicted = []
+  pending = []
+  for i, modelInput in enumerate(iterRecords(columns)):
+    if numRecords is not None and i >= numRecords:
+      break
+    value = modelInput[predictedField]
+    if len(pending) == step:
+      actual.append(value)
+      predicted.append(pending.pop(0))
+    result = model.run(dict((name, modelInput[name]) for name in fields))
+    pending.append(result.inferences["multiStepBestPredictions"][step])
+
+  if not actual:
+    return None
+  return altMAPE(actual[-_ERROR_WINDOW:], predicted[-_ERROR_WINDOW:])
+
+
+def _evaluateJob(job):
+  index, args = job
+  try:
+    return index, evaluate(*args)
+  except Exception:
+    # A candidate whose parameters make the model fail gets no score instead
+    # of aborting the whole search
+    traceback.print_exc()
+    return index, None
+
+
+
+class ResultCache(object):
+  """
+  Scores of evaluated candidates, one small JSON file per candidate.
+  """
+
+  def __init__(self, cacheDir):
+    self.cacheDir = cacheDir
+
+
+  def key(self, modelParams, fields, numRecords, dataDigest):
+    description = json.dumps([modelParams, fields, numRecords, dataDigest],
+                             sort_keys=True, default=repr)
+    return hashlib.sha1(description).hexdigest()
+
+
+  def get(self, key):
+    try:
+      with open(os.path.join(self.cacheDir, key + ".json")) as fp:
+        return json.load(fp)
+    except (IOError, ValueError):
+      return None
+
+
+  def put(self, key, result):
+    if not os.path.isdir(self.cacheDir):
+      try:
+        os.makedirs(self.cacheDir)
+      except OSError:
+        # Created by another process in the meantime
+        pass
+    # Write to a temporary file and rename it into place, so a search that
+    # is interrupted never leaves a partially written result behind
+    fd, tmpPath = tempfile.mkstemp(dir=self.cacheDir)
+    with os.fdopen(fd, "w") as fp:
+      json.dump(result, fp)
+    os.rename(tmpPath, os.path.join(self.cacheDir, key + ".json"))
+
+
+
+def evaluateCandidates(searchDef, candidates, numRecords=None, numWorkers=None,
+                       cache=None, dataDigest=None):
+  """
+  Evaluate candidates in a pool of worker processes, skipping the ones whose
+  score is cached.
+
+  :param numRecords: number of records to run each candidate on, None for
+    the whole data file
+  :param numWorkers: number of worker processes, defaults to the number of
+    cores
+  :param cache: optional ResultCache
+  :param dataDigest: dataHash() of the data file, computed if None
+
+  :return: (list with the error of each candidate, None for candidates that
+    failed or had too few records to score, number of candidates that were
+    evaluated rather than read from the cache)
+  """
+  if dataDigest is None:
+    dataDigest = dataHash(searchDef["dataPath"])
+  predictedField = searchDef["inferenceArgs"]["predictedField"]
+  step = searchDef["inferenceArgs"]["predictionSteps"][0]
+
+  errors = [None] * len(candidates)
+  keys = [None] * len(candidates)
+  jobs = []
+  for index, candidate in enumerate(candidates):
+    modelParams = candidateModelParams(searchDef, candidate)
+    if cache is not None:
+      keys[index] = cache.key(modelParams, candidate["fields"], numRecords,
+                              dataDigest)
+      cached = cache.get(keys[index])
+      if cached is not None:
+        errors[index] = cached["error"]
+        continue
+    jobs.append((index, (modelParams, searchDef["dataPath"],
+                         candidate["fields"], predictedField, step,
+                         numRecords)))
+
+  if jobs:
+    pool = multiprocessing.Pool(numWorkers)
+    try:
+      for index, error in pool.imap_unordered(_evaluateJob, jobs):
+        errors[index] = error
+        # Failed candidates aren't cached, the failure may be transient
+        if cache is not None and error is not None:
+          cache.put(keys[index], {"error": error,
+                                  "candidate": candidates[index],
+                                  "numRecords": numRecords})
+    finally:
+      pool.close()
+      pool.join()
+  return errors, len(jobs)
+
+
+def _sortKey(error):
+  # Candidates without a score sort last
+  return (error is None, error)
+
+
+def countRecords(searchDef):
+  """
+  :return: number of records a full search runs each candidate on, the
+    iterationCount of the search definition or else the whole data file
+  """
+  numRecords = searchDef.get("iterationCount", -1)
+  predictedField = searchDef["inferenceArgs"]["predictedField"]
+  numDataRecords = len(readColumns(searchDef["dataPath"],
+                                   {predictedField: "float"},
+                                   skipRows=2)[predictedField])
+  if numRecords < 0:
+    return numDataRecords
+  return min(numRecords, numDataRecords)
+
+
+def halvingSchedule(numCandidates, numRecords, eta=3, minRecords=None,
+                    step=1):
+  """
+  :param minRecords: records in the first rung. By default there is one rung
+    for every factor eta in the number of candidates, so that about one
+    candidate is left for the last rung, but no rung is shorter than
+    _MIN_RUNG_RECORDS.
+  :param step: prediction step, rungs of at most step records can't be
+    scored and are left out
+
+  :return: list with the number of records of every rung, each eta times
+    the previous one unless raised to the floor, the last being numRecords
+  """
+  if minRecords is None:
+    numRungs = int(math.log(max(numCandidates, 1)) / math.log(eta) + 1e-9) + 1
+    floor = min(_MIN_RUNG_RECORDS, numRecords)
+  else:
+    numRungs = int(math.log(float(numRecords) / max(minRecords, 1)) /
+                   math.log(eta) + 1e-9) + 1
+    floor = 0
+  schedule = []
+  for rung in range(numRungs):
+    records = max(floor, int(math.ceil(numRecords /
+                                       float(eta ** (numRungs - 1 - rung)))))
+    if records > step and records not in schedule:
+      schedule.append(records)
+  return schedule or [numRecords]
+
+
+def successiveHalving(searchDef, candidates, numRecords, eta=3,
+                      minRecords=None, numWorkers=None, cache=None):
+  """
+  Evaluate candidates with successive halving. Every rung runs the remaining
+  candidates on a longer prefix of the data and keeps the best 1/eta of
+  them for the next rung.
+
+  :return: (list of (error, candidate) pairs, list of rungs) The pairs hold
+    the candidates that reached the last rung first, sorted by their final
+    error, followed by the others sorted by the rung they reached and their
+    error there. Every rung is a dict with its "numRecords", its
+    "numCandidates" and "numEvaluated", the number of candidates not read
+    from the cache.
+  """
+  dataDigest = dataHash(searchDef["dataPath"])
+  remaining = list(candidates)
+  eliminated = []
+  rungs = []
+  schedule = halvingSchedule(len(candidates), numRecords, eta, minRecords,
+                             searchDef["inferenceArgs"]["predictionSteps"][0])
+  for rung, rungRecords in enumerate(schedule):
+    errors, numEvaluated = evaluateCandidates(searchDef, remaining,
+                                              rungRecords, numWorkers, cache,
+                                              dataDigest)
+    rungs.append({"numRecords": rungRecords, "numCandidates": len(remaining),
+                  "numEvaluated": numEvaluated})
+    scored = sorted(zip(errors, remaining), key=lambda r: _sortKey(r[0]))
+    if rung == len(schedule) - 1:
+      break
+    numKeep = max(1, int(math.ceil(len(scored) / float(eta))))
+    eliminated = scored[numKeep:] + eliminated
+    remaining = [candidate for _, candidate in scored[:numKeep]]
+  return scored + eliminated, rungs
+
+
+def runSwarm(searchDefPath, numWorkers=None, cacheDir="swarm_cache",
+             candidatesPerCombination=None, maxFields=3, seed=42,
+             halving=False, eta=3, minRecords=None):
+  """
+  Run a search.
+
+  :param halving: evaluate the candidates with successiveHalving() instead
+    of running all of them on all the records
+
+  :return: (search definition, list of (error, candidate) pairs with the
+    best candidate first, list of rungs as returned by successiveHalving(),
+    number of records a full search would run each candidate on)
+  """
+  searchDef = loadSearchDef(searchDefPath)
+  candidates = generateCandidates(searchDef, candidatesPerCombination,
+                                  maxFields, seed)
+  numRecords = countRecords(searchDef)
+  cache = ResultCache(cacheDir) if cacheDir else None
+  if halving:
+    results, rungs = successiveHalving(searchDef, candidates, numRecords, eta,
+                                       minRecords, numWorkers, cache)
+  else:
+    errors, numEvaluated = evaluateCandidates(searchDef, candidates,
+                                              numRecords, numWorkers, cache)
+    results = sorted(zip(errors, candidates), key=lambda r: _sortKey(r[0]))
+    rungs = [{"numRecords": numRecords, "numCandidates": len(candidates),
+              "numEvaluated": numEvaluated}]
+  return searchDef, results, rungs, numRecords
+
+
+def printResults(results, top=10):
+  print "%10s  %-30s %s" % ("altMAPE", "fields", "params")
+  for error, candidate in results[:top]:
+    print "%10s  %-30s %s" % (
+      "%.3f" % error if error is not None else "-",
+      ",".join(candidate["fields"]),
+      " ".join("%s=%.4g" % item for item in sorted(
+        candidate["params"].iteritems())))
+
+
+if __name__ == "__main__":
+  parser = OptionParser("\n%prog [options] searchDef.json"
+                        "\n%prog --help"
+                        "\n"
+                        "\nRuns a local swarm over the candidates of a search "
+                        "definition, caching\nthe score of every candidate.")
+  parser.add_option("--workers", default=None, type=int,
+      help="Number of worker processes. Defaults to the number of cores. "
+      "[default: %default]")
+  parser.add_option("--cacheDir", default="swarm_cache",
+      help="Directory of the result cache. An empty string disables the "
+      "cache. [default: %default]")
+  parser.add_option("--candidates", default=None, type=int,
+      help="Random parameter draws per field combination. Defaults to the "
+      "search definition's swarmSize: %s. [default: %%default]" %
+      ", ".join("%s %d" % item for item in sorted(_SWARM_SIZES.iteritems())))
+  parser.add_option("--maxFields", default=3, type=int,
+      help="Maximum number of fields per candidate. [default: %default]")
+  parser.add_option("--seed", default=42, type=int,
+      help="Seed for drawing the candidate parameters. [default: %default]")
+  parser.add_option("--halving", default=False, action="store_true",
+      help="Evaluate the candidates with successive halving instead of "
+      "running all of them on all the records. [default: %default]")
+  parser.add_option("--eta", default=3, type=int,
+      help="With --halving, keep the best 1/eta candidates after every rung "
+      "and make the next rung eta times longer. [default: %default]")
+  parser.add_option("--minRecords", default=None, type=int,
+      help="With --halving, the number of records in the first rung. "
+      "Defaults to enough rungs to end with about one candidate, but at "
+      "least %d records. [default: %%default]" % _MIN_RUNG_RECORDS)
+  parser.add_option("--top", default=10, type=int,
+      help="Number of best candidates to print. [default: %default]")
+  parser.add_option("--outputFile", default=None,
+      help="Where to write the model parameters of the best candidate as "
+      "JSON. Defaults to the search definition name with _best_params.json "
+      "instead of .json. [default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  if len(args) != 1:
+    parser.error("Expected one search definition")
+
+  startTime = time.time()
+  searchDef, results, rungs, numRecords = runSwarm(
+    args[0], options.workers, options.cacheDir, options.candidates,
+    options.maxFields, options.seed, options.halving, options.eta,
+    options.minRecords)
+  for rung in rungs:
+    print "%d candidates on %d records (%d cached)" % (
+      rung["numCandidates"], rung["numRecords"],
+      rung["numCandidates"] - rung["numEvaluated"])
+  modelRecords = sum(rung["numCandidates"] * rung["numRecords"]
+                     for rung in rungs)
+  fullModelRecords = len(results) * numRecords
+  print "Spent %d model-records, %.1f%% of the %d of a full search" % (
+    modelRecords, 100.0 * modelRecords / max(fullModelRecords, 1),
+    fullModelRecords)
+  print "Done in %.1f seconds" % (time.time() - startTime)
+  printResults(results, options.top)
+
+  outputFile = options.outputFile
+  if outputFile is None:
+    outputFile = os.path.splitext(args[0])[0] + "_best_params.json"
+  with open(outputFile, "w") as fp:
+    json.dump(candidateModelParams(searchDef, results[0][1]), fp, indent=2)
+  print "Model parameters of the best candidate written to",outputFile
@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for local_swarm.py. They need NuPIC and are skipped without it.
+"""
+
+import copy
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+
+try:
+  import local_swarm
+except ImportError:
+  local_swarm = None
+
+
+
+SEARCH_DEF = {
+  "inferenceArgs": {"predictedField": "metric1", "predictionSteps": [1]},
+  "includedFields": [
+    {"fieldName": "metric1", "minValue": 0, "maxValue": 10},
+    {"fieldName": "metric2", "minValue": 0, "maxValue": 10},
+    {"fieldName": "metric3", "minValue": 0, "maxValue": 10},
+  ],
+  "swarmSize": "medium",
+}
+
+
+
+@unittest.skipIf(local_swarm is None, "NuPIC is not installed")
+class GenerateCandidatesTest(unittest.TestCase):
+
+  def testDeterministic(self):
+    first = local_swarm.generateCandidates(SEARCH_DEF, 4)
+    second = local_swarm.generateCandidates(SEARCH_DEF, 4)
+    self.assertEqual(first, second)
+    self.assertNotEqual(
+      first, local_swarm.generateCandidates(SEARCH_DEF, 4, seed=43))
+
+
+  def testAddingFieldKeepsCandidates(self):
+    searchDef = copy.deepcopy(SEARCH_DEF)
+    searchDef["includedFields"].insert(
+      1, {"fieldName": "metric0", "minValue": 0, "maxValue": 10})
+    before = local_swarm.generateCandidates(SEARCH_DEF, 4)
+    after = local_swarm.generateCandidates(searchDef, 4)
+    self.assertGreater(len(after), len(before))
+    for candidate in before:
+      self.assertIn(candidate, after)
+
+
+  def testMoreCandidatesKeepCandidates(self):
+    before = local_swarm.generateCandidates(SEARCH_DEF, 2, maxFields=2)
+    after = local_swarm.generateCandidates(SEARCH_DEF, 5, maxFields=3)
+    for candidate in before:
+      self.assertIn(candidate, after)
+
+
+
+class _RampModel(object):
+  """
+  Stands in for a NuPIC model on a ramp: predicts the current value plus the
+  step, which is exactly right once the predictions are lined up.
+  """
+
+  def __init__(self, predictedField, step, fail=False):
+    self.predictedField = predictedField
+    self.step = step
+    self.fail = fail
+
+
+  def enableInference(self, inferenceArgs):
+    pass
+
+
+  def run(self, record):
+    if self.fail:
+      raise RuntimeError("model failed")
+
+    class Result(object):
+      inferences = {"multiStepBestPredictions": {
+        self.step: record[self.predictedField] + self.step}}
+
+    return Result()
+
+
+
+class _RampModelFactory(object):
+
+  @staticmethod
+  def create(modelParams):
+    return _RampModel("metric1", modelParams["step"],
+                      modelParams.get("fail", False))
+
+
+
+@unittest.skipIf(local_swarm is None, "NuPIC is not installed")
+class EvaluateTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.dataPath = self._writeData("ramp.csv", range(100))
+    self.modelFactory = local_swarm.ModelFactory
+    local_swarm.ModelFactory = _RampModelFactory
+
+
+  def tearDown(self):
+    local_swarm.ModelFactory = self.modelFactory
+    shutil.rmtree(self.tmpDir)
+
+
+  def _writeData(self, name, values):
+    path = os.path.join(self.tmpDir, name)
+    with open(path, "w") as fp:
+      fp.write("metric1,metric2\nfloat,float\n,\n")
+      for value in values:
+        fp.write("%s,%s\n" % (value, -value))
+    return path
+
+
+  def testPredictionsAlignedWithStep(self):
+    for step in (1, 3):
+      error = local_swarm.evaluate({"step": step}, self.dataPath,
+                                   ["metric1", "metric2"], "metric1", step)
+      self.assertAlmostEqual(error, 0.0)
+
+
+  def testNumRecords(self):
+    # Only the first numRecords records are run, a one step ahead
+    # prediction needs at least two
+    self.assertIsNone(local_swarm.evaluate(
+      {"step": 1}, self.dataPath, ["metric1"], "metric1", 1, 1))
+    self.assertAlmostEqual(local_swarm.evaluate(
+      {"step": 1}, self.dataPath, ["metric1"], "metric1", 1, 2), 0.0)
+
+
+  def testFailingCandidateScoresNone(self):
+    stderr = sys.stderr
+    sys.stderr = StringIO.StringIO()
+    try:
+      index, error = local_swarm._evaluateJob(
+        (7, ({"step": 1, "fail": True}, self.dataPath, ["metric1"],
+             "metric1")))
+    finally:
+      sys.stderr = stderr
+    self.assertEqual(index, 7)
+    self.assertIsNone(error)
+
+
+
+@unittest.skipIf(local_swarm is None, "NuPIC is not installed")
+class ResultCacheTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.cache = local_swarm.ResultCache(os.path.join(self.tmpDir, "cache"))
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _dataHash(self, contents):
+    path = os.path.join(self.tmpDir, "data.csv")
+    with open(path, "w") as fp:
+      fp.write(contents)
+    return local_swarm.dataHash(path)
+
+
+  def testRoundTrip(self):
+    key = self.cache.key({"a": 1}, ["metric1"], 100, "digest")
+    self.assertIsNone(self.cache.get(key))
+    result = {"error": 1.5, "numRecords": 100}
+    self.cache.put(key, result)
+    self.assertEqual(self.cache.get(key), result)
+
+
+  def testKeyChangesWithDataAndNumRecords(self):
+    digest = self._dataHash("metric1\n1\n")
+    self.assertEqual(digest, self._dataHash("metric1\n1\n"))
+    otherDigest = self._dataHash("metric1\n2\n")
+    self.assertNotEqual(digest, otherDigest)
+
+    key = self.cache.key({"a": 1}, ["metric1"], 100, digest)
+    self.assertEqual(key, self.cache.key({"a": 1}, ["metric1"], 100, digest))
+    self.assertNotEqual(
+      key, self.cache.key({"a": 1}, ["metric1"], 100, otherDigest))
+    self.assertNotEqual(
+      key, self.cache.key({"a": 1}, ["metric1"], 200, digest))
+    self.assertNotEqual(
+      key, self.cache.key({"a": 2}, ["metric1"], 100, digest))
+
+
+
+@unittest.skipIf(local_swarm is None, "NuPIC is not installed")
+class HalvingScheduleTest(unittest.TestCase):
+
+  def testDefaultFirstRungHasFloor(self):
+    self.assertEqual(local_swarm.halvingSchedule(66, 1500), [500, 1500])
+    schedule = local_swarm.halvingSchedule(66, 100000)
+    self.assertEqual(schedule, [3704, 11112, 33334, 100000])
+
+
+  def testShortDataIsOneRung(self):
+    self.assertEqual(local_swarm.halvingSchedule(66, 200), [200])
+
+
+  def testMinRecords(self):
+    self.assertEqual(local_swarm.halvingSchedule(66, 900, minRecords=100),
+                     [100, 300, 900])
+
+
+  def testRungsMustExceedStep(self):
+    schedule = local_swarm.halvingSchedule(66, 81, minRecords=1, step=5)
+    self.assertEqual(schedule, [9, 27, 81])
+    self.assertEqual(local_swarm.halvingSchedule(66, 81, minRecords=1),
+                     [3, 9, 27, 81])
+
+
+
+@unittest.skipIf(local_swarm is None, "NuPIC is not installed")
+class SuccessiveHalvingTest(unittest.TestCase):
+
+  def setUp(self):
+    self.evaluateCandidates = local_swarm.evaluateCandidates
+    self.dataHash = local_swarm.dataHash
+    self.calls = []
+    local_swarm.evaluateCandidates = self._evaluateCandidates
+    local_swarm.dataHash = lambda path: "digest"
+
+
+  def tearDown(self):
+    local_swarm.evaluateCandidates = self.evaluateCandidates
+    local_swarm.dataHash = self.dataHash
+
+
+  def _evaluateCandidates(self, searchDef, candidates, numRecords=None,
+                          numWorkers=None, cache=None, dataDigest=None):
+    self.calls.append((numRecords, [c["id"] for c in candidates]))
+    # The error is the candidate's id, except that candidate 8 fails
+    return [None if c["id"] == 8 else float(c["id"])
+            for c in candidates], len(candidates)
+
+
+  def testKeepsBestThirdEveryRung(self):
+    searchDef = {"dataPath": "data.csv",
+                 "inferenceArgs": {"predictionSteps": [1]}}
+    candidates = [{"id": i} for i in reversed(range(9))]
+    results, rungs = local_swarm.successiveHalving(searchDef, candidates,
+                                                   900, minRecords=100)
+
+    self.assertEqual(self.calls, [(100, [8, 7, 6, 5, 4, 3, 2, 1, 0]),
+                                  (300, [0, 1, 2]),
+                                  (900, [0])])
+    self.assertEqual([rung["numCandidates"] for rung in rungs], [9, 3, 1])
+    # Survivors first, then the others by the rung they reached, with the
+    # failed candidate last
+    self.assertEqual([c["id"] for _, c in results],
+                     [0, 1, 2, 3, 4, 5, 6, 7, 8])
+    self.assertEqual(results[-1][0], None)
+
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,224 @@
+
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+MODEL_PARAMS = {
+    # Type of model that the rest of these parameters apply to.
+    'model': "CLA",
+
+    # Version that specifies the format of the config.
+    'version': 1,
+
+    # Intermediate variables used to compute fields in modelParams and also
+    # referenced from the control section.
+    'aggregationInfo': {   'days': 0,
+        'fields': [],
+        'hours': 1,
+        'microseconds': 0,
+        'milliseconds': 0,
+        'minutes': 0,
+        'months': 0,
+        'seconds': 0,
+        'weeks': 0,
+        'years': 0},
+
+    'predictAheadTime': None,
+
+    # Model parameter dictionary.
+    'modelParams': {
+        # The type of inference that this model will perform
+        'inferenceType': 'TemporalAnomaly',
+
+        'sensorParams': {
+            # Sensor diagnostic output verbosity control;
+            # if > 0: sensor region will print out on screen what it's sensing
+            # at each step 0: silent; >=1: some info; >=2: more info;
+            # >=3: even more info (see compute() in py/regions/RecordSensor.py)
+            'verbosity' : 0,
+
+            # Include the encoders we use. local_swarm.py adds one encoder
+            # per included field of each candidate.
+            'encoders': {},
+
+            # A dictionary specifying the period for automatically-generated
+            # resets from a RecordSensor;
+            #
+            # None = disable automatically-generated resets (also disabled if
+            # all of the specified values evaluate to 0).
+            # Valid keys is the desired combination of the following:
+            #   days, hours, minutes, seconds, milliseconds, microseconds, weeks
+            #
+            # Example for 1.5 days: sensorAutoReset = dict(days=1,hours=12),
+            #
+            # (value generated from SENSOR_AUTO_RESET)
+            'sensorAutoReset' : None,
+        },
+
+        'spEnable': True,
+
+        'spParams': {
+            # SP diagnostic output verbosity control;
+            # 0: silent; >=1: some info; >=2: more info;
+            'spVerbosity' : 1,
+
+            # Spatial Pooler implementation selector.
+            # Options: 'py', 'cpp' (speed optimized, new)
+            'spatialImp' : 'cpp', 
+
+            'globalInhibition': 1,
+
+            # Number of cell columns in the cortical region (same number for
+            # SP and TP)
+            # (see also tpNCellsPerCol)
+            'columnCount': 2048,
+
+            'inputWidth': 0,
+
+            # SP inhibition control (absolute value);
+            # Maximum number of active columns in the SP region's output (when
+            # there are more, the weaker ones are suppressed)
+            'numActiveColumnsPerInhArea': 40,
+
+            'seed': 1959,
+
+            # potentialPct
+            # What percent of the columns's receptive field is available
+            # for potential synapses. 
+            'potentialPct': 0.85,
+
+            # The default connected threshold. Any synapse whose
+            # permanence value is above the connected threshold is
+            # a "connected synapse", meaning it can contribute to the
+            # cell's firing. Typical value is 0.10. 
+            'synPermConnected': 0.1,
+
+            'synPermActiveInc': 0.04,
+
+            'synPermInactiveDec': 0.005,
+
+        },
+
+        # Controls whether TP is enabled or disabled;
+        # TP is necessary for making temporal predictions, such as predicting
+        # the next inputs.  Without TP, the model is only capable of
+        # reconstructing missing sensor inputs (via SP).
+        'tpEnable' : True,
+
+        'tpParams': {
+            # TP diagnostic output verbosity control;
+            # 0: silent; [1..6]: increasing levels of verbosity
+            # (see verbosity in nupic/trunk/py/nupic/research/TP.py and TP10X*.py)
+            'verbosity': 0,
+
+            # Number of cell columns in the cortical region (same number for
+            # SP and TP)
+            # (see also tpNCellsPerCol)
+            'columnCount': 2048,
+
+            # The number of cells (i.e., states), allocated per column.
+            'cellsPerColumn': 32,
+
+            'inputWidth': 2048,
+
+            'seed': 1960,
+
+            # Temporal Pooler implementation selector (see _getTPClass in
+            # CLARegion.py).
+            'temporalImp': 'cpp',
+
+            # New Synapse formation count
+            # The maximum number of synapses added to a segment when it
+            # learns, each to one of the cells that were active in the
+            # previous time step.
+            # NOTE: If None, use spNumActivePerInhArea
+            'newSynapseCount': 20,
+
+            # Maximum number of synapses per segment
+            #  > 0 for fixed-size CLA
+            # -1 for non-fixed-size CLA
+            'maxSynapsesPerSegment': 32,
+
+            # Maximum number of segments per cell
+            #  > 0 for fixed-size CLA
+            # -1 for non-fixed-size CLA
+            'maxSegmentsPerCell': 128,
+
+            # Initial Permanence
+            # The permanence of newly created synapses. It is below the
+            # connected permanence (connectedPerm, 0.5 by default), so a new
+            # synapse only becomes connected after permanenceInc has
+            # reinforced it a few times.
+            'initialPerm': 0.21,
+
+            # Permanence Increment
+            'permanenceInc': 0.1,
+
+            # Permanence Decrement
+            # If set to None, will automatically default to tpPermanenceInc
+            # value.
+            'permanenceDec' : 0.1,
+
+            'globalDecay': 0.0,
+
+            'maxAge': 0,
+
+            # Minimum number of active synapses for a segment to be considered
+            # during search for the best-matching segments.
+            # None=use default
+            # Replaces: tpMinThreshold
+            'minThreshold': 12,
+
+            # Segment activation threshold.
+            # A segment is active if it has >= tpSegmentActivationThreshold
+            # connected synapses that are active due to infActiveState
+            # None=use default
+            # Replaces: tpActivationThreshold
+            'activationThreshold': 16,
+
+            'outputType': 'normal',
+
+            # "Pay Attention Mode" length. This tells the TP how many new
+            # elements to append to the end of a learned sequence at a time.
+            # Smaller values are better for datasets with short sequences,
+            # higher values are better for datasets with long sequences.
+            'pamLength': 1,
+        },
+
+        'clParams': {
+            'regionName' : 'CLAClassifierRegion',
+
+            # Classifier diagnostic output verbosity control;
+            # 0: silent; [1..6]: increasing levels of verbosity
+            'clVerbosity' : 0,
+
+            # This controls how fast the classifier learns/forgets. Higher values
+            # make it adapt faster and forget older patterns faster.
+            'alpha': 0.0001,
+
+            # This is set after the call to updateConfigFromSubConfig and is
+            # computed from the aggregationInfo and predictAheadTime.
+            'steps': '1',
+
+            'implementation': 'cpp',
+        },
+
+        'trainSPNetOnlyIfRequested': False,
+    },
+}
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Screen the included fields of a search definition before swarming. For
+every field the lagged correlation and mutual information with the predicted
+field are computed for lags 0 to maxLag, i.e. field(t - lag) against
+predicted(t). Mutual information also catches non-linear relations and
+fields that only matter through their past values, like metric4 for metric5.
+
+Fields whose best mutual information isn't clearly above that of shuffled
+data carry no usable information and are dropped from includedFields. Each
+field the swarm doesn't have to try halves the number of field combinations.
+"""
+
+from optparse import OptionParser
+import copy
+import json
+import os
+import sys
+
+import numpy
+
+from search_def import loadSearchDef
+
+# Allow importing the shared modules in the top level common directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+from common.columnar_reader import readColumns
+
+
+def quantileBins(values, numBins):
+  """
+  :return: the bin of every value, with about the same number of values in
+    each of numBins bins
+  """
+  edges = numpy.percentile(values, numpy.linspace(0, 100, numBins + 1)[1:-1])
+  return numpy.searchsorted(edges, values, side="right")
+
+
+def _mutualInformation(xBins, yBins, numBins):
+  # xBins and yBins are (numRows, numSamples) arrays; one joint histogram is
+  # computed per row with a single bincount
+  numRows, numSamples = xBins.shape
+  cells = (numpy.arange(numRows)[:, None] * numBins * numBins +
+           xBins * numBins + yBins)
+  joint = numpy.bincount(cells.ravel(), minlength=numRows * numBins * numBins)
+  joint = joint.reshape(numRows, numBins, numBins) / float(numSamples)
+  px = joint.sum(axis=2)[:, :, None]
+  py = joint.sum(axis=1)[:, None, :]
+  with numpy.errstate(divide="ignore", invalid="ignore"):
+    terms = joint * numpy.log2(joint / (px * py))
+  return numpy.nansum(terms.reshape(numRows, -1), axis=1)
+
+
+def screenField(values, predicted, maxLag=10, numBins=16, numShuffles=10,
+                seed=42):
+  """
+  Measure how much a field tells about the predicted field.
+
+  :param values: numpy array with the values of the field
+  :param predicted: numpy array with the values of the predicted field
+  :param maxLag: largest lag to try
+  :param numBins: number of quantile bins used for the mutual information
+  :param numShuffles: number of random permutations of the field used to
+    estimate the mutual information of unrelated data
+
+  :return: dict with the "correlation" and "mutualInformation" (in bits) for
+    every lag, the "bestLag" with the highest mutual information, and the
+    "baseline" mutual information of the shuffled field
+  """
+  numSamples = len(predicted) - maxLag
+  lags = numpy.arange(maxLag + 1)
+  # Row k pairs values[t - k] with predicted[t] for t = maxLag .. end
+  rows = maxLag - lags[:, None] + numpy.arange(numSamples)
+  target = predicted[maxLag:]
+
+  xBins = quantileBins(values, numBins)
+  yBins = quantileBins(target, numBins)
+  mutualInformation = _mutualInformation(xBins[rows],
+                                         numpy.tile(yBins, (len(lags), 1)),
+                                         numBins)
+
+  lagged = values[rows]
+  lagged = ((lagged - lagged.mean(axis=1)[:, None]) /
+            numpy.maximum(lagged.std(axis=1), 1e-12)[:, None])
+  standardizedTarget = ((target - target.mean()) /
+                        max(target.std(), 1e-12))
+  correlation = (lagged * standardizedTarget).mean(axis=1)
+
+  random = numpy.random.RandomState(seed)
+  shuffled = numpy.array([random.permutation(xBins[maxLag:])
+                          for _ in range(numShuffles)])
+  baseline = _mutualInformation(shuffled,
+                                numpy.tile(yBins, (numShuffles, 1)),
+                                numBins).max()
+
+  bestLag = int(mutualInformation.argmax())
+  return {"correlation": correlation,
+          "mutualInformation": mutualInformation,
+          "bestLag": bestLag,
+          "baseline": float(baseline)}
+
+
+def screenSearchDef(searchDef, maxLag=10, numBins=16, minInformation=0.05,
+                    maxRecords=None):
+  """
+  Screen every included field of a search definition.
+
+  :param minInformation: a field is kept if its best mutual information is
+    at least this many bits above the shuffled baseline
+  :param maxRecords: only use the first this many records
+
+  :return: (list of (field name, screenField() result, keep) tuples, pruned
+    copy of the search definition) The predicted field is always kept.
+    The copy's stream source is the absolute path of the data file.
+  """
+  predictedField = searchDef["inferenceArgs"]["predictedField"]
+  fieldNames = [field["fieldName"] for field in searchDef["includedFields"]]
+  columns = readColumns(searchDef["dataPath"],
+                        dict((name, "float") for name in fieldNames),
+                        skipRows=2)
+  predicted = columns[predictedField][:maxRecords]
+
+  results = []
+  keptFields = set([predictedField])
+  for name in fieldNames:
+    screen = screenField(columns[name][:maxRecords], predicted, maxLag,
+                         numBins)
+    if name == predictedField:
+      # The field's own past; its lag 0 is trivially perfect
+      screen["mutualInformation"][0] = numpy.nan
+      screen["correlation"][0] = numpy.nan
+      screen["bestLag"] = int(numpy.nanargmax(screen["mutualInformation"]))
+      keep = True
+    else:
+      keep = (screen["mutualInformation"][screen["bestLag"]] >=
+              screen["baseline"] + minInformation)
+    if keep:
+      keptFields.add(name)
+    results.append((name, screen, keep))
+
+  pruned = copy.deepcopy(searchDef)
+  # The pruned copy may be written anywhere, so it names its data file by
+  # absolute path rather than relative to the original search definition
+  pruned["streamDef"]["streams"][0]["source"] = (
+    "file://" + os.path.abspath(pruned.pop("dataPath")))
+  pruned["includedFields"] = [field for field in pruned["includedFields"]
+                              if field["fieldName"] in keptFields]
+  return results, pruned
+
+
+if __name__ == "__main__":
+  parser = OptionParser("\n%prog [options] searchDef.json"
+                        "\n%prog --help"
+                        "\n"
+                        "\nScreens the included fields of a search definition "
+                        "and writes a copy\nwithout the fields that carry no "
+                        "information about the predicted field.")
+  parser.add_option("--maxLag", default=10, type=int,
+      help="Largest lag between a field and the predicted field to try. "
+      "[default: %default]")
+  parser.add_option("--bins", default=16, type=int,
+      help="Number of quantile bins for the mutual information. "
+      "[default: %default]")
+  parser.add_option("--minInformation", default=0.05, type=float,
+      help="Keep fields whose best mutual information is at least this many "
+      "bits above that of the shuffled field. [default: %default]")
+  parser.add_option("--maxRecords", default=None, type=int,
+      help="Only use the first this many records. [default: %default]")
+  parser.add_option("--outputFile", default=None,
+      help="Where to write the pruned search definition. Defaults to the "
+      "search definition name with _pruned.json instead of .json. "
+      "[default: %default]")
+
+  options, args = parser.parse_args(sys.argv[1:])
+  if len(args) != 1:
+    parser.error("Expected one search definition")
+
+  searchDef = loadSearchDef(args[0])
+  results, pruned = screenSearchDef(searchDef, options.maxLag, options.bins,
+                                    options.minInformation, options.maxRecords)
+
+  print "%-12s %8s %12s %10s %10s %6s" % ("field", "best lag", "correlation",
+                                         "MI bits", "baseline", "keep")
+  for name, screen, keep in results:
+    lag = screen["bestLag"]
+    print "%-12s %8d %12.3f %10.3f %10.3f %6s" % (
+      name, lag, screen["correlation"][lag],
+      screen["mutualInformation"][lag], screen["baseline"],
+      "yes" if keep else "no")
+
+  outputFile = options.outputFile
+  if outputFile is None:
+    outputFile = os.path.splitext(args[0])[0] + "_pruned.json"
+  with open(outputFile, "w") as fp:
+    json.dump(pruned, fp, indent=2)
+  print "Search definition with",len(pruned["includedFields"]),(
+    "of %d fields written to %s" % (len(searchDef["includedFields"]),
+                                    outputFile))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for prescreen_fields.py.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from prescreen_fields import screenField, screenSearchDef
+from search_def import loadSearchDef
+
+
+
+class PrescreenFieldsTest(unittest.TestCase):
+
+  numRecords = 2000
+
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    random = numpy.random.RandomState(1)
+    self.predicted = random.normal(size=self.numRecords)
+    # lagged(t - 3) == predicted(t)
+    self.lagged = numpy.roll(self.predicted, -3)
+    self.noise = random.normal(size=self.numRecords)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _writeSearchDef(self):
+    os.mkdir(os.path.join(self.tmpDir, "data"))
+    with open(os.path.join(self.tmpDir, "data", "synthetic.csv"), "w") as fp:
+      fp.write("predicted,lagged,noise\nfloat,float,float\n,,\n")
+      for row in zip(self.predicted, self.lagged, self.noise):
+        fp.write("%r,%r,%r\n" % row)
+    path = os.path.join(self.tmpDir, "search_def.json")
+    with open(path, "w") as fp:
+      json.dump({
+        "includedFields": [{"fieldName": name}
+                           for name in ("lagged", "predicted", "noise")],
+        "streamDef": {"streams": [{"source": "file://synthetic.csv"}]},
+        "inferenceArgs": {"predictedField": "predicted"},
+      }, fp)
+    return path
+
+
+  def testLaggedCopyFoundAtItsLag(self):
+    screen = screenField(self.lagged, self.predicted)
+    self.assertEqual(screen["bestLag"], 3)
+    self.assertAlmostEqual(screen["correlation"][3], 1.0)
+    self.assertGreater(screen["mutualInformation"][3],
+                       screen["baseline"] + 1.0)
+
+
+  def testNoiseBelowBaseline(self):
+    screen = screenField(self.noise, self.predicted)
+    self.assertLess(screen["mutualInformation"].max(),
+                    screen["baseline"] + 0.05)
+
+
+  def testScreenSearchDef(self):
+    searchDefPath = self._writeSearchDef()
+    results, pruned = screenSearchDef(loadSearchDef(searchDefPath))
+
+    keep = dict((name, keep) for name, _, keep in results)
+    # The predicted field is kept even though white noise has no
+    # information about its own future
+    self.assertEqual(keep, {"lagged": True, "predicted": True,
+                            "noise": False})
+    self.assertEqual([field["fieldName"]
+                      for field in pruned["includedFields"]],
+                     ["lagged", "predicted"])
+
+    # The pruned copy still finds its data when written elsewhere
+    self.assertNotIn("dataPath", pruned)
+    otherDir = os.path.join(self.tmpDir, "other")
+    os.mkdir(otherDir)
+    prunedPath = os.path.join(otherDir, "pruned.json")
+    with open(prunedPath, "w") as fp:
+      json.dump(pruned, fp)
+    self.assertEqual(
+      loadSearchDef(prunedPath)["dataPath"],
+      os.path.join(self.tmpDir, "data", "synthetic.csv"))
+
+
+
+if __name__ == "__main__":
+  unittest.main()
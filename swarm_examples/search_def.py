@@ -0,0 +1,73 @@
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2013, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Loading of swarm search definitions, shared by local_swarm.py and
+prescreen_fields.py. This module doesn't need NuPIC, so tools that only read
+search definitions and their data can run without it.
+"""
+
+import json
+import os
+
+
+def resolveSource(source, searchDefDir):
+  """
+  Find the data file of a stream source like "file://data/test1.csv". Like
+  NuPIC's swarming, which looks sources up with findDataset(), relative paths
+  are tried relative to the search definition, then its data directory, then
+  the current directory and finally NuPIC's data paths if NuPIC is installed.
+
+  :return: the path of the data file
+  :raise IOError: if the data file can't be found
+  """
+  if source.startswith("file://"):
+    source = source[len("file://"):]
+  candidates = [os.path.join(searchDefDir, source),
+                os.path.join(searchDefDir, "data", source),
+                os.path.abspath(source)]
+  for candidate in candidates:
+    if os.path.isfile(candidate):
+      return candidate
+  try:
+    from nupic.data.datasethelpers import findDataset
+    found = findDataset(source)
+    if os.path.isfile(found):
+      return found
+  except Exception:
+    # NuPIC isn't installed, or findDataset's plain Exception for a missing
+    # file
+    pass
+  raise IOError("Data file %s not found, tried %s and NuPIC's data paths" %
+                (source, ", ".join(candidates)))
+
+
+def loadSearchDef(path):
+  """
+  :return: the search definition, with the path of its data file added as
+    "dataPath". See resolveSource() for where the data file is looked for.
+  """
+  with open(path) as fp:
+    searchDef = json.load(fp)
+  source = searchDef["streamDef"]["streams"][0]["source"]
+  searchDef["dataPath"] = resolveSource(
+    source, os.path.dirname(os.path.abspath(path)))
+  return searchDef
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# ----------------------------------------------------------------------
+# Numenta Platform for Intelligent Computing (NuPIC)
+# Copyright (C) 2018, Numenta, Inc.  Unless you have an agreement
+# with Numenta, Inc., for a separate license for this software code, the
+# following terms and conditions apply:
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see http://www.gnu.org/licenses.
+#
+# http://numenta.org/licenses/
+# ----------------------------------------------------------------------
+
+"""
+Tests for search_def.py.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from search_def import loadSearchDef, resolveSource
+
+
+
+class SearchDefTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    os.mkdir(os.path.join(self.tmpDir, "data"))
+    for path in ("next_to_def.csv", os.path.join("data", "in_data.csv")):
+      with open(os.path.join(self.tmpDir, path), "w") as fp:
+        fp.write("metric1\n")
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def _writeSearchDef(self, source):
+    path = os.path.join(self.tmpDir, "search_def.json")
+    with open(path, "w") as fp:
+      json.dump({"streamDef": {"streams": [{"source": source}]}}, fp)
+    return path
+
+
+  def testSourceNextToSearchDef(self):
+    searchDef = loadSearchDef(self._writeSearchDef("file://next_to_def.csv"))
+    self.assertEqual(searchDef["dataPath"],
+                     os.path.join(self.tmpDir, "next_to_def.csv"))
+
+
+  def testSourceInDataDirectory(self):
+    # Like test4_search_def.json, which names its file without the data
+    # directory
+    for source in ("file://in_data.csv", "file://data/in_data.csv"):
+      searchDef = loadSearchDef(self._writeSearchDef(source))
+      self.assertEqual(os.path.normpath(searchDef["dataPath"]),
+                       os.path.join(self.tmpDir, "data", "in_data.csv"))
+
+
+  def testMissingSourceRaises(self):
+    with self.assertRaises(IOError):
+      resolveSource("file://missing_%d.csv" % os.getpid(), self.tmpDir)
+
+
+  def testBundledSearchDefinitions(self):
+    examplesDir = os.path.dirname(os.path.abspath(__file__))
+    for name in os.listdir(examplesDir):
+      if name.endswith("_search_def.json"):
+        searchDef = loadSearchDef(os.path.join(examplesDir, name))
+        self.assertTrue(os.path.isfile(searchDef["dataPath"]), name)
+
+
+
+if __name__ == "__main__":
+  unittest.main()